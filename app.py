@@ -1,12 +1,40 @@
-from flask import Flask, render_template, request, jsonify
+from flask import Flask, render_template, request, jsonify, Response, stream_with_context, session as flask_session
 import os
+import secrets
+import uuid
 from dotenv import load_dotenv
 from chatbot import SimpleChatbot
+from managers.session_store import SessionStore
+from streaming import sse_event, SSE_HEADERS
+import metrics
 
 load_dotenv()
 
 app = Flask(__name__)
-chatbot = SimpleChatbot()
+# Sessions are keyed by the signed cookie, so a guessable key would let anyone forge one
+app.config['SECRET_KEY'] = os.getenv('SECRET_KEY')
+if not app.config['SECRET_KEY']:
+    app.config['SECRET_KEY'] = secrets.token_hex(32)
+    print("WARNING: SECRET_KEY is not set; using a random key (sessions reset on restart "
+          "and are not shared between gunicorn workers)")
+
+# One bounded conversation per visitor instead of a single shared history
+session_store = SessionStore(
+    max_sessions=int(os.getenv('CHAT_MAX_SESSIONS', 1000)),
+    idle_ttl=float(os.getenv('CHAT_SESSION_TTL', 1800)),
+    max_messages_per_session=int(os.getenv('CHAT_MAX_MESSAGES', 20)),
+    max_tokens_per_session=int(os.getenv('CHAT_MAX_HISTORY_TOKENS', 3000))
+)
+chatbot = SimpleChatbot(session_store=session_store)
+
+# Per-stage latency, token counters and request timing at /metrics (Prometheus format)
+metrics.register_flask(app)
+
+def get_chat_session_id() -> str:
+    """Get the visitor's chat session id, assigning one on first use"""
+    if 'chat_session_id' not in flask_session:
+        flask_session['chat_session_id'] = str(uuid.uuid4())
+    return flask_session['chat_session_id']
 
 @app.route('/')
 def index():
@@ -19,12 +47,30 @@ def chat():
     if not user_message:
         return jsonify({'error': 'Tin nhắn không được để trống'}), 400
 
-    response = chatbot.get_response(user_message)
+    response = chatbot.get_response(user_message, session_id=get_chat_session_id())
     return jsonify({'response': response})
 
+@app.route('/chat/stream', methods=['POST'])
+def chat_stream():
+    """Same as /chat, but streams the answer as Server-Sent Events"""
+    user_message = request.json.get('message')
+
+    if not user_message:
+        return jsonify({'error': 'Tin nhắn không được để trống'}), 400
+
+    # Resolve the session before streaming starts - the cookie can't be set afterwards
+    session_id = get_chat_session_id()
+
+    def generate():
+        for delta in chatbot.stream_response(user_message, session_id=session_id):
+            yield sse_event({'delta': delta})
+        yield sse_event({}, event='done')
+
+    return Response(stream_with_context(generate()), mimetype='text/event-stream', headers=SSE_HEADERS)
+
 @app.route('/clear', methods=['POST'])
 def clear_history():
-    chatbot.clear_history()
+    chatbot.clear_history(session_id=get_chat_session_id())
     return jsonify({'success': True})
 
 if __name__ == '__main__':
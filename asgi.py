@@ -0,0 +1,58 @@
+"""
+ASGI entry point for app.py with an asyncio chat pipeline:
+
+    uvicorn asgi:app --host 0.0.0.0 --port $PORT
+    gunicorn -k uvicorn.workers.UvicornWorker asgi:app
+
+/chat and /chat/stream are served by AsyncSimpleChatbot, so a worker is not tied up
+while OpenAI or the web search answers; all other routes are the Flask app from app.py.
+"""
+
+import uuid
+
+from app import app as flask_app, session_store
+from asgi_support import AsyncRequest, AsyncRoutes, send_json, send_sse
+from async_chatbot import AsyncSimpleChatbot
+from streaming import sse_event
+
+chatbot = AsyncSimpleChatbot(session_store=session_store)
+
+def get_chat_session_id(request: AsyncRequest) -> str:
+    """Same cookie-backed session id as app.get_chat_session_id()"""
+    if 'chat_session_id' not in request.session:
+        request.set_session('chat_session_id', str(uuid.uuid4()))
+    return request.session['chat_session_id']
+
+async def chat(request: AsyncRequest, send) -> int:
+    user_message = (await request.json()).get('message')
+
+    if not user_message:
+        await send_json(send, request, {'error': 'Tin nhắn không được để trống'}, 400)
+        return 400
+
+    response = await chatbot.get_response(user_message, session_id=get_chat_session_id(request))
+    await send_json(send, request, {'response': response})
+    return 200
+
+async def chat_stream(request: AsyncRequest, send) -> int:
+    """Same as /chat, but streams the answer as Server-Sent Events"""
+    user_message = (await request.json()).get('message')
+
+    if not user_message:
+        await send_json(send, request, {'error': 'Tin nhắn không được để trống'}, 400)
+        return 400
+
+    session_id = get_chat_session_id(request)
+
+    async def generate():
+        async for delta in chatbot.stream_response(user_message, session_id=session_id):
+            yield sse_event({'delta': delta})
+        yield sse_event({}, event='done')
+
+    await send_sse(send, request, generate())
+    return 200
+
+app = AsyncRoutes(flask_app, {
+    ('POST', '/chat'): chat,
+    ('POST', '/chat/stream'): chat_stream,
+})
@@ -0,0 +1,138 @@
+"""
+Minimal ASGI plumbing for asgi.py / medical_asgi.py (no web framework needed)
+
+AsyncRoutes serves the hot chat routes with native async handlers and hands every
+other request to the unchanged Flask app through asgiref's WSGI adapter, so pages,
+static files, reports and /metrics keep working. Handlers share the visitor's Flask
+session cookie, so a session started on a Flask route is seen by the async routes.
+"""
+
+import json
+import time
+from typing import AsyncIterator, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from asgiref.wsgi import WsgiToAsgi
+
+from metrics import HTTP_SECONDS
+from streaming import SSE_HEADERS
+
+class AsyncRequest:
+    def __init__(self, scope: dict, receive: Callable, flask_app):
+        self.scope = scope
+        self.receive = receive
+        self.method = scope["method"]
+        self.path = scope["path"]
+        self.flask_app = flask_app
+        self.headers = {name.decode("latin-1").lower(): value.decode("latin-1") for name, value in scope["headers"]}
+        self._serializer = flask_app.session_interface.get_signing_serializer(flask_app)
+        self.session = self._load_session()
+        self.session_modified = False
+
+    async def body(self) -> bytes:
+        chunks = []
+        while True:
+            message = await self.receive()
+            chunks.append(message.get("body", b""))
+            if not message.get("more_body"):
+                return b"".join(chunks)
+
+    async def json(self) -> dict:
+        """Request JSON object ({} when missing or malformed)"""
+        try:
+            data = json.loads(await self.body() or b"{}")
+        except ValueError:
+            return {}
+        return data if isinstance(data, dict) else {}
+
+    def _cookies(self) -> Dict[str, str]:
+        cookies = {}
+        for part in self.headers.get("cookie", "").split(";"):
+            name, _, value = part.strip().partition("=")
+            if name:
+                cookies[name] = value
+        return cookies
+
+    def _load_session(self) -> dict:
+        """Decode Flask's signed session cookie (empty dict when missing or invalid)"""
+        value = self._cookies().get(self.flask_app.config["SESSION_COOKIE_NAME"])
+        if not value or self._serializer is None:
+            return {}
+        try:
+            max_age = int(self.flask_app.permanent_session_lifetime.total_seconds())
+            return dict(self._serializer.loads(value, max_age=max_age))
+        except Exception:
+            return {}
+
+    def set_session(self, key: str, value):
+        self.session[key] = value
+        self.session_modified = True
+
+    def session_headers(self) -> List[Tuple[bytes, bytes]]:
+        """Set-Cookie header for a modified session, in Flask's format"""
+        if not self.session_modified or self._serializer is None:
+            return []
+        config = self.flask_app.config
+        cookie = f"{config['SESSION_COOKIE_NAME']}={self._serializer.dumps(self.session)}; Path={config['SESSION_COOKIE_PATH'] or '/'}"
+        if config["SESSION_COOKIE_HTTPONLY"]:
+            cookie += "; HttpOnly"
+        if config["SESSION_COOKIE_SECURE"]:
+            cookie += "; Secure"
+        if config["SESSION_COOKIE_SAMESITE"]:
+            cookie += f"; SameSite={config['SESSION_COOKIE_SAMESITE']}"
+        return [(b"set-cookie", cookie.encode("latin-1"))]
+
+async def send_json(send: Callable, request: AsyncRequest, payload, status: int = 200):
+    body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+    headers = [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())]
+    await send({"type": "http.response.start", "status": status, "headers": headers + request.session_headers()})
+    await send({"type": "http.response.body", "body": body})
+
+async def send_sse(send: Callable, request: AsyncRequest, events: AsyncIterator[str]):
+    """Stream already-formatted Server-Sent Events (see streaming.sse_event)"""
+    headers = [(b"content-type", b"text/event-stream; charset=utf-8")]
+    headers += [(name.lower().encode(), value.encode()) for name, value in SSE_HEADERS.items()]
+    await send({"type": "http.response.start", "status": 200, "headers": headers + request.session_headers()})
+    async for event in events:
+        await send({"type": "http.response.body", "body": event.encode("utf-8"), "more_body": True})
+    await send({"type": "http.response.body", "body": b""})
+
+Handler = Callable[[AsyncRequest, Callable], Awaitable[int]]
+
+class AsyncRoutes:
+    """
+    ASGI app: (method, path) -> async handler returning the response status;
+    anything else goes to the Flask app
+    """
+
+    def __init__(self, flask_app, routes: Dict[Tuple[str, str], Handler]):
+        self.flask_app = flask_app
+        self.routes = routes
+        self.fallback = WsgiToAsgi(flask_app)
+
+    async def __call__(self, scope: dict, receive: Callable, send: Callable):
+        if scope["type"] == "lifespan":
+            await self._lifespan(receive, send)
+            return
+
+        handler: Optional[Handler] = None
+        if scope["type"] == "http":
+            handler = self.routes.get((scope["method"], scope["path"]))
+        if handler is None:
+            await self.fallback(scope, receive, send)
+            return
+
+        start = time.perf_counter()
+        request = AsyncRequest(scope, receive, self.flask_app)
+        status = await handler(request, send)
+        HTTP_SECONDS.observe(time.perf_counter() - start, scope["path"], scope["method"], status)
+
+    @staticmethod
+    async def _lifespan(receive: Callable, send: Callable):
+        # Nothing to set up; acknowledge so the server doesn't log lifespan errors
+        while True:
+            message = await receive()
+            if message["type"] == "lifespan.startup":
+                await send({"type": "lifespan.startup.complete"})
+            elif message["type"] == "lifespan.shutdown":
+                await send({"type": "lifespan.shutdown.complete"})
+                return
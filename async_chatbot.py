@@ -0,0 +1,100 @@
+"""
+AsyncSimpleChatbot - asyncio variant of SimpleChatbot, served by asgi.py
+
+The search decision, web search and answer call are awaited instead of blocking a
+worker thread, so one process can hold many chats waiting on OpenAI at once.
+History, session store, response cache and background compaction are shared with
+SimpleChatbot unchanged (they are in-memory and never wait on the network).
+"""
+
+from typing import AsyncIterator, Dict, List, Tuple
+from chatbot import SimpleChatbot
+from managers.async_search_manager import AsyncSearchManager
+from managers.history_manager import HistoryManager
+from managers.llm_gateway import get_async_llm_gateway
+from managers.search_manager import SEARCH_MODE_TOOLS
+
+class AsyncSimpleChatbot(SimpleChatbot):
+    def __init__(self, api_key: str = None, **kwargs):
+        # Answer and search calls go through the async gateway; self.client (sync) stays
+        # for the background summary thread
+        self.async_client = get_async_llm_gateway(api_key)
+        super().__init__(api_key=api_key, **kwargs)
+
+    def _create_search_manager(self) -> AsyncSearchManager:
+        return AsyncSearchManager(openai_client=self.async_client)
+
+    async def needs_web_search(self, user_message: str) -> bool:
+        return await self.search_manager.needs_web_search(user_message)
+
+    async def _prepare_messages(self, history_manager: HistoryManager, user_message: str) -> Tuple[List[Dict[str, str]], bool]:
+        history_manager.add_message("user", user_message)
+
+        if self.search_mode == SEARCH_MODE_TOOLS:
+            return history_manager.get_history(), False
+
+        needs_search, search_results = await self.search_manager.should_search_and_get_results(user_message)
+        return self._build_messages(history_manager, user_message, needs_search, search_results)
+
+    async def get_response(self, user_message: str, session_id: str = None) -> str:
+        history_manager = self._get_history_manager(session_id)
+        cacheable, cached_answer = self._lookup_cached_response(history_manager, user_message)
+        if cached_answer is not None:
+            return cached_answer
+
+        try:
+            messages, used_search = await self._prepare_messages(history_manager, user_message)
+
+            if self.search_mode == SEARCH_MODE_TOOLS:
+                turn = {"searched": False}
+                assistant_message = await self.search_manager.complete_with_tools(messages, turn=turn, **self.completion_args)
+                used_search = turn["searched"]
+            else:
+                response = await self.async_client.chat.completions.create(
+                    messages=messages,
+                    **self.completion_args
+                )
+                assistant_message = response.choices[0].message.content
+            self._finish_turn(history_manager, user_message, assistant_message, cacheable, used_search)
+
+            return assistant_message
+
+        except Exception as e:
+            return f"Lỗi: {str(e)}"
+
+    async def stream_response(self, user_message: str, session_id: str = None) -> AsyncIterator[str]:
+        """Like get_response, but yields the answer in chunks as OpenAI produces them"""
+        history_manager = self._get_history_manager(session_id)
+        cacheable, cached_answer = self._lookup_cached_response(history_manager, user_message)
+        if cached_answer is not None:
+            yield cached_answer
+            return
+
+        try:
+            messages, used_search = await self._prepare_messages(history_manager, user_message)
+
+            chunks, turn = [], {"searched": False}
+            async for delta in self._stream_completion(messages, turn):
+                chunks.append(delta)
+                yield delta
+
+            self._finish_turn(history_manager, user_message, "".join(chunks), cacheable,
+                              used_search or turn["searched"])
+
+        except Exception as e:
+            yield f"Lỗi: {str(e)}"
+
+    async def _stream_completion(self, messages: List[Dict[str, str]], turn: Dict = None) -> AsyncIterator[str]:
+        if self.search_mode == SEARCH_MODE_TOOLS:
+            async for delta in self.search_manager.stream_with_tools(messages, turn=turn, **self.completion_args):
+                yield delta
+            return
+
+        stream = await self.async_client.chat.completions.create(
+            messages=messages,
+            stream=True,
+            **self.completion_args
+        )
+        async for chunk in stream:
+            if chunk.choices and chunk.choices[0].delta.content:
+                yield chunk.choices[0].delta.content
@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+
+"""
+Evaluate the tiered web-search decision router against labelled question sets.
+
+search_decision_eval.jsonl is the set the classifier weights were tuned on;
+search_decision_holdout.jsonl was written separately and never used for tuning, so
+its numbers are the ones to trust. Both are evaluated by default.
+
+Reports, for the local classifier (tier 1):
+- coverage: share of questions decided locally (outside the ambiguous band)
+- accuracy on the questions it decided, and per-call latency
+
+With --llm (needs OPENAI_API_KEY), also calls the LLM decision for every question and reports
+LLM accuracy/latency, local-vs-LLM agreement, and the accuracy/latency of the full router.
+
+Usage:
+    python benchmarks/evaluate_search_router.py [--llm] [--eval-file path.jsonl ...]
+"""
+
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from dotenv import load_dotenv
+from managers.search_manager import SearchManager
+
+BENCHMARKS_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_EVAL_FILES = [
+    os.path.join(BENCHMARKS_DIR, "search_decision_eval.jsonl"),
+    os.path.join(BENCHMARKS_DIR, "search_decision_holdout.jsonl"),
+]
+
+def load_eval_set(path: str) -> list:
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+def percentile(values: list, pct: float) -> float:
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+def describe_latency(label: str, seconds: list):
+    millis = [s * 1000 for s in seconds]
+    print(f"   {label}: mean {statistics.mean(millis):.3f} ms | p50 {percentile(millis, 50):.3f} ms | "
+          f"p95 {percentile(millis, 95):.3f} ms")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--eval-file", action="append", help="labelled JSONL set (repeatable; default: tuning + held-out)")
+    parser.add_argument("--llm", action="store_true", help="also query the LLM for agreement/latency")
+    args = parser.parse_args()
+
+    load_dotenv()
+
+    client = None
+    if args.llm:
+        import openai
+        client = openai.OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+    manager = SearchManager(openai_client=client)
+
+    for path in args.eval_file or DEFAULT_EVAL_FILES:
+        evaluate(os.path.basename(path), load_eval_set(path), manager, client, args.llm)
+
+def evaluate(name: str, examples: list, manager: SearchManager, client, llm_requested: bool):
+    classifier = manager.local_classifier
+
+    print("🧪 SEARCH DECISION ROUTER EVALUATION")
+    print("=" * 60)
+    print(f"Set: {name} | examples: {len(examples)} | ambiguous band: "
+          f"({classifier.low_threshold:.2f}, {classifier.high_threshold:.2f})")
+
+    local_latencies, llm_latencies, router_latencies = [], [], []
+    decided = correct_local = 0
+    llm_correct = agreement = agreement_total = router_correct = 0
+    mistakes, escalated = [], []
+
+    for example in examples:
+        question, label = example["question"], example["needs_search"]
+
+        start = time.perf_counter()
+        local_decision = classifier.classify(question)
+        local_latencies.append(time.perf_counter() - start)
+
+        if local_decision is None:
+            escalated.append(question)
+        else:
+            decided += 1
+            if local_decision == label:
+                correct_local += 1
+            else:
+                mistakes.append((question, label, classifier.score(question)))
+
+        if client is None:
+            continue
+
+        start = time.perf_counter()
+        try:
+            llm_result = manager.llm_decision(question)
+        except Exception as e:
+            print(f"   ⚠️ LLM call failed for '{question}': {e}")
+            continue
+        llm_elapsed = time.perf_counter() - start
+        llm_latencies.append(llm_elapsed)
+        llm_correct += llm_result == label
+
+        if local_decision is not None:
+            agreement_total += 1
+            agreement += local_decision == llm_result
+
+        router_decision = llm_result if local_decision is None else local_decision
+        router_correct += router_decision == label
+        router_latencies.append(local_latencies[-1] + (llm_elapsed if local_decision is None else 0.0))
+
+    print("\n📊 TIER 1 - LOCAL CLASSIFIER")
+    print(f"   Coverage: {decided}/{len(examples)} ({decided / len(examples):.0%}) decided locally")
+    if decided:
+        print(f"   Accuracy on decided: {correct_local}/{decided} ({correct_local / decided:.0%})")
+    describe_latency("Latency", local_latencies)
+
+    if mistakes:
+        print("\n❌ Local mistakes:")
+        for question, label, score in mistakes:
+            print(f"   [{score:.2f}] expected {label}: {question}")
+    if escalated:
+        print("\n↗️  Escalated to LLM (ambiguous):")
+        for question in escalated:
+            print(f"   [{classifier.score(question):.2f}] {question}")
+
+    if client is not None and llm_latencies:
+        answered = len(llm_latencies)
+        print("\n📊 LLM ONLY (previous behaviour)")
+        print(f"   Accuracy: {llm_correct}/{answered} ({llm_correct / answered:.0%})")
+        describe_latency("Latency", llm_latencies)
+        if agreement_total:
+            print(f"   Local/LLM agreement on locally decided: {agreement}/{agreement_total} "
+                  f"({agreement / agreement_total:.0%})")
+
+        print("\n📊 TIERED ROUTER")
+        print(f"   Accuracy: {router_correct}/{answered} ({router_correct / answered:.0%})")
+        describe_latency("Latency", router_latencies)
+    elif not llm_requested:
+        print("\nℹ️  Run with --llm to compare against the LLM decision (requires OPENAI_API_KEY).")
+    print()
+
+if __name__ == "__main__":
+    main()
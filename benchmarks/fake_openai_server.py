@@ -0,0 +1,275 @@
+#!/usr/bin/env python3
+
+"""
+Local OpenAI-compatible stand-in for benchmarks and hermetic tests (standard library only).
+
+Serves POST /v1/chat/completions with:
+- configurable latency before the first byte (--latency/--jitter, ms) and per-chunk delay (--token-delay)
+- streaming (SSE chunks + [DONE], usage chunk when stream_options.include_usage is set)
+- JSON mode (response_format json_object) replies in the MedicalChatbot format
+  {"message", "action", "clinical_reasoning", "data"}
+- error injection: --error-rate of requests fail with one of --error-status (429 gets Retry-After)
+- search decision prompts answered with "CÓ"/"KHÔNG", plain prompts with Vietnamese filler text
+
+Point the apps at it through OPENAI_BASE_URL:
+    python benchmarks/fake_openai_server.py --port 8001 --latency 300 --token-delay 15
+    OPENAI_BASE_URL=http://127.0.0.1:8001/v1 OPENAI_API_KEY=fake python app.py
+"""
+
+import argparse
+import json
+import random
+import re
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional, Tuple
+
+DECISION_MARKER = 'Chỉ trả lời: "CÓ" hoặc "KHÔNG"'
+DECISION_QUESTION_RE = re.compile(r'Câu hỏi: "(.*)"', re.DOTALL)
+SEARCH_HINTS = ("hiện tại", "hiện nay", "hôm nay", "mới nhất", "tin tức", "giá vàng", "tỷ giá", "thời tiết")
+
+FILLER_TEXT = (
+    "Đây là câu trả lời mô phỏng từ máy chủ thử nghiệm cục bộ. Nội dung không có ý nghĩa thực tế "
+    "nhưng có độ dài và cách chia đoạn tương tự câu trả lời thật để đo độ trễ và thông lượng của "
+    "ứng dụng. Bạn có thể điều chỉnh độ trễ, tốc độ sinh token và tỷ lệ lỗi bằng tham số dòng lệnh."
+).split()
+
+MEDICAL_QUESTIONS = [
+    "Triệu chứng này bắt đầu từ khi nào?",
+    "Bạn có bị sốt, buồn nôn hay nôn không?",
+    "Cơn đau ở vị trí nào và có lan đi đâu không?",
+    "Bạn đang dùng thuốc gì không?",
+    "Bạn còn điều gì muốn chia sẻ thêm không?",
+]
+
+class FakeConfig:
+    def __init__(self, latency_ms: float = 200, jitter_ms: float = 50, token_delay_ms: float = 10,
+                 reply_words: int = 60, error_rate: float = 0.0, error_statuses: Tuple[int, ...] = (500,),
+                 seed: Optional[int] = None):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.token_delay_ms = token_delay_ms
+        self.reply_words = reply_words
+        self.error_rate = error_rate
+        self.error_statuses = error_statuses
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.stats = {"requests": 0, "streams": 0, "errors_injected": 0}
+
+    def first_byte_delay(self) -> float:
+        with self.lock:
+            jitter = self.random.uniform(-self.jitter_ms, self.jitter_ms)
+        return max(0.0, self.latency_ms + jitter) / 1000
+
+    def pick_error(self) -> Optional[int]:
+        with self.lock:
+            if self.error_rate and self.random.random() < self.error_rate:
+                self.stats["errors_injected"] += 1
+                return self.random.choice(self.error_statuses)
+        return None
+
+    def count(self, counter: str):
+        with self.lock:
+            self.stats[counter] += 1
+
+def estimate_tokens(text: str) -> int:
+    return max(1, len((text or "").encode("utf-8")) // 3)
+
+def last_user_content(messages: List[Dict]) -> str:
+    for message in reversed(messages):
+        if message.get("role") == "user" and isinstance(message.get("content"), str):
+            return message["content"]
+    return ""
+
+def fake_reply(messages: List[Dict], json_mode: bool, reply_words: int) -> str:
+    """Deterministic reply text for a request"""
+    content = last_user_content(messages)
+
+    if DECISION_MARKER in content:
+        match = DECISION_QUESTION_RE.search(content)
+        question = (match.group(1) if match else content).lower()
+        return "CÓ" if any(hint in question for hint in SEARCH_HINTS) else "KHÔNG"
+
+    if json_mode:
+        turn = sum(1 for message in messages if message.get("role") == "user")
+        return json.dumps({
+            "message": MEDICAL_QUESTIONS[turn % len(MEDICAL_QUESTIONS)],
+            "action": "continue",
+            "clinical_reasoning": "Phản hồi mô phỏng từ máy chủ thử nghiệm.",
+            "data": {"chief_complaint": {"main_complaint": content[:60]}}
+        }, ensure_ascii=False)
+
+    words = [FILLER_TEXT[i % len(FILLER_TEXT)] for i in range(reply_words)]
+    return " ".join(words)
+
+def split_for_stream(text: str, json_mode: bool) -> List[str]:
+    """Token-sized pieces: words for text, short slices for JSON (exercises incremental parsing)"""
+    if json_mode:
+        return [text[i:i + 6] for i in range(0, len(text), 6)]
+    return re.findall(r"\S+\s*", text) or [text]
+
+class FakeOpenAIHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    config: FakeConfig = FakeConfig()
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        if self.path.rstrip("/").endswith("/models"):
+            self._send_json(200, {"object": "list", "data": [{"id": "gpt-3.5-turbo", "object": "model"}]})
+        else:
+            self._send_json(404, {"error": {"message": "Not found", "type": "invalid_request_error"}})
+
+    def do_POST(self):
+        if not self.path.rstrip("/").endswith("/chat/completions"):
+            self._send_json(404, {"error": {"message": "Not found", "type": "invalid_request_error"}})
+            return
+
+        length = int(self.headers.get("Content-Length") or 0)
+        try:
+            body = json.loads(self.rfile.read(length) or b"{}")
+        except json.JSONDecodeError:
+            self._send_json(400, {"error": {"message": "Invalid JSON body", "type": "invalid_request_error"}})
+            return
+
+        config = self.config
+        config.count("requests")
+        time.sleep(config.first_byte_delay())
+
+        status = config.pick_error()
+        if status:
+            headers = {"Retry-After": "1"} if status == 429 else {}
+            self._send_json(status, {"error": {"message": f"Injected error {status}", "type": "server_error"}}, headers)
+            return
+
+        messages = body.get("messages") or []
+        json_mode = (body.get("response_format") or {}).get("type") == "json_object"
+        reply = fake_reply(messages, json_mode, config.reply_words)
+        usage = {
+            "prompt_tokens": sum(estimate_tokens(str(message.get("content"))) for message in messages),
+            "completion_tokens": estimate_tokens(reply)
+        }
+        usage["total_tokens"] = usage["prompt_tokens"] + usage["completion_tokens"]
+
+        completion_id = f"chatcmpl-{uuid.uuid4().hex[:24]}"
+        model = body.get("model", "gpt-3.5-turbo")
+
+        if body.get("stream"):
+            config.count("streams")
+            include_usage = (body.get("stream_options") or {}).get("include_usage")
+            self._stream(completion_id, model, split_for_stream(reply, json_mode), usage if include_usage else None)
+            return
+
+        self._send_json(200, {
+            "id": completion_id,
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": model,
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": reply},
+                "finish_reason": "stop"
+            }],
+            "usage": usage
+        })
+
+    def _stream(self, completion_id: str, model: str, pieces: List[str], usage: Optional[Dict]):
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+
+        def chunk(choices: List[Dict], extra: Dict = None) -> Dict:
+            payload = {"id": completion_id, "object": "chat.completion.chunk",
+                       "created": int(time.time()), "model": model, "choices": choices}
+            payload.update(extra or {})
+            return payload
+
+        events = [chunk([{"index": 0, "delta": {"role": "assistant", "content": ""}, "finish_reason": None}])]
+        events += [chunk([{"index": 0, "delta": {"content": piece}, "finish_reason": None}]) for piece in pieces]
+        events.append(chunk([{"index": 0, "delta": {}, "finish_reason": "stop"}]))
+        if usage:
+            events.append(chunk([], {"usage": usage}))
+
+        delay = self.config.token_delay_ms / 1000
+        try:
+            for event in events:
+                self._write_chunk(f"data: {json.dumps(event, ensure_ascii=False)}\n\n")
+                if delay:
+                    time.sleep(delay)
+            self._write_chunk("data: [DONE]\n\n")
+            self.wfile.write(b"0\r\n\r\n")
+        except (BrokenPipeError, ConnectionResetError):
+            self.close_connection = True
+
+    def _write_chunk(self, text: str):
+        data = text.encode("utf-8")
+        self.wfile.write(f"{len(data):X}\r\n".encode("ascii") + data + b"\r\n")
+        self.wfile.flush()
+
+    def _send_json(self, status: int, payload: Dict, headers: Dict[str, str] = None):
+        data = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+class FakeOpenAIServer(ThreadingHTTPServer):
+    daemon_threads = True
+    # Async clients open many connections at once; the default backlog of 5 refuses them
+    request_queue_size = 256
+
+    def handle_error(self, request, client_address):
+        # Clients dropping keep-alive connections is normal here, not worth a traceback
+        pass
+
+def make_server(host: str = "127.0.0.1", port: int = 0, config: FakeConfig = None) -> FakeOpenAIServer:
+    handler = type("ConfiguredFakeOpenAIHandler", (FakeOpenAIHandler,), {"config": config or FakeConfig()})
+    return FakeOpenAIServer((host, port), handler)
+
+def start_server(host: str = "127.0.0.1", port: int = 0, config: FakeConfig = None) -> FakeOpenAIServer:
+    """Start the fake server on a background thread; server.server_address has the bound port"""
+    server = make_server(host, port, config)
+    threading.Thread(target=server.serve_forever, name="fake-openai", daemon=True).start()
+    return server
+
+def base_url(server: FakeOpenAIServer) -> str:
+    host, port = server.server_address[:2]
+    return f"http://{host}:{port}/v1"
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8001)
+    parser.add_argument("--latency", type=float, default=200, help="mean time to first byte (ms)")
+    parser.add_argument("--jitter", type=float, default=50, help="+/- uniform jitter on latency (ms)")
+    parser.add_argument("--token-delay", type=float, default=10, help="delay between streamed chunks (ms)")
+    parser.add_argument("--reply-words", type=int, default=60, help="length of plain-text replies")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="share of requests that fail (0..1)")
+    parser.add_argument("--error-status", default="500", help="comma-separated statuses to inject, e.g. 429,500,503")
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+
+    config = FakeConfig(
+        latency_ms=args.latency, jitter_ms=args.jitter, token_delay_ms=args.token_delay,
+        reply_words=args.reply_words, error_rate=args.error_rate,
+        error_statuses=tuple(int(status) for status in args.error_status.split(",")), seed=args.seed
+    )
+    server = make_server(args.host, args.port, config)
+
+    print(f"🧪 Fake OpenAI server on {args.host}:{args.port}")
+    print(f"   OPENAI_BASE_URL=http://{args.host}:{args.port}/v1 OPENAI_API_KEY=fake")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print(f"\nStats: {config.stats}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,17 @@
+"""
+Gunicorn config for load tests: installs the simulated search/Telegram backends in the
+master process before the app is imported, so every forked worker inherits them.
+
+    gunicorn -c benchmarks/gunicorn_mock_backends.py app:app
+
+Point the LLM at benchmarks/fake_openai_server.py with OPENAI_BASE_URL.
+"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import mock_backends
+
+mock_backends.install()
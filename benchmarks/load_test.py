@@ -0,0 +1,333 @@
+#!/usr/bin/env python3
+
+"""
+End-to-end load test for app.py and medical_app.py with a simulated LLM and search backends.
+
+Starts benchmarks/fake_openai_server.py in-process, serves the app under test in one or more
+server modes, drives full conversation flows from concurrent virtual users and reports
+p50/p95/p99 latency, throughput and error rate per route.
+
+Flows:
+- chat:    app.py          POST /chat (or /chat/stream) x --turns
+- medical: medical_app.py  POST /start-session -> POST /chat (or /chat/stream) x --turns
+                           -> GET /generate-report/<session_id>
+
+Runs (--runs, comma separated), each "<server>[:stream]":
+- inprocess  werkzeug threaded server inside this process
+- sync       gunicorn, sync workers (the Railway default)
+- gthread    gunicorn, threaded workers (--threads)
+- asgi       gunicorn with uvicorn workers serving asgi.py / medical_asgi.py (asyncio chat path)
+- url        an already running server at --url (start it with OPENAI_BASE_URL and
+             -c benchmarks/gunicorn_mock_backends.py yourself)
+":stream" uses the /chat/stream SSE endpoint and also reports time to first delta.
+
+Usage:
+    python benchmarks/load_test.py --app chat --runs sync,sync:stream,gthread:stream --concurrency 16
+    python benchmarks/load_test.py --app chat --runs gthread,asgi,asgi:stream --concurrency 64
+    python benchmarks/load_test.py --app medical --runs inprocess --users 20 --turns 4
+"""
+
+import argparse
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List
+
+import requests
+
+BENCHMARKS_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT_DIR = os.path.dirname(BENCHMARKS_DIR)
+sys.path.insert(0, BENCHMARKS_DIR)
+
+import fake_openai_server
+
+CHAT_QUESTIONS = [
+    "Cách nấu phở bò ngon tại nhà?",
+    "Giá vàng hôm nay bao nhiêu?",
+    "Giải thích khái niệm lạm phát là gì",
+    "Thời tiết Hà Nội hôm nay thế nào?",
+    "Làm thế nào để học lập trình Python hiệu quả?",
+    "Tin tức mới nhất về kinh tế Việt Nam",
+]
+
+MEDICAL_MESSAGES = [
+    "Tôi tên An, 30 tuổi, nam, bị đau bụng từ hôm qua",
+    "Đau ở vùng thượng vị, có buồn nôn nhưng không nôn",
+    "Không sốt, đại tiện bình thường",
+    "Tôi không dùng thuốc gì",
+    "Không còn gì thêm",
+]
+
+class Recorder:
+    """Thread-safe latency/error samples per route"""
+
+    def __init__(self):
+        self.latencies: Dict[str, List[float]] = defaultdict(list)
+        self.errors: Dict[str, int] = defaultdict(int)
+        self._lock = threading.Lock()
+
+    def record(self, route: str, seconds: float, ok: bool):
+        with self._lock:
+            self.latencies[route].append(seconds)
+            if not ok:
+                self.errors[route] += 1
+
+def percentile(values: List[float], pct: float) -> float:
+    """Linear-interpolated percentile"""
+    ordered = sorted(values)
+    if len(ordered) == 1:
+        return ordered[0]
+    rank = pct / 100 * (len(ordered) - 1)
+    lower = int(rank)
+    upper = min(lower + 1, len(ordered) - 1)
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * (rank - lower)
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+def timed_request(recorder: Recorder, route: str, http: requests.Session, method: str, url: str, **kwargs):
+    start = time.perf_counter()
+    try:
+        response = http.request(method, url, timeout=120, **kwargs)
+        ok = response.status_code < 400
+        recorder.record(route, time.perf_counter() - start, ok)
+        return response if ok else None
+    except requests.RequestException:
+        recorder.record(route, time.perf_counter() - start, False)
+        return None
+
+def timed_stream(recorder: Recorder, route: str, http: requests.Session, url: str, message: str) -> bool:
+    """POST an SSE request; records first-delta latency and full-stream latency"""
+    start = time.perf_counter()
+    first_delta = None
+    ok = False
+    try:
+        with http.post(url, json={"message": message}, stream=True, timeout=120) as response:
+            if response.status_code < 400:
+                for line in response.iter_lines(decode_unicode=True):
+                    if first_delta is None and line.startswith("data:") and '"delta"' in line:
+                        first_delta = time.perf_counter() - start
+                    if line.startswith("event: done"):
+                        ok = True
+                    elif line.startswith("event: error"):
+                        ok = False
+                        break
+    except requests.RequestException:
+        ok = False
+
+    recorder.record(route, time.perf_counter() - start, ok)
+    if first_delta is not None:
+        recorder.record(f"{route} (first delta)", first_delta, True)
+    return ok
+
+def chat_flow(base: str, recorder: Recorder, user: int, turns: int, stream: bool):
+    http = requests.Session()
+    for turn in range(turns):
+        message = CHAT_QUESTIONS[(user + turn) % len(CHAT_QUESTIONS)]
+        if stream:
+            timed_stream(recorder, "POST /chat/stream", http, f"{base}/chat/stream", message)
+        else:
+            timed_request(recorder, "POST /chat", http, "POST", f"{base}/chat", json={"message": message})
+
+def medical_flow(base: str, recorder: Recorder, user: int, turns: int, stream: bool):
+    http = requests.Session()
+    response = timed_request(recorder, "POST /start-session", http, "POST", f"{base}/start-session",
+                             json={"language": "vi"})
+    if response is None:
+        return
+    session_id = response.json()["session_id"]
+
+    for turn in range(turns):
+        message = MEDICAL_MESSAGES[turn % len(MEDICAL_MESSAGES)]
+        if stream:
+            timed_stream(recorder, "POST /chat/stream", http, f"{base}/chat/stream", message)
+        else:
+            timed_request(recorder, "POST /chat", http, "POST", f"{base}/chat", json={"message": message})
+
+    timed_request(recorder, "GET /generate-report", http, "GET", f"{base}/generate-report/{session_id}")
+
+# app -> (WSGI module, ASGI module, readiness path, flow)
+FLOWS = {
+    "chat": ("app", "asgi", "/", chat_flow),
+    "medical": ("medical_app", "medical_asgi", "/health", medical_flow),
+}
+
+def wait_until_ready(url: str, timeout: float = 30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            if requests.get(url, timeout=2).status_code < 500:
+                return
+        except requests.RequestException:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError(f"Server at {url} did not become ready in {timeout:.0f}s")
+
+class AppServer:
+    """Serves the app under test for one run (in-process, gunicorn, or an external URL)"""
+
+    def __init__(self, server: str, module: str, args, env: Dict[str, str]):
+        self.server = server
+        self.module = module
+        self.args = args
+        self.env = env
+        self.process = None
+        self.wsgi_server = None
+        self.base = args.url.rstrip("/") if server == "url" else None
+
+    def __enter__(self) -> str:
+        if self.server == "url":
+            return self.base
+
+        port = free_port()
+        self.base = f"http://127.0.0.1:{port}"
+
+        if self.server == "inprocess":
+            import importlib
+            import logging
+            import mock_backends
+            from werkzeug.serving import make_server
+
+            logging.getLogger("werkzeug").setLevel(logging.WARNING)
+
+            os.environ.update(self.env)
+            mock_backends.install()
+            app = importlib.import_module(self.module).app
+            self.wsgi_server = make_server("127.0.0.1", port, app, threaded=True)
+            threading.Thread(target=self.wsgi_server.serve_forever, daemon=True).start()
+        else:
+            worker_class = "uvicorn.workers.UvicornWorker" if self.server == "asgi" else self.server
+            command = [
+                sys.executable, "-m", "gunicorn", f"{self.module}:app",
+                "-c", os.path.join(BENCHMARKS_DIR, "gunicorn_mock_backends.py"),
+                "-b", f"127.0.0.1:{port}", "-w", str(self.args.workers),
+                "-k", worker_class, "--timeout", "120", "--log-level", "warning"
+            ]
+            if self.server == "gthread":
+                command += ["--threads", str(self.args.threads)]
+            self.process = subprocess.Popen(
+                command, cwd=ROOT_DIR, env={**os.environ, **self.env},
+                stdout=subprocess.DEVNULL if not self.args.verbose else None,
+                stderr=subprocess.DEVNULL if not self.args.verbose else None
+            )
+        return self.base
+
+    def __exit__(self, *exc):
+        if self.wsgi_server is not None:
+            self.wsgi_server.shutdown()
+        if self.process is not None:
+            self.process.terminate()
+            try:
+                self.process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                self.process.kill()
+
+def run_once(run: str, args, llm_base_url: str, db_dir: str) -> Dict:
+    server, _, variant = run.partition(":")
+    stream = variant == "stream"
+    wsgi_module, asgi_module, ready_path, flow = FLOWS[args.app]
+    module = asgi_module if server == "asgi" else wsgi_module
+
+    db_path = os.path.join(db_dir, run.replace(":", "_") + ".db")
+    env = {
+        "OPENAI_BASE_URL": llm_base_url,
+        "OPENAI_API_KEY": "fake",
+        "SECRET_KEY": "load-test-secret",
+        "CUSTOM_DATABASE_URL": f"sqlite:///{db_path}",
+        "SEARCH_CACHE_PATH": os.path.join(db_dir, run.replace(":", "_") + "_search_cache.sqlite3"),
+        "MOCK_SEARCH_LATENCY_MS": str(args.search_latency),
+        "TELEGRAM_BOT_TOKEN": "",
+        "TELEGRAM_CHAT_ID": "",
+    }
+
+    recorder = Recorder()
+    with AppServer(server, module, args, env) as base:
+        wait_until_ready(base + ready_path)
+
+        # Warm up every worker (first-request setup like db.create_all) outside the measurement
+        warmup = Recorder()
+        for user in range(max(args.workers, 2)):
+            flow(base, warmup, user, 1, stream)
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=args.concurrency) as executor:
+            for future in [executor.submit(flow, base, recorder, user, args.turns, stream)
+                           for user in range(args.users)]:
+                future.result()
+        elapsed = time.perf_counter() - start
+
+    return {"run": run, "elapsed": elapsed, "recorder": recorder}
+
+def print_report(result: Dict) -> List[Dict]:
+    recorder, elapsed = result["recorder"], result["elapsed"]
+    rows = []
+    print(f"\n📊 {result['run']}  ({elapsed:.1f}s wall)")
+    print(f"   {'route':<34}{'count':>7}{'err%':>7}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'req/s':>8}")
+    for route in sorted(recorder.latencies):
+        millis = [s * 1000 for s in recorder.latencies[route]]
+        row = {
+            "run": result["run"], "route": route, "count": len(millis),
+            "error_rate": recorder.errors[route] / len(millis),
+            "p50_ms": percentile(millis, 50), "p95_ms": percentile(millis, 95), "p99_ms": percentile(millis, 99),
+            "mean_ms": statistics.mean(millis), "throughput": len(millis) / elapsed
+        }
+        rows.append(row)
+        print(f"   {route:<34}{row['count']:>7}{row['error_rate']:>7.1%}{row['p50_ms']:>9.0f}"
+              f"{row['p95_ms']:>9.0f}{row['p99_ms']:>9.0f}{row['throughput']:>8.1f}")
+    return rows
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--app", choices=sorted(FLOWS), default="chat")
+    parser.add_argument("--runs", default="inprocess", help="comma-separated <server>[:stream] runs")
+    parser.add_argument("--url", default="http://127.0.0.1:8000", help="target for the 'url' server")
+    parser.add_argument("--users", type=int, default=32, help="conversation flows per run")
+    parser.add_argument("--concurrency", type=int, default=8, help="flows in flight at once")
+    parser.add_argument("--turns", type=int, default=3, help="chat messages per flow")
+    parser.add_argument("--workers", type=int, default=2, help="gunicorn workers")
+    parser.add_argument("--threads", type=int, default=8, help="threads per gthread worker")
+    parser.add_argument("--llm-latency", type=float, default=300, help="fake LLM time to first byte (ms)")
+    parser.add_argument("--token-delay", type=float, default=10, help="fake LLM delay between chunks (ms)")
+    parser.add_argument("--llm-error-rate", type=float, default=0.0)
+    parser.add_argument("--search-latency", type=float, default=300, help="simulated search latency (ms)")
+    parser.add_argument("--json", help="also write the per-route results to this file")
+    parser.add_argument("--verbose", action="store_true", help="show gunicorn output")
+    args = parser.parse_args()
+
+    llm = fake_openai_server.start_server(config=fake_openai_server.FakeConfig(
+        latency_ms=args.llm_latency, jitter_ms=args.llm_latency / 4, token_delay_ms=args.token_delay,
+        error_rate=args.llm_error_rate, error_statuses=(429, 500, 503)
+    ))
+    llm_base_url = fake_openai_server.base_url(llm)
+
+    print("🧪 LOAD TEST")
+    print("=" * 60)
+    print(f"App: {args.app} | users: {args.users} | concurrency: {args.concurrency} | turns: {args.turns}")
+    print(f"Fake LLM: {args.llm_latency:.0f} ms TTFB, {args.token_delay:.0f} ms/chunk, "
+          f"{args.llm_error_rate:.0%} errors | search: {args.search_latency:.0f} ms")
+
+    rows = []
+    with tempfile.TemporaryDirectory(prefix="loadtest-") as db_dir:
+        for run in [run.strip() for run in args.runs.split(",") if run.strip()]:
+            rows += print_report(run_once(run, args, llm_base_url, db_dir))
+
+    print(f"\nFake LLM stats: {llm.RequestHandlerClass.config.stats}")
+    llm.shutdown()
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(rows, f, indent=2, ensure_ascii=False)
+        print(f"Results written to {args.json}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+"""
+Simulated search and notification backends for load tests (no network access needed).
+
+install() replaces the WebSearcher and AsyncWebSearcher backend fetches (DuckDuckGo,
+VnExpress, PubMed) with canned results after a configurable delay, and turns Telegram
+notifications into no-ops. The shared search cache still sits in front of the fakes.
+Call it before importing app.py / medical_app.py (medical_chatbot binds
+send_telegram_message at import time).
+"""
+
+import asyncio
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import telegram_notifier
+from web_search import AsyncWebSearcher, WebSearcher
+
+def _delay(latency_ms: float, jitter_ms: float) -> float:
+    return max(0.0, latency_ms + random.uniform(-jitter_ms, jitter_ms)) / 1000
+
+def _sleep(latency_ms: float, jitter_ms: float):
+    time.sleep(_delay(latency_ms, jitter_ms))
+
+def install(search_latency_ms: float = None, jitter_ms: float = None):
+    """Patch the search/notification backends; defaults come from MOCK_SEARCH_LATENCY_MS / MOCK_SEARCH_JITTER_MS"""
+    if search_latency_ms is None:
+        search_latency_ms = float(os.getenv("MOCK_SEARCH_LATENCY_MS", "300"))
+    if jitter_ms is None:
+        jitter_ms = float(os.getenv("MOCK_SEARCH_JITTER_MS", "100"))
+
+    def duckduckgo_results(query: str, num_results: int) -> list:
+        return [
+            {
+                "title": f"Kết quả mô phỏng {i} cho {query[:40]}",
+                "link": f"https://example.com/ket-qua/{i}",
+                "snippet": "Đoạn trích mô phỏng dùng cho kiểm thử tải, không phải dữ liệu thật."
+            }
+            for i in range(1, num_results + 1)
+        ]
+
+    def news_results(query: str) -> list:
+        return [
+            {"title": f"Tin mô phỏng về {query[:40]}", "link": "https://vnexpress.net/tin-mo-phong",
+             "snippet": "", "source": "VnExpress"}
+        ]
+
+    def pubmed_summary(query: str, num_results: int) -> str:
+        return "Tóm tắt các hướng tiếp cận từ PubMed:\n" + "\n".join(
+            f"- Review mô phỏng {i}: {query[:40]}" for i in range(1, num_results + 1)
+        )
+
+    def fetch_duckduckgo(self, query: str, num_results: int = 3) -> list:
+        _sleep(search_latency_ms, jitter_ms)
+        return duckduckgo_results(query, num_results)
+
+    def fetch_vietnamese_news(self, query: str) -> list:
+        _sleep(search_latency_ms, jitter_ms)
+        return news_results(query)
+
+    def fetch_pubmed(self, query: str, num_results: int = 3) -> str:
+        _sleep(search_latency_ms, jitter_ms)
+        return pubmed_summary(query, num_results)
+
+    def fetch_pubmed_batch(self, queries: list, num_results: int = 3) -> dict:
+        # One simulated round trip per batch, like the single esummary call
+        _sleep(search_latency_ms, jitter_ms)
+        return {query: pubmed_summary(query, num_results) for query in queries}
+
+    async def async_fetch_duckduckgo(self, query: str, num_results: int = 3) -> list:
+        await asyncio.sleep(_delay(search_latency_ms, jitter_ms))
+        return duckduckgo_results(query, num_results)
+
+    async def async_fetch_vietnamese_news(self, query: str) -> list:
+        await asyncio.sleep(_delay(search_latency_ms, jitter_ms))
+        return news_results(query)
+
+    async def async_fetch_pubmed(self, query: str, num_results: int = 3) -> str:
+        await asyncio.sleep(_delay(search_latency_ms, jitter_ms))
+        return pubmed_summary(query, num_results)
+
+    def send_telegram_message(message: str) -> bool:
+        return True
+
+    WebSearcher._fetch_duckduckgo = fetch_duckduckgo
+    WebSearcher._fetch_vietnamese_news = fetch_vietnamese_news
+    WebSearcher._fetch_pubmed = fetch_pubmed
+    WebSearcher._fetch_pubmed_batch = fetch_pubmed_batch
+    AsyncWebSearcher._fetch_duckduckgo = async_fetch_duckduckgo
+    AsyncWebSearcher._fetch_vietnamese_news = async_fetch_vietnamese_news
+    AsyncWebSearcher._fetch_pubmed = async_fetch_pubmed
+    telegram_notifier.send_telegram_message = send_telegram_message
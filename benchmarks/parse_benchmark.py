@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+
+"""
+Micro-benchmark for the search result parsers in web_search.py.
+
+Compares the previous approach (build the whole page tree with html.parser, then
+find_all) with WebSearcher._parse_duckduckgo / _parse_vietnamese_news, which only
+parse the first num_results result containers. Both must return identical results.
+
+The default pages in benchmarks/fixtures/ are SYNTHETIC: generated to mimic the result
+markup the parsers look for, padded with scripts and filler to a realistic size. They
+are not captured DuckDuckGo / VnExpress pages, so their speed-ups only show the
+approach works; measure real pages with --duckduckgo / --vnexpress (e.g. a page saved
+with `curl -o page.html ...`) before quoting numbers.
+
+Usage:
+    python benchmarks/parse_benchmark.py
+    python benchmarks/parse_benchmark.py --iterations 200 --num-results 5
+"""
+
+import argparse
+import os
+import statistics
+import sys
+import time
+from typing import Callable, List
+
+from bs4 import BeautifulSoup
+
+BENCHMARKS_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT_DIR = os.path.dirname(BENCHMARKS_DIR)
+FIXTURES_DIR = os.path.join(BENCHMARKS_DIR, "fixtures")
+sys.path.insert(0, ROOT_DIR)
+
+from web_search import HTML_PARSER, WebSearcher
+
+def full_parse_duckduckgo(content: bytes, num_results: int) -> list:
+    """The parser before targeted parsing: whole page, html.parser"""
+    soup = BeautifulSoup(content, 'html.parser')
+    results = []
+    for result in soup.find_all('div', class_='result')[:num_results]:
+        title_elem = result.find('a', class_='result__a')
+        snippet_elem = result.find('a', class_='result__snippet')
+        if title_elem:
+            results.append({
+                'title': title_elem.get_text().strip(),
+                'link': title_elem.get('href'),
+                'snippet': snippet_elem.get_text().strip() if snippet_elem else ""
+            })
+    return results
+
+def full_parse_vietnamese_news(content: bytes, num_results: int) -> list:
+    soup = BeautifulSoup(content, 'html.parser')
+    results = []
+    for item in soup.find_all('div', class_='item-news')[:num_results]:
+        title_elem = item.find('h3', class_='title-news')
+        link_elem = item.find('a')
+        if title_elem and link_elem:
+            results.append({
+                'title': title_elem.get_text().strip(),
+                'link': link_elem.get('href'),
+                'snippet': '',
+                'source': 'VnExpress'
+            })
+    return results
+
+def time_parser(parser: Callable, content: bytes, num_results: int, iterations: int) -> List[float]:
+    timings = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        parser(content, num_results)
+        timings.append((time.perf_counter() - start) * 1000)
+    return timings
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--duckduckgo", default=os.path.join(FIXTURES_DIR, "duckduckgo_search.html"))
+    parser.add_argument("--vnexpress", default=os.path.join(FIXTURES_DIR, "vnexpress_search.html"))
+    parser.add_argument("--iterations", type=int, default=50)
+    parser.add_argument("--num-results", type=int, default=None,
+                        help="results to keep (default: 3 for DuckDuckGo, 2 for VnExpress, as in web_search.py)")
+    args = parser.parse_args()
+
+    cases = [
+        ("duckduckgo", args.duckduckgo, args.num_results or 3, full_parse_duckduckgo, WebSearcher._parse_duckduckgo),
+        ("vnexpress", args.vnexpress, args.num_results or 2, full_parse_vietnamese_news, WebSearcher._parse_vietnamese_news),
+    ]
+
+    print(f"Tree builder: {HTML_PARSER}, {args.iterations} iterations")
+    if any(os.path.dirname(os.path.abspath(path)) == FIXTURES_DIR for path in (args.duckduckgo, args.vnexpress)):
+        print("Note: the default pages are synthetic fixtures, not captured search pages")
+    print()
+    print(f"{'page':<12}{'size KB':>9}{'results':>9}{'full p50 ms':>13}{'targeted p50 ms':>17}{'speed-up':>10}")
+    for name, path, num_results, baseline, targeted in cases:
+        with open(path, "rb") as f:
+            content = f.read()
+
+        expected = baseline(content, num_results)
+        actual = targeted(content, num_results)
+        if actual != expected:
+            print(f"{name}: targeted parse differs from the full parse\n  full:     {expected}\n  targeted: {actual}")
+            sys.exit(1)
+
+        full_ms = statistics.median(time_parser(baseline, content, num_results, args.iterations))
+        targeted_ms = statistics.median(time_parser(targeted, content, num_results, args.iterations))
+        print(f"{name:<12}{len(content) / 1024:>9.1f}{len(actual):>9}{full_ms:>13.2f}{targeted_ms:>17.2f}"
+              f"{full_ms / targeted_ms:>9.1f}x")
+
+if __name__ == "__main__":
+    main()
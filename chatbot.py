@@ -1,83 +1,83 @@
-import openai
 import os
-from typing import List, Dict
-from web_search import WebSearcher
+from typing import List, Dict, Iterator, Optional, Tuple
+from managers.history_manager import HistoryManager
+from managers.llm_gateway import get_llm_gateway
+from managers.session_store import SessionStore
+from managers.summary_manager import SummaryManager
+from managers.response_cache import ResponseCache
+from managers.search_manager import SearchManager, SEARCH_MODE_PIPELINE, SEARCH_MODE_TOOLS
 
 class SimpleChatbot:
-    def __init__(self, api_key: str = None):
-        self.client = openai.OpenAI(api_key=api_key or os.getenv("OPENAI_API_KEY"))
-        self.conversation_history: List[Dict[str, str]] = []
-        self.web_searcher = WebSearcher()
-
-    def add_message(self, role: str, content: str):
-        self.conversation_history.append({"role": role, "content": content})
+    def __init__(self, api_key: str = None, max_history: int = 20, max_history_tokens: int = 3000,
+                 session_store: SessionStore = None, search_mode: str = None,
+                 compact_history: bool = None, response_cache: bool = None):
+        self.client = get_llm_gateway(api_key)
+        self.completion_args = {"model": "gpt-3.5-turbo", "max_tokens": 500, "temperature": 0.7}
+        self.history_manager = HistoryManager(max_messages=max_history, max_tokens=max_history_tokens)
+        self.session_store = session_store
+        self.search_manager = self._create_search_manager()
+        self.web_searcher = self.search_manager.web_searcher
+
+        # "pipeline" (decision call + search + answer) or "tools" (model calls web_search itself)
+        self.search_mode = search_mode or os.getenv("CHAT_SEARCH_MODE", SEARCH_MODE_PIPELINE)
+
+        # Rolling summary of old turns, generated in the background once history gets long
+        if compact_history is None:
+            compact_history = os.getenv("CHAT_COMPACT_HISTORY", "1") == "1"
+        self.summary_manager = SummaryManager(openai_client=self.client) if compact_history else None
+
+        # Opt-in answer cache for context-free questions (exact + near-duplicate match)
+        if response_cache is None:
+            response_cache = os.getenv("CHAT_RESPONSE_CACHE", "0") == "1"
+        self.response_cache = ResponseCache() if response_cache else None
+
+    def _create_search_manager(self) -> SearchManager:
+        return SearchManager(openai_client=self.client)
+
+    @property
+    def conversation_history(self) -> List[Dict[str, str]]:
+        """Default (non-session) conversation history"""
+        return self.history_manager.get_history()
+
+    def _get_history_manager(self, session_id: str = None) -> HistoryManager:
+        """Per-client history when a session store is configured, else the default one"""
+        if self.session_store is not None and session_id:
+            return self.session_store.get_history(session_id)
+        return self.history_manager
+
+    def add_message(self, role: str, content: str, session_id: str = None):
+        self._get_history_manager(session_id).add_message(role, content)
 
     def needs_web_search(self, user_message: str) -> bool:
-        """Use LLM to intelligently decide if web search is needed"""
-        try:
-            decision_prompt = f"""Câu hỏi này có cần tìm kiếm thông tin CẬP NHẬT trên Internet không?
-
-Chỉ trả lời: "CÓ" hoặc "KHÔNG"
-
-CẦN tìm kiếm khi:
-- Hỏi về lãnh đạo hiện tại, chính phủ hiện tại
-- Giá cả hiện tại, thống kê mới nhất
-- Tin tức, sự kiện đang diễn ra
-- Thời tiết hôm nay/hiện tại
-
-KHÔNG cần tìm kiếm khi:
-- Hỏi CÁCH LÀM gì đó (nấu ăn, sửa chữa, học tập)
-- Hỏi CÔNG THỨC món ăn
-- Giải thích khái niệm, định nghĩa
-- Kiến thức tổng quát không đổi theo thời gian
-
-Câu hỏi: "{user_message}"
+        """Use LLM to intelligently decide if web search is needed (memoized per normalized question)"""
+        return self.search_manager.needs_web_search(user_message)
 
-Trả lời:"""
+    def _prepare_messages(self, history_manager: HistoryManager, user_message: str) -> Tuple[List[Dict[str, str]], bool]:
+        """
+        Record the user turn and build the messages to send, searching the web if needed.
+        Also returns whether the answer may rely on search results.
+        """
+        history_manager.add_message("user", user_message)
 
-            response = self.client.chat.completions.create(
-                model="gpt-3.5-turbo",
-                messages=[{"role": "user", "content": decision_prompt}],
-                max_tokens=10,
-                temperature=0.1
-            )
-
-            decision = response.choices[0].message.content.strip().upper()
-            needs_search = "CÓ" in decision
-
-            print(f"DEBUG: LLM decision for '{user_message}': {decision} -> needs_search: {needs_search}")
-            return needs_search
+        # In tool-calling mode the model decides itself whether to search (reported by the completion)
+        if self.search_mode == SEARCH_MODE_TOOLS:
+            return history_manager.get_history(), False
 
-        except Exception as e:
-            print(f"DEBUG: LLM decision failed, falling back to keywords: {e}")
-            # Fallback to keyword-based approach if LLM fails
-            search_keywords = [
-                'hiện tại', 'bây giờ', 'mới nhất', 'cập nhật', 'tình hình',
-                'tổng bí thư', 'chủ tịch nước', 'thủ tướng', 'lãnh đạo',
-                'tin tức', 'tin mới', 'hôm nay', 'năm 2024', 'năm 2025',
-                'ai đang', 'giờ có', 'giờ là', 'đang là', 'có bao nhiêu',
-                'web search', 'tìm kiếm', 'search', 'ngày mấy'
-            ]
-            message_lower = user_message.lower()
-            return any(keyword in message_lower for keyword in search_keywords)
-
-    def get_response(self, user_message: str) -> str:
-        self.add_message("user", user_message)
-
-        try:
-            # Check if we need web search for current information
-            needs_search = self.needs_web_search(user_message)
+        # Check if we need web search for current information (optionally searching speculatively)
+        needs_search, search_results = self.search_manager.should_search_and_get_results(user_message)
+        return self._build_messages(history_manager, user_message, needs_search, search_results)
 
-            if needs_search:
-                print("🔍 Đang tìm kiếm thông tin mới nhất...")
-                search_results = self.web_searcher.search_and_summarize(user_message)
+    def _build_messages(self, history_manager: HistoryManager, user_message: str,
+                        needs_search: bool, search_results: str) -> Tuple[List[Dict[str, str]], bool]:
+        """Messages for the answer call once the search decision (and results) are known"""
+        if needs_search:
 
-                # CRITICAL FIX: Preserve conversation history and enhance the last message
-                # Get all conversation history except the last user message
-                messages_for_api = self.conversation_history[:-1].copy()
+            # CRITICAL FIX: Preserve conversation history and enhance the last message
+            # Get all conversation history except the last user message
+            messages_for_api = history_manager.get_history_except_last()
 
-                # Create enhanced prompt that includes search results
-                enhanced_prompt = f"""Dựa trên thông tin tìm kiếm mới nhất từ web:
+            # Create enhanced prompt that includes search results
+            enhanced_prompt = f"""Dựa trên thông tin tìm kiếm mới nhất từ web:
 
 {search_results}
 
@@ -85,33 +85,114 @@ Hãy trả lời câu hỏi: {user_message}
 
 Lưu ý: Ưu tiên thông tin từ kết quả tìm kiếm nếu có, kết hợp với ngữ cảnh cuộc trò chuyện trước đó, và trả lời bằng tiếng Việt một cách chính xác, cập nhất."""
 
-                # Add the enhanced prompt as the new user message
-                messages_for_api.append({"role": "user", "content": enhanced_prompt})
-                messages = messages_for_api
+            # Add the enhanced prompt as the new user message
+            messages_for_api.append({"role": "user", "content": enhanced_prompt})
 
-                # Update conversation history to reflect what was actually sent to the API
-                self.conversation_history[-1] = {"role": "user", "content": enhanced_prompt}
-            else:
-                # Use normal conversation history
-                messages = self.conversation_history
-
-            response = self.client.chat.completions.create(
-                model="gpt-3.5-turbo",
-                messages=messages,
-                max_tokens=500,
-                temperature=0.7
+            # Only this turn sees the full results; history keeps the question plus a short digest
+            history_manager.update_last_message(
+                "user", self.search_manager.create_search_record(user_message, search_results)
             )
+            return messages_for_api, True
+
+        # Use normal conversation history
+        return history_manager.get_history(), False
+
+    def get_response(self, user_message: str, session_id: str = None) -> str:
+        history_manager = self._get_history_manager(session_id)
+        cacheable, cached_answer = self._lookup_cached_response(history_manager, user_message)
+        if cached_answer is not None:
+            return cached_answer
 
-            assistant_message = response.choices[0].message.content
-            self.add_message("assistant", assistant_message)
+        try:
+            messages, used_search = self._prepare_messages(history_manager, user_message)
+
+            if self.search_mode == SEARCH_MODE_TOOLS:
+                turn = {"searched": False}
+                assistant_message = self.search_manager.complete_with_tools(messages, turn=turn, **self.completion_args)
+                used_search = turn["searched"]
+            else:
+                response = self.client.chat.completions.create(
+                    messages=messages,
+                    **self.completion_args
+                )
+                assistant_message = response.choices[0].message.content
+            self._finish_turn(history_manager, user_message, assistant_message, cacheable, used_search)
 
             return assistant_message
 
         except Exception as e:
             return f"Lỗi: {str(e)}"
 
-    def clear_history(self):
-        self.conversation_history = []
+    def stream_response(self, user_message: str, session_id: str = None) -> Iterator[str]:
+        """Like get_response, but yields the answer in chunks as OpenAI produces them"""
+        history_manager = self._get_history_manager(session_id)
+        cacheable, cached_answer = self._lookup_cached_response(history_manager, user_message)
+        if cached_answer is not None:
+            yield cached_answer
+            return
+
+        try:
+            messages, used_search = self._prepare_messages(history_manager, user_message)
+
+            chunks, turn = [], {"searched": False}
+            for delta in self._stream_completion(messages, turn):
+                chunks.append(delta)
+                yield delta
+
+            self._finish_turn(history_manager, user_message, "".join(chunks), cacheable,
+                              used_search or turn["searched"])
+
+        except Exception as e:
+            yield f"Lỗi: {str(e)}"
+
+    def _lookup_cached_response(self, history_manager: HistoryManager, user_message: str) -> Tuple[bool, Optional[str]]:
+        """
+        (cacheable, cached answer). Only a conversation's first turn uses the response cache;
+        a hit is recorded in the history like a normal turn.
+        """
+        if self.response_cache is None:
+            return False, None
+        if not self.response_cache.is_context_free(history_manager.get_history()):
+            return False, None
+
+        cached_answer = self.response_cache.get(user_message)
+        if cached_answer is not None:
+            history_manager.add_message("user", user_message)
+            history_manager.add_message("assistant", cached_answer)
+        return True, cached_answer
+
+    def _finish_turn(self, history_manager: HistoryManager, user_message: str, assistant_message: str,
+                     cacheable: bool, used_search: bool):
+        """Record the answer, compact the history if needed and cache the answer if allowed"""
+        history_manager.add_message("assistant", assistant_message)
+        self._maybe_compact(history_manager)
+        if cacheable:
+            self.response_cache.set(user_message, assistant_message, from_search=used_search)
+
+    def _maybe_compact(self, history_manager: HistoryManager):
+        if self.summary_manager is not None:
+            self.summary_manager.maybe_compact(history_manager)
+
+    def _stream_completion(self, messages: List[Dict[str, str]], turn: Dict = None) -> Iterator[str]:
+        """Yield answer text deltas for the configured search mode (turn: see complete_with_tools)"""
+        if self.search_mode == SEARCH_MODE_TOOLS:
+            yield from self.search_manager.stream_with_tools(messages, turn=turn, **self.completion_args)
+            return
+
+        stream = self.client.chat.completions.create(
+            messages=messages,
+            stream=True,
+            **self.completion_args
+        )
+        for chunk in stream:
+            if chunk.choices and chunk.choices[0].delta.content:
+                yield chunk.choices[0].delta.content
+
+    def clear_history(self, session_id: str = None):
+        if self.session_store is not None and session_id:
+            self.session_store.drop(session_id)
+        else:
+            self.history_manager.clear()
 
 def main():
     print("🤖 Chatbot Demo - Nhập 'quit' để thoát")
@@ -2,13 +2,16 @@
 Refactored SimpleChatbot following Single Responsibility Principle
 """
 
-import openai
 import os
-from typing import List, Dict
+from typing import List, Dict, Iterator, Optional, Tuple
 
 from managers.history_manager import HistoryManager
-from managers.search_manager import SearchManager
+from managers.llm_gateway import get_llm_gateway
+from managers.search_manager import SearchManager, SEARCH_MODE_PIPELINE, SEARCH_MODE_TOOLS
 from managers.prompt_manager import PromptManager
+from managers.session_store import SessionStore
+from managers.summary_manager import SummaryManager
+from managers.response_cache import ResponseCache
 
 class SimpleChatbot:
     """
@@ -17,80 +20,207 @@ class SimpleChatbot:
     - HistoryManager: Conversation history with sliding window
     - SearchManager: Web search decision making and execution
     - PromptManager: Prompt creation and template management
+    - SessionStore (optional): One bounded HistoryManager per client session
+    - SummaryManager (optional): Background compaction of old turns into a running summary
+    - ResponseCache (optional): Reuses answers to context-free, repeated or near-duplicate questions
+
+    search_mode selects how web search is wired in:
+    - "pipeline": decision call -> web search -> answer call
+    - "tools": one completion with web_search exposed as a tool (second call only if it is used)
     """
 
-    def __init__(self, api_key: str = None, max_history: int = 20):
-        # Initialize OpenAI client
-        self.client = openai.OpenAI(api_key=api_key or os.getenv("OPENAI_API_KEY"))
+    def __init__(self, api_key: str = None, max_history: int = 20, max_history_tokens: int = 3000,
+                 session_store: SessionStore = None, search_mode: str = None,
+                 compact_history: bool = None, response_cache: bool = None):
+        # Shared OpenAI gateway (pooled client, timeouts, retries, concurrency limit)
+        self.client = get_llm_gateway(api_key)
+        self.completion_args = {"model": "gpt-3.5-turbo", "max_tokens": 500, "temperature": 0.7}
+        self.search_mode = search_mode or os.getenv("CHAT_SEARCH_MODE", SEARCH_MODE_PIPELINE)
 
         # Initialize specialized managers
-        self.history_manager = HistoryManager(max_messages=max_history)
+        self.history_manager = HistoryManager(max_messages=max_history, max_tokens=max_history_tokens)
         self.search_manager = SearchManager(openai_client=self.client)
         self.prompt_manager = PromptManager()
+        self.session_store = session_store
+
+        if compact_history is None:
+            compact_history = os.getenv("CHAT_COMPACT_HISTORY", "1") == "1"
+        self.summary_manager = SummaryManager(openai_client=self.client) if compact_history else None
+
+        if response_cache is None:
+            response_cache = os.getenv("CHAT_RESPONSE_CACHE", "0") == "1"
+        self.response_cache = ResponseCache() if response_cache else None
 
-    def get_response(self, user_message: str) -> str:
+    def _get_history_manager(self, session_id: str = None) -> HistoryManager:
+        """Get the history for a client session, or the shared default history"""
+        if self.session_store is not None and session_id:
+            return self.session_store.get_history(session_id)
+        return self.history_manager
+
+    def _prepare_messages(self, history_manager: HistoryManager, user_message: str) -> Tuple[List[Dict[str, str]], bool]:
         """
-        Main orchestration method - coordinates between managers
+        Record the user turn and build the API messages (steps 1-3 of the pipeline).
+        Also returns whether the answer may rely on search results.
         """
-        try:
-            # 1. Add user message to history
-            self.history_manager.add_message("user", user_message)
+        # 1. Add user message to history
+        history_manager.add_message("user", user_message)
 
-            # 2. Check if web search is needed and get results
-            needs_search, search_results = self.search_manager.should_search_and_get_results(user_message)
+        # In tool-calling mode the model decides itself whether to search (reported by the completion)
+        if self.search_mode == SEARCH_MODE_TOOLS:
+            return history_manager.get_history(), False
 
-            # 3. Prepare messages for API based on search results
-            if needs_search:
-                # Get history without the last message for context preservation
-                messages_for_api = self.history_manager.get_history_except_last()
+        # 2. Check if web search is needed and get results
+        needs_search, search_results = self.search_manager.should_search_and_get_results(user_message)
 
-                # Create enhanced prompt with search results
-                enhanced_prompt = self.prompt_manager.create_web_search_prompt(
-                    user_message, search_results
-                )
+        # 3. Prepare messages for API based on search results
+        if needs_search:
+            # Get history without the last message for context preservation
+            messages_for_api = history_manager.get_history_except_last()
 
-                # Add enhanced prompt and update history
-                messages_for_api.append({"role": "user", "content": enhanced_prompt})
-                self.history_manager.update_last_message("user", enhanced_prompt)
-            else:
-                # Use standard conversation flow
-                messages_for_api = self.history_manager.get_history()
+            # Create enhanced prompt with search results
+            enhanced_prompt = self.prompt_manager.create_web_search_prompt(
+                user_message, search_results
+            )
 
-            # 4. Call OpenAI API
-            response = self.client.chat.completions.create(
-                model="gpt-3.5-turbo",
-                messages=messages_for_api,
-                max_tokens=500,
-                temperature=0.7
+            # Send the full results this turn only; history keeps the question plus a digest
+            messages_for_api.append({"role": "user", "content": enhanced_prompt})
+            history_manager.update_last_message(
+                "user", self.search_manager.create_search_record(user_message, search_results)
             )
+            return messages_for_api, True
+
+        # Use standard conversation flow
+        return history_manager.get_history(), False
+
+    def get_response(self, user_message: str, session_id: str = None) -> str:
+        """
+        Main orchestration method - coordinates between managers
+        """
+        history_manager = self._get_history_manager(session_id)
+
+        # 0. Reuse a cached answer for context-free repeated questions
+        cacheable, cached_answer = self._lookup_cached_response(history_manager, user_message)
+        if cached_answer is not None:
+            return cached_answer
+
+        try:
+            messages_for_api, used_search = self._prepare_messages(history_manager, user_message)
+
+            # 4. Call OpenAI API
+            if self.search_mode == SEARCH_MODE_TOOLS:
+                turn = {"searched": False}
+                assistant_message = self.search_manager.complete_with_tools(
+                    messages_for_api, turn=turn, **self.completion_args
+                )
+                used_search = turn["searched"]
+            else:
+                response = self.client.chat.completions.create(
+                    messages=messages_for_api,
+                    **self.completion_args
+                )
+                assistant_message = response.choices[0].message.content
 
             # 5. Add assistant response to history and return
-            assistant_message = response.choices[0].message.content
-            self.history_manager.add_message("assistant", assistant_message)
+            history_manager.add_message("assistant", assistant_message)
+            self._maybe_compact(history_manager)
+            if cacheable:
+                self.response_cache.set(user_message, assistant_message, from_search=used_search)
 
             return assistant_message
 
         except Exception as e:
             error_message = f"Lỗi: {str(e)}"
-            self.history_manager.add_message("assistant", error_message)
+            history_manager.add_message("assistant", error_message)
             return error_message
 
+    def stream_response(self, user_message: str, session_id: str = None) -> Iterator[str]:
+        """
+        Streaming variant of get_response - yields answer chunks as they arrive
+        """
+        history_manager = self._get_history_manager(session_id)
+
+        cacheable, cached_answer = self._lookup_cached_response(history_manager, user_message)
+        if cached_answer is not None:
+            yield cached_answer
+            return
+
+        try:
+            messages_for_api, used_search = self._prepare_messages(history_manager, user_message)
+
+            # 4. Call OpenAI API in streaming mode
+            chunks, turn = [], {"searched": False}
+            for delta in self._stream_completion(messages_for_api, turn):
+                chunks.append(delta)
+                yield delta
+            used_search = used_search or turn["searched"]
+
+            # 5. Add the assembled assistant response to history
+            assistant_message = "".join(chunks)
+            history_manager.add_message("assistant", assistant_message)
+            self._maybe_compact(history_manager)
+            if cacheable:
+                self.response_cache.set(user_message, assistant_message, from_search=used_search)
+
+        except Exception as e:
+            error_message = f"Lỗi: {str(e)}"
+            history_manager.add_message("assistant", error_message)
+            yield error_message
+
+    def _lookup_cached_response(self, history_manager: HistoryManager, user_message: str) -> Tuple[bool, Optional[str]]:
+        """
+        Returns (cacheable, cached answer). Only a conversation's first turn uses
+        the cache; a hit is recorded in the history.
+        """
+        if self.response_cache is None:
+            return False, None
+        if not self.response_cache.is_context_free(history_manager.get_history()):
+            return False, None
+
+        cached_answer = self.response_cache.get(user_message)
+        if cached_answer is not None:
+            history_manager.add_message("user", user_message)
+            history_manager.add_message("assistant", cached_answer)
+        return True, cached_answer
+
+    def _maybe_compact(self, history_manager: HistoryManager):
+        """Schedule background summarization of old turns (never blocks the reply)"""
+        if self.summary_manager is not None:
+            self.summary_manager.maybe_compact(history_manager)
+
+    def _stream_completion(self, messages_for_api: List[Dict[str, str]], turn: Dict = None) -> Iterator[str]:
+        """Yield answer text deltas for the configured search mode (turn: see complete_with_tools)"""
+        if self.search_mode == SEARCH_MODE_TOOLS:
+            yield from self.search_manager.stream_with_tools(messages_for_api, turn=turn, **self.completion_args)
+            return
+
+        stream = self.client.chat.completions.create(
+            messages=messages_for_api,
+            stream=True,
+            **self.completion_args
+        )
+        for chunk in stream:
+            if chunk.choices and chunk.choices[0].delta.content:
+                yield chunk.choices[0].delta.content
+
     # Convenience methods for external access
-    def add_message(self, role: str, content: str):
+    def add_message(self, role: str, content: str, session_id: str = None):
         """Add a message to conversation history"""
-        self.history_manager.add_message(role, content)
+        self._get_history_manager(session_id).add_message(role, content)
 
-    def clear_history(self):
+    def clear_history(self, session_id: str = None):
         """Clear conversation history"""
-        self.history_manager.clear()
+        if self.session_store is not None and session_id:
+            self.session_store.drop(session_id)
+        else:
+            self.history_manager.clear()
 
-    def get_conversation_history(self) -> List[Dict[str, str]]:
+    def get_conversation_history(self, session_id: str = None) -> List[Dict[str, str]]:
         """Get current conversation history"""
-        return self.history_manager.get_history()
+        return self._get_history_manager(session_id).get_history()
 
-    def get_message_count(self) -> int:
+    def get_message_count(self, session_id: str = None) -> int:
         """Get total number of messages in history"""
-        return self.history_manager.get_message_count()
+        return self._get_history_manager(session_id).get_message_count()
 
 # For backward compatibility and testing
 def main():
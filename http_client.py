@@ -0,0 +1,184 @@
+"""
+Shared outbound HTTP layer for scraping (WebSearcher) and notifications (telegram_notifier)
+
+One requests.Session per host and per worker process, so repeated searches reuse
+keep-alive TCP/TLS connections instead of handshaking with DuckDuckGo, VnExpress or
+NCBI on every call. Each session has:
+- a bounded connection pool (HTTP_POOL_SIZE connections per host)
+- separate connect and read timeouts (HTTP_CONNECT_TIMEOUT; read timeout per call)
+- retries with exponential backoff: GET/HEAD on connection errors and 429/5xx
+  (Retry-After honored); other methods only when the connection failed. Read timeouts
+  are never retried, so a slow host costs one read timeout, not one per attempt
+- rate-limited APIs (NCBI) go through get_rate_limited() instead: urllib3 does not
+  retry those hosts, and every attempt, retries included, first takes a limiter token
+
+get_stats() / the chatbot_outbound_http_connections metric report requests per host
+and how many of them opened a new connection. With HTTP_FIXTURE_MODE set, the sessions
+record or replay responses instead (see http_fixtures.py).
+"""
+
+import os
+import threading
+import time
+from typing import Callable, Dict, Tuple
+from urllib.parse import urlsplit
+
+import requests
+from urllib3.util.retry import Retry
+
+import http_fixtures
+from metrics import OUTBOUND_CONNECTIONS
+
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+# Longest Retry-After honored by get_rate_limited()
+MAX_RETRY_AFTER = 10
+
+class HostSessionPool:
+    def __init__(self, pool_size: int = 10, connect_timeout: float = 3.05, retries: int = 2,
+                 backoff_factor: float = 0.3):
+        self.pool_size = pool_size
+        self.connect_timeout = connect_timeout
+        self.retries = retries
+        self.backoff_factor = backoff_factor
+
+        self._sessions: Dict[str, requests.Session] = {}
+        self._rate_limited_hosts = set()
+        self._pid = os.getpid()
+        self._lock = threading.Lock()
+
+    def _retry_policy(self, host: str) -> Retry:
+        if host in self._rate_limited_hosts:
+            # Retried by get_rate_limited(), which takes a limiter token per attempt
+            return Retry(total=0, read=False, raise_on_status=False)
+        return Retry(
+            total=self.retries,
+            connect=self.retries,
+            read=False,  # re-raise read timeouts as ReadTimeout instead of retrying them
+            status=self.retries,
+            backoff_factor=self.backoff_factor,
+            status_forcelist=RETRY_STATUSES,
+            allowed_methods=frozenset({"GET", "HEAD"}),
+            respect_retry_after_header=True,
+            raise_on_status=False
+        )
+
+    def session_for(self, url: str) -> requests.Session:
+        """The keep-alive session for url's host (rebuilt in a forked worker)"""
+        host = urlsplit(url).netloc.lower()
+        with self._lock:
+            if self._pid != os.getpid():
+                # Never share sockets inherited from the parent process
+                self._sessions = {}
+                self._pid = os.getpid()
+
+            session = self._sessions.get(host)
+            if session is None:
+                session = requests.Session()
+                adapter = http_fixtures.requests_adapter(pool_connections=1, pool_maxsize=self.pool_size,
+                                                         max_retries=self._retry_policy(host))
+                session.mount("https://", adapter)
+                session.mount("http://", adapter)
+                self._sessions[host] = session
+            return session
+
+    def request(self, method: str, url: str, timeout: float = 10, **kwargs) -> requests.Response:
+        """Like requests.request; timeout is the read timeout (or a (connect, read) tuple)"""
+        if not isinstance(timeout, tuple):
+            timeout = (self.connect_timeout, timeout)
+        return self.session_for(url).request(method, url, timeout=timeout, **kwargs)
+
+    def get(self, url: str, **kwargs) -> requests.Response:
+        return self.request("GET", url, **kwargs)
+
+    def get_rate_limited(self, url: str, acquire: Callable[[], float], **kwargs) -> requests.Response:
+        """
+        GET for a rate-limited API: acquire() (e.g. TokenBucket.acquire) runs before every
+        attempt; connection errors and 429/5xx are retried with backoff, read timeouts are not
+        """
+        host = urlsplit(url).netloc.lower()
+        with self._lock:
+            if host not in self._rate_limited_hosts:
+                self._rate_limited_hosts.add(host)
+                # A session built before the host was marked still retries inside urllib3
+                stale = self._sessions.pop(host, None)
+                if stale is not None:
+                    stale.close()
+
+        for attempt in range(self.retries + 1):
+            last_attempt = attempt == self.retries
+            acquire()
+            try:
+                response = self.get(url, **kwargs)
+            except requests.exceptions.ConnectionError:
+                if last_attempt:
+                    raise
+                time.sleep(self._backoff(attempt))
+                continue
+
+            if response.status_code not in RETRY_STATUSES or last_attempt:
+                return response
+            time.sleep(self._backoff(attempt, response.headers.get("Retry-After")))
+
+    def _backoff(self, attempt: int, retry_after: str = None) -> float:
+        delay = self.backoff_factor * (2 ** attempt)
+        if retry_after:
+            try:
+                delay = max(delay, min(float(retry_after), MAX_RETRY_AFTER))
+            except ValueError:
+                pass
+        return delay
+
+    def post(self, url: str, **kwargs) -> requests.Response:
+        return self.request("POST", url, **kwargs)
+
+    def connection_stats(self) -> Dict[Tuple[str, str], int]:
+        """{(host, "new" | "reused"): requests} from the urllib3 pools"""
+        stats: Dict[Tuple[str, str], int] = {}
+        with self._lock:
+            sessions = dict(self._sessions) if self._pid == os.getpid() else {}
+
+        for host, session in sessions.items():
+            adapter = session.get_adapter("https://")
+            new = requests_made = 0
+            for key in list(adapter.poolmanager.pools.keys()):
+                pool = adapter.poolmanager.pools.get(key)
+                if pool is not None:
+                    new += pool.num_connections
+                    requests_made += pool.num_requests
+            stats[(host, "new")] = new
+            stats[(host, "reused")] = max(0, requests_made - new)
+        return stats
+
+    def get_stats(self) -> Dict[str, Dict[str, int]]:
+        """Per host: requests, new connections and reused connections"""
+        report: Dict[str, Dict[str, int]] = {}
+        for (host, kind), value in self.connection_stats().items():
+            report.setdefault(host, {})[kind] = value
+        for counts in report.values():
+            counts["requests"] = counts.get("new", 0) + counts.get("reused", 0)
+        return report
+
+    def close(self):
+        with self._lock:
+            for session in self._sessions.values():
+                session.close()
+            self._sessions = {}
+
+pool = HostSessionPool(
+    pool_size=int(os.getenv("HTTP_POOL_SIZE", "10")),
+    connect_timeout=float(os.getenv("HTTP_CONNECT_TIMEOUT", "3.05")),
+    retries=int(os.getenv("HTTP_RETRIES", "2"))
+)
+OUTBOUND_CONNECTIONS.set_function(pool.connection_stats)
+
+def get(url: str, **kwargs) -> requests.Response:
+    return pool.get(url, **kwargs)
+
+def post(url: str, **kwargs) -> requests.Response:
+    return pool.post(url, **kwargs)
+
+def get_rate_limited(url: str, acquire: Callable[[], float], **kwargs) -> requests.Response:
+    return pool.get_rate_limited(url, acquire, **kwargs)
+
+def get_stats() -> Dict[str, Dict[str, int]]:
+    return pool.get_stats()
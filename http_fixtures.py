@@ -0,0 +1,234 @@
+"""
+Record/replay of outbound HTTP (WebSearcher scraping, NCBI, Telegram) for offline runs
+
+HTTP_FIXTURE_MODE=record   real requests go out; every response is also saved to HTTP_FIXTURE_DIR
+HTTP_FIXTURE_MODE=replay   no network: saved responses are served, after HTTP_FIXTURE_LATENCY_MS
+                           ("recorded" = the latency measured while recording); a request
+                           without a fixture fails like a connection error
+
+Responses are matched on method + URL + body, falling back to method + URL (so a
+Telegram message with different text still gets the recorded sendMessage reply).
+Secrets never reach the disk: the Telegram bot token and NCBI api_key are redacted
+from URLs before they are used as keys, and Telegram response bodies (which echo the
+patient summary and chat details) are cut down to ok / message_id / date / error.
+The default directory is gitignored. The transports plug into http_client's
+per-host sessions (requests) and AsyncWebSearcher's httpx client.
+"""
+
+import asyncio
+import base64
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+from typing import Dict, Optional
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+from requests.structures import CaseInsensitiveDict
+from requests.utils import get_encoding_from_headers
+
+_BOT_TOKEN_RE = re.compile(r"/bot[^/]+/")
+# Hosts whose response bodies echo what we sent them (patient summaries)
+_REDACTED_BODY_HOSTS = {"api.telegram.org"}
+_KEPT_TELEGRAM_FIELDS = ("ok", "error_code", "description")
+_KEPT_TELEGRAM_RESULT_FIELDS = ("message_id", "date")
+_SECRET_PARAMS = {"api_key", "token"}
+# Bodies are stored decoded, so transfer/encoding headers from the wire no longer apply
+_KEPT_HEADERS = ("content-type", "location", "retry-after")
+
+def redact_url(url: str) -> str:
+    parts = urlsplit(_BOT_TOKEN_RE.sub("/bot<redacted>/", url))
+    query = [(k, v) for k, v in parse_qsl(parts.query, keep_blank_values=True) if k not in _SECRET_PARAMS]
+    return urlunsplit(parts._replace(query=urlencode(query)))
+
+def redact_body(url: str, content: bytes) -> bytes:
+    """Response body as stored: Telegram replies keep only delivery status fields"""
+    if urlsplit(url).hostname not in _REDACTED_BODY_HOSTS:
+        return content
+    try:
+        reply = json.loads(content)
+    except ValueError:
+        return b""
+    if not isinstance(reply, dict):
+        return b""
+    redacted = {key: reply[key] for key in _KEPT_TELEGRAM_FIELDS if key in reply}
+    if isinstance(reply.get("result"), dict):
+        redacted["result"] = {key: reply["result"][key] for key in _KEPT_TELEGRAM_RESULT_FIELDS
+                              if key in reply["result"]}
+    return json.dumps(redacted).encode("utf-8")
+
+def _as_bytes(body) -> bytes:
+    if body is None:
+        return b""
+    return body.encode("utf-8") if isinstance(body, str) else bytes(body)
+
+class FixtureStore:
+    def __init__(self, directory: str, latency: str = "0"):
+        """latency: milliseconds added to every replayed response, or 'recorded'"""
+        self.directory = directory
+        self.latency = latency
+        self.stats = {"recorded": 0, "replayed": 0, "missing": 0}
+        self._lock = threading.Lock()
+
+    def _paths(self, method: str, url: str, body: bytes):
+        """Exact (method + URL + body) and loose (method + URL) fixture files"""
+        url = redact_url(url)
+        host = urlsplit(url).netloc.lower().replace(":", "_") or "unknown"
+        exact = hashlib.sha1(f"{method} {url}\n".encode("utf-8") + body).hexdigest()[:20]
+        loose = hashlib.sha1(f"{method} {url}\n".encode("utf-8")).hexdigest()[:20]
+        folder = os.path.join(self.directory, host)
+        return os.path.join(folder, f"{exact}.json"), os.path.join(folder, f"{loose}.json")
+
+    def save(self, method: str, url: str, body: bytes, status: int, headers, content: bytes, elapsed: float):
+        fixture = {
+            "method": method,
+            "url": redact_url(url),
+            "status": status,
+            "headers": {name: headers[name] for name in _KEPT_HEADERS if name in headers},
+            "elapsed": round(elapsed, 4),
+        }
+        content = redact_body(url, content)
+        try:
+            fixture["text"] = content.decode("utf-8")
+        except UnicodeDecodeError:
+            fixture["base64"] = base64.b64encode(content).decode("ascii")
+
+        exact, loose = self._paths(method, url, body)
+        os.makedirs(os.path.dirname(exact), exist_ok=True)
+        for path in {exact, loose}:
+            with open(path, "w", encoding="utf-8") as f:
+                json.dump(fixture, f, ensure_ascii=False, indent=1)
+        self._count("recorded")
+
+    def load(self, method: str, url: str, body: bytes) -> Optional[Dict]:
+        for path in self._paths(method, url, body):
+            if os.path.exists(path):
+                with open(path, encoding="utf-8") as f:
+                    fixture = json.load(f)
+                self._count("replayed")
+                return fixture
+        self._count("missing")
+        print(f"DEBUG: No HTTP fixture for {method} {redact_url(url)}")
+        return None
+
+    @staticmethod
+    def content(fixture: Dict) -> bytes:
+        if "base64" in fixture:
+            return base64.b64decode(fixture["base64"])
+        return fixture.get("text", "").encode("utf-8")
+
+    def delay(self, fixture: Optional[Dict]) -> float:
+        if self.latency == "recorded":
+            return fixture.get("elapsed", 0) if fixture else 0
+        return float(self.latency or 0) / 1000
+
+    def get_stats(self) -> Dict[str, int]:
+        with self._lock:
+            return dict(self.stats)
+
+    def _count(self, counter: str):
+        with self._lock:
+            self.stats[counter] += 1
+
+class FixtureAdapter(HTTPAdapter):
+    """requests transport adapter that records or replays (see module docstring)"""
+
+    def __init__(self, store: FixtureStore, mode: str, **kwargs):
+        self.store = store
+        self.mode = mode
+        super().__init__(**kwargs)
+
+    def send(self, request, **kwargs):
+        body = _as_bytes(request.body)
+        if self.mode == "record":
+            start = time.perf_counter()
+            response = super().send(request, **kwargs)
+            self.store.save(request.method, request.url, body, response.status_code, response.headers,
+                            response.content, time.perf_counter() - start)
+            return response
+
+        fixture = self.store.load(request.method, request.url, body)
+        time.sleep(self.store.delay(fixture))
+        if fixture is None:
+            raise requests.exceptions.ConnectionError(f"No HTTP fixture for {redact_url(request.url)}", request=request)
+
+        response = requests.Response()
+        response.status_code = fixture["status"]
+        response.headers = CaseInsensitiveDict(fixture["headers"])
+        response.encoding = get_encoding_from_headers(response.headers)
+        response._content = self.store.content(fixture)
+        response.url = request.url
+        response.request = request
+        response.connection = self
+        return response
+
+class AsyncFixtureTransport:
+    """
+    Same for httpx.AsyncClient (AsyncWebSearcher); wraps the real transport. Implements
+    the transport interface without subclassing so the sync apps don't need httpx.
+    """
+
+    def __init__(self, store: FixtureStore, mode: str, transport):
+        self.store = store
+        self.mode = mode
+        self.transport = transport
+
+    async def handle_async_request(self, request):
+        import httpx
+
+        body = await request.aread()
+        if self.mode == "record":
+            start = time.perf_counter()
+            response = await self.transport.handle_async_request(request)
+            content = await response.aread()
+            self.store.save(request.method, str(request.url), body, response.status_code, response.headers,
+                            content, time.perf_counter() - start)
+            return httpx.Response(response.status_code, headers=self._headers(response.headers),
+                                  content=content, request=request)
+
+        fixture = self.store.load(request.method, str(request.url), body)
+        await asyncio.sleep(self.store.delay(fixture))
+        if fixture is None:
+            raise httpx.ConnectError(f"No HTTP fixture for {redact_url(str(request.url))}", request=request)
+        return httpx.Response(fixture["status"], headers=fixture["headers"], content=self.store.content(fixture),
+                              request=request)
+
+    @staticmethod
+    def _headers(headers) -> Dict[str, str]:
+        return {name: headers[name] for name in _KEPT_HEADERS if name in headers}
+
+    async def __aenter__(self):
+        await self.transport.__aenter__()
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.transport.__aexit__(*exc_info)
+
+    async def aclose(self):
+        await self.transport.aclose()
+
+MODE = os.getenv("HTTP_FIXTURE_MODE", "").lower()
+store: Optional[FixtureStore] = None
+if MODE in ("record", "replay"):
+    store = FixtureStore(
+        # Gitignored: recordings may hold third-party pages and must be reviewed before sharing
+        directory=os.getenv("HTTP_FIXTURE_DIR", os.path.join("benchmarks", "fixtures", "http")),
+        latency=os.getenv("HTTP_FIXTURE_LATENCY_MS", "0")
+    )
+    print(f"DEBUG: HTTP fixtures: {MODE} mode, directory {store.directory}")
+
+def requests_adapter(**kwargs) -> HTTPAdapter:
+    """Adapter for http_client's sessions: a FixtureAdapter when a fixture mode is on"""
+    if store is None:
+        return HTTPAdapter(**kwargs)
+    return FixtureAdapter(store, MODE, **kwargs)
+
+def async_transport(transport):
+    """Transport for AsyncWebSearcher's httpx client: wrapped when a fixture mode is on"""
+    if store is None:
+        return transport
+    return AsyncFixtureTransport(store, MODE, transport)
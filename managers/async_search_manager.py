@@ -0,0 +1,161 @@
+"""
+AsyncSearchManager - asyncio variant of SearchManager (used by AsyncSimpleChatbot)
+"""
+
+import asyncio
+import time
+from typing import AsyncIterator, Dict, List, Tuple
+from web_search import AsyncWebSearcher
+from metrics import timed_stage
+from .cache import normalize_query
+from .search_manager import SearchManager
+
+class AsyncSearchManager(SearchManager):
+    """
+    Same decision tiers, caches, speculation and tool-calling as SearchManager;
+    openai_client is an AsyncLLMGateway and the web search is an AsyncWebSearcher.
+    """
+
+    def __init__(self, openai_client=None, **kwargs):
+        super().__init__(openai_client=openai_client, **kwargs)
+        self.web_searcher = AsyncWebSearcher()
+
+    @timed_stage("needs_web_search")
+    async def needs_web_search(self, user_message: str) -> bool:
+        """Tiered decision: memoized result -> local classifier -> LLM"""
+        quick_decision = self._quick_decision(user_message)
+        if quick_decision is not None:
+            return quick_decision
+
+        try:
+            needs_search = await self.llm_decision(user_message)
+            self._record_decision("llm")
+            self.decision_cache.set(normalize_query(user_message), needs_search)
+            return needs_search
+
+        except Exception as e:
+            print(f"DEBUG: LLM decision failed, falling back to keywords: {e}")
+            self._record_decision("fallback")
+            return self._keyword_based_decision(user_message)
+
+    async def llm_decision(self, user_message: str) -> bool:
+        """Ask the LLM whether web search is needed (raises on API errors)"""
+        response = await self.client.chat.completions.create(**self._search_decision_args(user_message))
+        return self._parse_llm_decision(user_message, response)
+
+    async def perform_search(self, user_message: str) -> str:
+        """Perform web search and return results"""
+        print("🔍 Đang tìm kiếm thông tin mới nhất...")
+        return await self.web_searcher.search_and_summarize(user_message)
+
+    async def should_search_and_get_results(self, user_message: str) -> Tuple[bool, str]:
+        """Check if search is needed and return results if so"""
+        if self.speculative_search and self._should_speculate(user_message):
+            return await self._speculative_search_and_decide(user_message)
+
+        needs_search = await self.needs_web_search(user_message)
+        search_results = ""
+
+        if needs_search:
+            search_results = await self.perform_search(user_message)
+
+        return needs_search, search_results
+
+    async def _speculative_search_and_decide(self, user_message: str) -> Tuple[bool, str]:
+        """Run the web search as a task alongside the decision call; cancel it if not needed"""
+        start = time.perf_counter()
+        task = asyncio.create_task(self._timed_search(user_message))
+        self._record_speculation("launched")
+
+        needs_search = await self.needs_web_search(user_message)
+        decision_seconds = time.perf_counter() - start
+
+        if needs_search:
+            search_results, search_seconds = await task
+            saved = max(0.0, decision_seconds + search_seconds - (time.perf_counter() - start))
+            self._record_speculation("used", saved_seconds=saved)
+            print(f"DEBUG: Speculative search used, saved {saved * 1000:.0f} ms")
+            return True, search_results
+
+        # Unlike a thread, the task can be stopped mid-flight
+        task.cancel()
+        self._record_speculation("wasted", "cancelled")
+        print("DEBUG: Speculative search discarded (decision was no)")
+        return False, ""
+
+    async def _timed_search(self, user_message: str) -> Tuple[str, float]:
+        start = time.perf_counter()
+        results = await self.perform_search(user_message)
+        return results, time.perf_counter() - start
+
+    async def complete_with_tools(self, messages: List[Dict], turn: Dict = None, **completion_args) -> str:
+        """Single-call mode: answer with web_search available as a tool"""
+        response = await self.client.chat.completions.create(
+            messages=messages,
+            tools=self.prompt_manager.get_tools(),
+            tool_choice="auto",
+            **completion_args
+        )
+        message = response.choices[0].message
+
+        if not message.tool_calls:
+            return message.content
+
+        calls = self._tool_call_dicts(message)
+        self._record_tool_turn(turn, calls)
+        followup = await self._tool_followup_messages(messages, message.content, calls)
+
+        response = await self.client.chat.completions.create(messages=followup, **completion_args)
+        return response.choices[0].message.content
+
+    async def stream_with_tools(self, messages: List[Dict], turn: Dict = None, **completion_args) -> AsyncIterator[str]:
+        """Streaming variant of complete_with_tools - yields answer text as it arrives"""
+        stream = await self.client.chat.completions.create(
+            messages=messages,
+            tools=self.prompt_manager.get_tools(),
+            tool_choice="auto",
+            stream=True,
+            **completion_args
+        )
+
+        content = []
+        tool_calls: Dict[int, Dict] = {}
+        async for chunk in stream:
+            if not chunk.choices:
+                continue
+            delta = chunk.choices[0].delta
+            if delta.content:
+                content.append(delta.content)
+                yield delta.content
+            self._accumulate_tool_calls(tool_calls, delta)
+
+        if not tool_calls:
+            return
+
+        calls = [tool_calls[index] for index in sorted(tool_calls)]
+        self._record_tool_turn(turn, calls)
+        followup = await self._tool_followup_messages(messages, "".join(content) or None, calls)
+
+        stream = await self.client.chat.completions.create(messages=followup, stream=True, **completion_args)
+        async for chunk in stream:
+            if chunk.choices and chunk.choices[0].delta.content:
+                yield chunk.choices[0].delta.content
+
+    async def execute_tool_call(self, name: str, arguments: str) -> str:
+        """Run one tool call requested by the model and return its text result"""
+        query, error = self._parse_tool_call(name, arguments)
+        return error if error else await self.perform_search(query)
+
+    async def _tool_followup_messages(self, messages: List[Dict], content, tool_calls: List[Dict]) -> List[Dict]:
+        """Conversation + the assistant's tool calls + one tool message per result (searches run concurrently)"""
+        followup = list(messages)
+        followup.append({"role": "assistant", "content": content, "tool_calls": tool_calls})
+
+        results = await asyncio.gather(*(
+            self.execute_tool_call(call["function"]["name"], call["function"]["arguments"])
+            for call in tool_calls
+        ))
+        for call, result in zip(tool_calls, results):
+            followup.append({"role": "tool", "tool_call_id": call["id"], "content": result})
+
+        return followup
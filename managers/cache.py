@@ -0,0 +1,124 @@
+"""
+Cache utilities - Query / chief complaint normalization and a bounded in-memory TTL cache
+"""
+
+import re
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from typing import Any, Dict, Hashable
+
+_WHITESPACE_RE = re.compile(r"\s+")
+
+def normalize_query(text: str) -> str:
+    """
+    Normalize a user query for cache lookups:
+    Unicode NFC, lowercase, punctuation stripped, whitespace collapsed.
+    "Thủ tướng  hiện tại là ai?" and "thủ tướng hiện tại là ai" share a key.
+    """
+    text = unicodedata.normalize("NFC", text or "").lower()
+    text = "".join(" " if unicodedata.category(char).startswith("P") else char for char in text)
+    return _WHITESPACE_RE.sub(" ", text).strip()
+
+# Filler words patients wrap a complaint in ("tôi bị đau bụng quá" -> "đau bụng"). Words
+# that change the complaint stay: "tiểu nhiều", "ợ hơi", "có thai", "cảm lạnh".
+COMPLAINT_STOP_WORDS = frozenset(
+    "tôi mình em con cháu anh chị ông bà bác sĩ ơi ạ bị đang thấy rất quá lắm "
+    "và với của thì là hay cứ này kia đó từ khi lúc hôm qua sáng chiều tối nay "
+    "i have has had am is a an the my some since".split()
+)
+# Same for complaints typed without diacritics, minus words that are ambiguous once
+# unaccented ("rat" = rất/rát, "do" = đó/đỏ, "bi" = bị/bí, "tu" = từ/tụ, "toi" = tôi/tối)
+COMPLAINT_STOP_WORDS_ASCII = frozenset(
+    "minh em chau anh chi oi bac si dang thay qua lam va voi cua thi la hay nay kia hom sang chieu "
+    "i have has had am is a an the my some since".split()
+)
+_COMPLAINT_STOP_PHRASES_RE = re.compile(r"(?<!\w)(cảm thấy|cam thay)(?!\w)")
+
+def fold_diacritics(text: str) -> str:
+    """Strip Vietnamese diacritics: 'đau đầu' -> 'dau dau'"""
+    text = unicodedata.normalize("NFD", text).replace("đ", "d").replace("Đ", "D")
+    return "".join(char for char in text if unicodedata.category(char) != "Mn")
+
+def normalize_complaint(text: str) -> str:
+    """
+    Cache key for a chief complaint: normalize_query, filler words removed, tokens
+    sorted. "Tôi bị đau bụng" and "bụng đau" share a key; "đau đầu" and "đau" do not,
+    since repeated tokens are kept. Diacritics stay in the key ("đau họng" is not
+    "đau hông"); a complaint typed without any diacritics keeps its own unaccented key
+    and only matches other unaccented input.
+    """
+    text = _COMPLAINT_STOP_PHRASES_RE.sub(" ", normalize_query(text))
+    tokens = text.split()
+    stop_words = COMPLAINT_STOP_WORDS_ASCII if text == fold_diacritics(text) else COMPLAINT_STOP_WORDS
+    kept = [token for token in tokens if token not in stop_words] or tokens
+    return " ".join(sorted(kept))
+
+class TTLCache:
+    """
+    Thread-safe LRU cache with per-entry expiry and hit/miss counters.
+    """
+
+    _MISSING = object()
+
+    def __init__(self, max_size: int = 1024, ttl: float = 3600):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+
+        # key -> (value, expires_at); ordered least recently used first
+        self._entries: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """Return the cached value, or default if missing or expired"""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key, self._MISSING)
+            if entry is self._MISSING or entry[1] <= now:
+                if entry is not self._MISSING:
+                    del self._entries[key]
+                self.misses += 1
+                return default
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def set(self, key: Hashable, value: Any, ttl: float = None):
+        """Store a value; ttl overrides the cache default for this entry"""
+        expires_at = time.monotonic() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            self._entries[key] = (value, expires_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def delete(self, key: Hashable):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self) -> Dict[str, float]:
+        """Hit/miss counters for monitoring"""
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0
+        }
+
+    def __contains__(self, key: Hashable) -> bool:
+        entry = self._entries.get(key)
+        return entry is not None and entry[1] > time.monotonic()
+
+    def __len__(self) -> int:
+        return len(self._entries)
@@ -1,49 +1,191 @@
 """
-HistoryManager - Handles conversation history with sliding window capability
+HistoryManager - Handles conversation history with a message- and token-budgeted sliding window
+and an optional running summary of compacted turns
 """
 
-from typing import List, Dict
+import threading
+from collections import deque
+from typing import Callable, Deque, List, Dict, Optional
+
+# Rough per-message overhead OpenAI adds for role/separators
+MESSAGE_TOKEN_OVERHEAD = 4
+
+SUMMARY_PREFIX = "Tóm tắt phần trước của cuộc trò chuyện:\n"
+
+def estimate_tokens(text: str) -> int:
+    """
+    Cheap token estimate without a tokenizer dependency.
+    Vietnamese diacritics make characters multi-byte and split into more tokens,
+    so UTF-8 bytes / 3 tracks cl100k counts better than characters / 4.
+    """
+    return MESSAGE_TOKEN_OVERHEAD + len((text or "").encode("utf-8")) // 3
 
 class HistoryManager:
-    def __init__(self, max_messages: int = 20):
-        self.conversation_history: List[Dict[str, str]] = []
+    def __init__(self, max_messages: int = 20, max_tokens: int = None,
+                 token_counter: Callable[[str], int] = estimate_tokens):
+        """
+        max_messages: cap on the number of messages kept (system messages included)
+        max_tokens: optional prompt budget; oldest non-system messages are evicted first
+        token_counter: counts tokens for one message's content (computed once per message)
+        """
         self.max_messages = max_messages
+        self.max_tokens = max_tokens
+        self.token_counter = token_counter
+
+        # System messages are pinned; other turns live in a deque for O(1) eviction
+        self._system_messages: List[Dict[str, str]] = []
+        self._system_tokens = 0
+        self._messages: Deque[Dict[str, str]] = deque()
+        self._message_tokens: Deque[int] = deque()
+        self._total_tokens = 0
+
+        # Running summary of compacted turns, sent right after the system messages
+        self._summary_message: Optional[Dict[str, str]] = None
+        self._summary_tokens = 0
+
+        # Cached view returned by get_history(); rebuilt only after a mutation
+        self._snapshot: Optional[List[Dict[str, str]]] = None
+
+        # Compaction runs in a background thread, so mutations are serialized
+        self._lock = threading.RLock()
+
+    @property
+    def conversation_history(self) -> List[Dict[str, str]]:
+        """Backward-compatible alias for get_history()"""
+        return self.get_history()
 
     def add_message(self, role: str, content: str):
         """Add a message to conversation history"""
-        self.conversation_history.append({"role": role, "content": content})
-        self._apply_sliding_window()
+        message = {"role": role, "content": content}
+        tokens = self.token_counter(content)
+
+        with self._lock:
+            if role == "system":
+                self._system_messages.append(message)
+                self._system_tokens += tokens
+            else:
+                self._messages.append(message)
+                self._message_tokens.append(tokens)
+                self._total_tokens += tokens
+
+            self._snapshot = None
+            self._apply_sliding_window()
 
     def get_history(self) -> List[Dict[str, str]]:
-        """Get full conversation history"""
-        return self.conversation_history.copy()
+        """
+        Get full conversation history (pinned system messages first).
+        The list is a shared snapshot - copy it before modifying.
+        """
+        with self._lock:
+            if self._snapshot is None:
+                summary = [self._summary_message] if self._summary_message else []
+                self._snapshot = self._system_messages + summary + list(self._messages)
+            return self._snapshot
 
     def get_history_except_last(self) -> List[Dict[str, str]]:
-        """Get conversation history excluding the last message"""
-        return self.conversation_history[:-1].copy()
+        """Get conversation history excluding the last message (a new list, safe to modify)"""
+        return self.get_history()[:-1]
 
     def update_last_message(self, role: str, content: str):
         """Update the last message in history"""
-        if self.conversation_history:
-            self.conversation_history[-1] = {"role": role, "content": content}
+        tokens = self.token_counter(content)
+
+        with self._lock:
+            if not self._messages:
+                return
+
+            self._total_tokens += tokens - self._message_tokens[-1]
+            self._messages[-1] = {"role": role, "content": content}
+            self._message_tokens[-1] = tokens
+
+            self._snapshot = None
+            self._apply_sliding_window()
 
     def clear(self):
         """Clear all conversation history"""
-        self.conversation_history = []
+        with self._lock:
+            self._system_messages = []
+            self._system_tokens = 0
+            self._messages.clear()
+            self._message_tokens.clear()
+            self._total_tokens = 0
+            self._summary_message = None
+            self._summary_tokens = 0
+            self._snapshot = None
+
+    def get_summary(self) -> str:
+        """Current running summary of compacted turns ("" if none)"""
+        with self._lock:
+            if not self._summary_message:
+                return ""
+            return self._summary_message["content"][len(SUMMARY_PREFIX):]
+
+    def get_compaction_candidates(self, keep_recent: int) -> List[Dict[str, str]]:
+        """Oldest non-system messages that could be folded into the summary"""
+        with self._lock:
+            count = max(0, len(self._messages) - keep_recent)
+            return [self._messages[i] for i in range(count)]
+
+    def compact(self, messages: List[Dict[str, str]], summary: str):
+        """
+        Replace the given (oldest) messages with a running summary.
+        Messages already evicted by the sliding window are skipped.
+        """
+        with self._lock:
+            compacted = {id(message) for message in messages}
+            while self._messages and id(self._messages[0]) in compacted:
+                self._messages.popleft()
+                self._total_tokens -= self._message_tokens.popleft()
+
+            self._summary_message = {"role": "system", "content": SUMMARY_PREFIX + summary}
+            self._summary_tokens = self.token_counter(self._summary_message["content"])
+            self._snapshot = None
+            self._apply_sliding_window()
 
     def _apply_sliding_window(self):
-        """Apply sliding window to keep only recent messages"""
-        if len(self.conversation_history) > self.max_messages:
-            # Keep system messages at the beginning if any
-            system_messages = [msg for msg in self.conversation_history if msg["role"] == "system"]
-            recent_messages = self.conversation_history[-(self.max_messages - len(system_messages)):]
+        """
+        Evict the oldest non-system messages until both the message cap and the
+        token budget are met. The newest message is always kept.
+        """
+        max_non_system = self._max_non_system()
+
+        evicted = False
+        while len(self._messages) > 1 and (
+            (max_non_system is not None and len(self._messages) > max_non_system)
+            or (self.max_tokens is not None and self.get_token_count() > self.max_tokens)
+        ):
+            self._messages.popleft()
+            self._total_tokens -= self._message_tokens.popleft()
+            evicted = True
+
+        if evicted:
+            self._snapshot = None
 
-            self.conversation_history = system_messages + recent_messages
+    def get_free_message_slots(self) -> Optional[int]:
+        """Messages that can still be added before the count cap starts evicting (None = no cap)"""
+        with self._lock:
+            max_non_system = self._max_non_system()
+            if max_non_system is None:
+                return None
+            return max(0, max_non_system - len(self._messages))
+
+    def _max_non_system(self) -> Optional[int]:
+        """Room left for turns under max_messages once system messages and the summary are counted"""
+        if not self.max_messages:
+            return None
+        pinned = len(self._system_messages) + (1 if self._summary_message else 0)
+        return max(1, self.max_messages - pinned)
 
     def get_message_count(self) -> int:
-        """Get total number of messages"""
-        return len(self.conversation_history)
+        """Get total number of messages (summary included)"""
+        return len(self._system_messages) + (1 if self._summary_message else 0) + len(self._messages)
+
+    def get_token_count(self) -> int:
+        """Estimated prompt tokens for the whole history (summary included)"""
+        return self._system_tokens + self._summary_tokens + self._total_tokens
 
     def get_last_message(self) -> Dict[str, str]:
         """Get the last message"""
-        return self.conversation_history[-1] if self.conversation_history else None
\ No newline at end of file
+        if self._messages:
+            return self._messages[-1]
+        return self._system_messages[-1] if self._system_messages else None
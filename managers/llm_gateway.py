@@ -0,0 +1,452 @@
+"""
+LLMGateway - One shared, guarded OpenAI client per process
+
+All chat completions (SimpleChatbot, SearchManager, SummaryManager, MedicalChatbot)
+go through the same gateway, which provides:
+- one pooled keep-alive HTTP client (the OpenAI client's connection pool) instead of one per object
+- a per-call deadline covering all attempts, each attempt capped by the remaining time
+- jittered exponential backoff on 429 / 5xx / timeouts / connection errors (Retry-After honored)
+- a global concurrency limit; extra callers wait in a bounded queue instead of piling on
+- a circuit breaker that fails fast while the upstream keeps failing
+- coalescing of identical concurrent non-streaming requests (e.g. the same search decision)
+
+The gateway exposes gateway.chat.completions.create(...) so it is a drop-in
+replacement for an openai.OpenAI client at existing call sites. AsyncLLMGateway is the
+same gateway on openai.AsyncOpenAI for the asyncio pipeline (asgi.py).
+"""
+
+import asyncio
+import json
+import os
+import random
+import threading
+import time
+from types import SimpleNamespace
+from typing import Dict, Optional, Tuple
+
+import openai
+
+from metrics import LLM_REQUESTS, STAGE_ERRORS, STAGE_SECONDS, record_usage
+from .singleflight import AsyncSingleFlight, SingleFlight
+
+class LLMUnavailableError(Exception):
+    """Raised without calling the API while the circuit breaker is open"""
+
+class LLMBusyError(Exception):
+    """Raised when no concurrency slot frees up within queue_timeout"""
+
+class CircuitBreaker:
+    """
+    closed -> open after failure_threshold consecutive failures;
+    open -> half-open after reset_timeout, letting one trial call through;
+    the trial's outcome closes or re-opens the circuit.
+    """
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = "closed"
+        self._failures = 0
+        self._opened_at = 0.0
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self.state == "closed":
+                return True
+            if self.state == "open" and time.monotonic() - self._opened_at >= self.reset_timeout:
+                self.state = "half_open"
+            if self.state == "half_open" and not self._trial_in_flight:
+                self._trial_in_flight = True
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self.state = "closed"
+            self._failures = 0
+            self._trial_in_flight = False
+
+    def release_trial(self):
+        """End a call that says nothing about upstream health (e.g. a 4xx) without changing state"""
+        with self._lock:
+            self._trial_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            self._trial_in_flight = False
+            if self.state == "half_open" or self._failures >= self.failure_threshold:
+                if self.state != "open":
+                    print(f"DEBUG: LLM circuit breaker opened after {self._failures} failures")
+                self.state = "open"
+                self._opened_at = time.monotonic()
+
+class SlotStream:
+    """
+    Streamed completion that holds a gateway concurrency slot until it is exhausted,
+    fails, is closed or is garbage collected, so a stream the caller never iterates
+    (or abandons halfway) cannot leak the slot
+    """
+
+    def __init__(self, stream, on_finish):
+        self._stream = stream
+        self._chunks = None
+        self._on_finish = on_finish
+        self._usage = None
+        self._lock = threading.Lock()
+
+    def _finish(self, outcome: str) -> bool:
+        with self._lock:
+            on_finish, self._on_finish = self._on_finish, None
+        if on_finish is None:
+            return False
+        on_finish(outcome, self._usage)
+        return True
+
+    def _track(self, chunk):
+        if getattr(chunk, "usage", None) is not None:
+            self._usage = chunk.usage
+        return chunk
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        if self._on_finish is None:
+            raise StopIteration
+        if self._chunks is None:
+            self._chunks = iter(self._stream)
+        try:
+            return self._track(next(self._chunks))
+        except StopIteration:
+            self._finish("ok")
+            raise
+        except BaseException:
+            self._finish("error")
+            raise
+
+    def close(self):
+        if self._finish("cancelled"):
+            close = getattr(self._stream, "close", None)
+            if close is not None:
+                close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def __del__(self):
+        self._finish("cancelled")
+
+class AsyncSlotStream(SlotStream):
+    """SlotStream for AsyncLLMGateway: async for chunk in stream; await stream.aclose()"""
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        if self._on_finish is None:
+            raise StopAsyncIteration
+        if self._chunks is None:
+            self._chunks = self._stream.__aiter__()
+        try:
+            return self._track(await self._chunks.__anext__())
+        except StopAsyncIteration:
+            self._finish("ok")
+            raise
+        except BaseException:
+            self._finish("error")
+            raise
+
+    def close(self):
+        # Sync callers (and __del__) can only free the slot; aclose() also closes the response
+        self._finish("cancelled")
+
+    async def aclose(self):
+        if self._finish("cancelled"):
+            close = getattr(self._stream, "close", None)
+            if close is not None:
+                await close()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.aclose()
+
+class LLMGateway:
+    client_class = openai.OpenAI
+
+    def __init__(self, api_key: str = None, base_url: str = None, timeout: float = 30, max_retries: int = 3,
+                 backoff_base: float = 0.5, backoff_max: float = 8, max_concurrency: int = 8,
+                 queue_timeout: float = 10, breaker_threshold: int = 5, breaker_reset: float = 30,
+                 coalesce: bool = True):
+        """
+        timeout: deadline in seconds for one create() call, retries and backoff included
+        max_concurrency: in-flight requests allowed per process; others wait up to queue_timeout
+        coalesce: share one call between concurrent identical non-streaming requests
+        base_url: OpenAI-compatible endpoint (e.g. benchmarks/fake_openai_server.py); None = api.openai.com
+        """
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.queue_timeout = queue_timeout
+
+        # Retries are done here (with jitter and the shared deadline), not inside the SDK
+        self.client = self.client_class(
+            api_key=api_key or os.getenv("OPENAI_API_KEY"),
+            base_url=base_url or None,
+            timeout=timeout,
+            max_retries=0
+        )
+        self.breaker = CircuitBreaker(breaker_threshold, breaker_reset)
+        self._slots = threading.BoundedSemaphore(max_concurrency)
+        self.coalesce = coalesce
+        self._flight = SingleFlight()
+
+        self.stats = {"calls": 0, "retries": 0, "failures": 0, "rejected_busy": 0, "rejected_open": 0}
+        self._stats_lock = threading.Lock()
+
+        # Drop-in for openai.OpenAI: gateway.chat.completions.create(...)
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.create_chat_completion))
+
+    def create_chat_completion(self, timeout: float = None, **kwargs):
+        """
+        chat.completions.create with deadline, retries, concurrency limit and breaker.
+        With stream=True a SlotStream is returned; it holds the concurrency slot until
+        it is consumed, closed or garbage collected.
+        Identical non-streaming requests already in flight are coalesced into one call.
+        """
+        if self.coalesce and not kwargs.get("stream"):
+            key = json.dumps(kwargs, sort_keys=True, ensure_ascii=False, default=str)
+            return self._flight.do(key, self._create, timeout, kwargs)
+        return self._create(timeout, kwargs)
+
+    def _create(self, timeout: float, kwargs: dict):
+        deadline = time.monotonic() + (timeout or self.timeout)
+        self._count("calls")
+        model = kwargs.get("model", "")
+        if kwargs.get("stream"):
+            # Ask for a final usage chunk (empty choices) so streamed tokens are counted too
+            kwargs.setdefault("stream_options", {"include_usage": True})
+
+        if not self._slots.acquire(timeout=self.queue_timeout):
+            self._count("rejected_busy")
+            LLM_REQUESTS.inc(1, model, "busy")
+            raise LLMBusyError("Hệ thống AI đang quá tải, vui lòng thử lại sau giây lát.")
+
+        start = time.perf_counter()
+        try:
+            response = self._call_with_retries(deadline, kwargs)
+        except BaseException as e:
+            self._slots.release()
+            self._record_call(model, start, "unavailable" if isinstance(e, LLMUnavailableError) else "error")
+            raise
+
+        if kwargs.get("stream"):
+            return SlotStream(response, self._stream_finished(model, start))
+
+        self._slots.release()
+        self._record_call(model, start, "ok", getattr(response, "usage", None))
+        return response
+
+    def get_stats(self) -> Dict[str, object]:
+        with self._stats_lock:
+            report = dict(self.stats)
+        report["coalesced"] = self._flight.stats["shared"]
+        report["breaker_state"] = self.breaker.state
+        return report
+
+    def _call_with_retries(self, deadline: float, kwargs: dict):
+        attempt = 0
+        while True:
+            if not self.breaker.allow():
+                self._count("rejected_open")
+                raise LLMUnavailableError("Dịch vụ AI tạm thời không khả dụng, vui lòng thử lại sau.")
+
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise TimeoutError("LLM call deadline exceeded")
+
+            try:
+                response = self.client.chat.completions.create(timeout=remaining, **kwargs)
+                self.breaker.record_success()
+                return response
+            except Exception as e:
+                if not self._is_retryable(e):
+                    # 4xx caller errors say nothing about upstream health
+                    self.breaker.release_trial()
+                    raise
+
+                self.breaker.record_failure()
+                self._count("failures")
+                delay = self._backoff_delay(attempt, e)
+                if (attempt >= self.max_retries or self.breaker.state == "open"
+                        or time.monotonic() + delay >= deadline):
+                    raise
+
+                attempt += 1
+                self._count("retries")
+                print(f"DEBUG: LLM call failed ({type(e).__name__}), retry {attempt} in {delay:.2f}s")
+                time.sleep(delay)
+
+    @staticmethod
+    def _is_retryable(error: Exception) -> bool:
+        if isinstance(error, (openai.RateLimitError, openai.APITimeoutError, openai.APIConnectionError)):
+            return True
+        return isinstance(error, openai.APIStatusError) and error.status_code >= 500
+
+    def _backoff_delay(self, attempt: int, error: Exception) -> float:
+        """Full-jitter exponential backoff, never shorter than the server's Retry-After"""
+        delay = random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** attempt)))
+
+        response = getattr(error, "response", None)
+        retry_after = response.headers.get("retry-after") if response is not None else None
+        if retry_after:
+            try:
+                delay = max(delay, min(float(retry_after), self.backoff_max))
+            except ValueError:
+                pass
+        return delay
+
+    def _stream_finished(self, model: str, start: float):
+        """Callback run once per stream: frees the slot; the call is timed until the stream ends"""
+        def finished(outcome: str, usage):
+            self._slots.release()
+            self._record_call(model, start, outcome, usage)
+        return finished
+
+    @staticmethod
+    def _record_call(model: str, start: float, outcome: str, usage=None):
+        STAGE_SECONDS.observe(time.perf_counter() - start, "llm_completion")
+        if outcome != "ok":
+            STAGE_ERRORS.inc(1, "llm_completion")
+        LLM_REQUESTS.inc(1, model, outcome)
+        record_usage(model, usage)
+
+    def _count(self, counter: str):
+        with self._stats_lock:
+            self.stats[counter] += 1
+
+class AsyncLLMGateway(LLMGateway):
+    """
+    LLMGateway for asyncio callers: await gateway.chat.completions.create(...).
+    Waiting for a slot, backoff and the upstream call all yield to the event loop,
+    so one worker can keep many calls in flight. Use it from a single event loop.
+    """
+    client_class = openai.AsyncOpenAI
+
+    def __init__(self, *args, max_concurrency: int = 8, **kwargs):
+        super().__init__(*args, max_concurrency=max_concurrency, **kwargs)
+        self._slots = asyncio.Semaphore(max_concurrency)
+        self._flight = AsyncSingleFlight()
+
+    async def create_chat_completion(self, timeout: float = None, **kwargs):
+        if self.coalesce and not kwargs.get("stream"):
+            key = json.dumps(kwargs, sort_keys=True, ensure_ascii=False, default=str)
+            return await self._flight.do(key, self._create, timeout, kwargs)
+        return await self._create(timeout, kwargs)
+
+    async def _create(self, timeout: float, kwargs: dict):
+        deadline = time.monotonic() + (timeout or self.timeout)
+        self._count("calls")
+        model = kwargs.get("model", "")
+        if kwargs.get("stream"):
+            kwargs.setdefault("stream_options", {"include_usage": True})
+
+        try:
+            await asyncio.wait_for(self._slots.acquire(), self.queue_timeout)
+        except asyncio.TimeoutError:
+            self._count("rejected_busy")
+            LLM_REQUESTS.inc(1, model, "busy")
+            raise LLMBusyError("Hệ thống AI đang quá tải, vui lòng thử lại sau giây lát.")
+
+        start = time.perf_counter()
+        try:
+            response = await self._call_with_retries(deadline, kwargs)
+        except BaseException as e:
+            self._slots.release()
+            self._record_call(model, start, "unavailable" if isinstance(e, LLMUnavailableError) else "error")
+            raise
+
+        if kwargs.get("stream"):
+            return AsyncSlotStream(response, self._stream_finished(model, start))
+
+        self._slots.release()
+        self._record_call(model, start, "ok", getattr(response, "usage", None))
+        return response
+
+    async def _call_with_retries(self, deadline: float, kwargs: dict):
+        attempt = 0
+        while True:
+            if not self.breaker.allow():
+                self._count("rejected_open")
+                raise LLMUnavailableError("Dịch vụ AI tạm thời không khả dụng, vui lòng thử lại sau.")
+
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise TimeoutError("LLM call deadline exceeded")
+
+            try:
+                response = await self.client.chat.completions.create(timeout=remaining, **kwargs)
+                self.breaker.record_success()
+                return response
+            except Exception as e:
+                if not self._is_retryable(e):
+                    self.breaker.release_trial()
+                    raise
+
+                self.breaker.record_failure()
+                self._count("failures")
+                delay = self._backoff_delay(attempt, e)
+                if (attempt >= self.max_retries or self.breaker.state == "open"
+                        or time.monotonic() + delay >= deadline):
+                    raise
+
+                attempt += 1
+                self._count("retries")
+                print(f"DEBUG: LLM call failed ({type(e).__name__}), retry {attempt} in {delay:.2f}s")
+                await asyncio.sleep(delay)
+
+_gateways: Dict[Tuple[type, Optional[str], Optional[str]], LLMGateway] = {}
+_gateways_lock = threading.Lock()
+
+def _get_gateway(gateway_class: type, api_key: str = None, max_concurrency: int = 8) -> LLMGateway:
+    api_key = api_key or os.getenv("OPENAI_API_KEY")
+    base_url = os.getenv("OPENAI_BASE_URL") or None
+    key = (gateway_class, api_key, base_url)
+    with _gateways_lock:
+        gateway = _gateways.get(key)
+        if gateway is None:
+            gateway = gateway_class(
+                api_key=api_key,
+                base_url=base_url,
+                timeout=float(os.getenv("LLM_TIMEOUT", "30")),
+                max_retries=int(os.getenv("LLM_MAX_RETRIES", "3")),
+                max_concurrency=max_concurrency,
+                queue_timeout=float(os.getenv("LLM_QUEUE_TIMEOUT", "10")),
+                breaker_threshold=int(os.getenv("LLM_BREAKER_THRESHOLD", "5")),
+                breaker_reset=float(os.getenv("LLM_BREAKER_RESET", "30")),
+                coalesce=os.getenv("LLM_COALESCE", "1") == "1"
+            )
+            _gateways[key] = gateway
+        return gateway
+
+def get_llm_gateway(api_key: str = None) -> LLMGateway:
+    """
+    Process-wide gateway (one per API key and endpoint), configured from LLM_* environment
+    variables; OPENAI_BASE_URL points all chatbots at another OpenAI-compatible server
+    """
+    return _get_gateway(LLMGateway, api_key, int(os.getenv("LLM_MAX_CONCURRENCY", "8")))
+
+def get_async_llm_gateway(api_key: str = None) -> AsyncLLMGateway:
+    """
+    Process-wide AsyncLLMGateway, same configuration as get_llm_gateway() except the
+    concurrency limit (LLM_ASYNC_MAX_CONCURRENCY): waiting calls cost no thread here
+    """
+    return _get_gateway(AsyncLLMGateway, api_key, int(os.getenv("LLM_ASYNC_MAX_CONCURRENCY", "128")))
@@ -12,6 +12,11 @@ Hãy trả lời câu hỏi: {question}
 
 Lưu ý: Ưu tiên thông tin từ kết quả tìm kiếm nếu có, kết hợp với ngữ cảnh cuộc trò chuyện trước đó, và trả lời bằng tiếng Việt một cách chính xác, cập nhất."""
 
+        # What a searched turn looks like in the history (the full results are sent only once)
+        self.search_record_template = """{question}
+
+[Đã tra cứu web: {digest}]"""
+
         self.search_decision_template = """Câu hỏi này có cần tìm kiếm thông tin CẬP NHẬT trên Internet không?
 
 Chỉ trả lời: "CÓ" hoặc "KHÔNG"
@@ -32,6 +37,40 @@ Câu hỏi: "{question}"
 
 Trả lời:"""
 
+        self.summary_template = """Bạn đang tóm tắt một cuộc trò chuyện giữa người dùng và trợ lý AI để dùng làm ngữ cảnh cho các lượt sau.
+
+Bản tóm tắt hiện có:
+{previous_summary}
+
+Các lượt hội thoại mới cần gộp vào bản tóm tắt:
+{transcript}
+
+Hãy viết lại MỘT bản tóm tắt duy nhất (tối đa 150 từ, bằng tiếng Việt), giữ lại: tên và thông tin người dùng đã chia sẻ, các chủ đề đã hỏi, các sự kiện/số liệu/câu trả lời quan trọng. Chỉ trả về bản tóm tắt."""
+
+        # Function/tool definition for single-call mode: the model decides when to search
+        self.web_search_tool = {
+            "type": "function",
+            "function": {
+                "name": "web_search",
+                "description": (
+                    "Tìm kiếm thông tin CẬP NHẬT trên Internet. Chỉ dùng khi câu hỏi cần thông tin mới: "
+                    "lãnh đạo/chính phủ hiện tại, giá cả hoặc thống kê mới nhất, tin tức và sự kiện "
+                    "đang diễn ra, thời tiết hôm nay. KHÔNG dùng cho câu hỏi cách làm, công thức món ăn, "
+                    "giải thích khái niệm hay kiến thức tổng quát."
+                ),
+                "parameters": {
+                    "type": "object",
+                    "properties": {
+                        "query": {
+                            "type": "string",
+                            "description": "Câu truy vấn tìm kiếm ngắn gọn bằng tiếng Việt"
+                        }
+                    },
+                    "required": ["query"]
+                }
+            }
+        }
+
     def create_web_search_prompt(self, question: str, search_results: str) -> str:
         """Create enhanced prompt with web search results"""
         return self.web_search_template.format(
@@ -39,10 +78,30 @@ Trả lời:"""
             question=question
         )
 
+    def create_search_record(self, question: str, digest: str) -> str:
+        """Compact history entry for a turn answered with web search results"""
+        return self.search_record_template.format(question=question, digest=digest)
+
     def create_search_decision_prompt(self, question: str) -> str:
         """Create prompt for LLM to decide if web search is needed"""
         return self.search_decision_template.format(question=question)
 
+    def create_summary_prompt(self, previous_summary: str, messages: list) -> str:
+        """Create prompt that folds new turns into the running conversation summary"""
+        role_labels = {"user": "Người dùng", "assistant": "Trợ lý"}
+        transcript = "\n".join(
+            f"{role_labels.get(message['role'], message['role'])}: {message['content']}"
+            for message in messages
+        )
+        return self.summary_template.format(
+            previous_summary=previous_summary or "(chưa có)",
+            transcript=transcript
+        )
+
+    def get_tools(self) -> list:
+        """Tool definitions exposed to the model in tool-calling mode"""
+        return [self.web_search_tool]
+
     def create_standard_prompt(self, history: list) -> list:
         """Create standard conversation prompt"""
         return history
@@ -0,0 +1,122 @@
+"""
+PubMedBatcher - Collects PubMed lookups from concurrent medical sessions into batches
+
+Chief complaints submitted within one short window are resolved together through
+WebSearcher.search_pubmed_batch: one esearch per distinct complaint and a single
+esummary call for all of their articles, instead of an esearch + esummary pair per
+session. Equivalent complaints (see normalize_complaint) in a window share one
+lookup. Each caller gets a Future for its own summary; search() gives up after
+timeout seconds (by default the window plus one esearch and one esummary call).
+"""
+
+import os
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Dict, Optional, Tuple
+
+import http_client
+from web_search import PUBMED_READ_TIMEOUT
+
+from .cache import normalize_complaint
+
+class PubMedBatcher:
+    def __init__(self, searcher, window: float = 0.3, max_batch: int = 20, num_results: int = 3,
+                 timeout: float = None):
+        """
+        searcher: WebSearcher; window: seconds to collect queries after the first one;
+        max_batch: distinct queries that trigger an immediate flush;
+        timeout: seconds search() waits for its batch
+        """
+        self.searcher = searcher
+        self.window = window
+        if timeout is None:
+            timeout = window + 2 * (http_client.pool.connect_timeout + PUBMED_READ_TIMEOUT)
+        self.timeout = timeout
+        self.max_batch = max_batch
+        self.num_results = num_results
+        self.stats = {"batches": 0, "queries": 0, "shared": 0}
+
+        self._pending: Dict[str, Tuple[str, Future]] = {}
+        self._timer: Optional[threading.Timer] = None
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="pubmed-batch")
+
+    def search(self, query: str, timeout: float = None) -> str:
+        """
+        Blocking lookup through the next batch (same result as search_pubmed);
+        raises concurrent.futures.TimeoutError after timeout (default self.timeout)
+        """
+        return self.submit(query).result(timeout=self.timeout if timeout is None else timeout)
+
+    def submit(self, query: str) -> Future:
+        key = normalize_complaint(query)
+        batch = None
+        with self._lock:
+            entry = self._pending.get(key)
+            if entry is not None:
+                self.stats["shared"] += 1
+                return entry[1]
+
+            future = Future()
+            self._pending[key] = (query, future)
+            self.stats["queries"] += 1
+            if len(self._pending) >= self.max_batch:
+                batch = self._take_pending()
+            elif self._timer is None:
+                self._timer = threading.Timer(self.window, self._flush)
+                self._timer.daemon = True
+                self._timer.start()
+
+        if batch:
+            self._executor.submit(self._run, batch)
+        return future
+
+    def _take_pending(self) -> Dict[str, Tuple[str, Future]]:
+        """Detach the pending batch (caller holds the lock)"""
+        batch, self._pending = self._pending, {}
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        return batch
+
+    def _flush(self):
+        with self._lock:
+            batch = self._take_pending()
+        if batch:
+            self._run(batch)
+
+    def _run(self, batch: Dict[str, Tuple[str, Future]]):
+        with self._lock:
+            self.stats["batches"] += 1
+        queries = [query for query, _ in batch.values()]
+        try:
+            summaries = self.searcher.search_pubmed_batch(queries, self.num_results)
+        except Exception as e:
+            for _, future in batch.values():
+                future.set_exception(e)
+            return
+        for query, future in batch.values():
+            future.set_result(summaries.get(query, ""))
+
+    def get_stats(self) -> Dict[str, int]:
+        with self._lock:
+            return dict(self.stats, pending=len(self._pending))
+
+_batcher: Optional[PubMedBatcher] = None
+_batcher_lock = threading.Lock()
+
+def get_pubmed_batcher(searcher) -> Optional[PubMedBatcher]:
+    """
+    Process-wide batcher over searcher, configured from PUBMED_BATCH_WINDOW (seconds),
+    PUBMED_BATCH_SIZE and PUBMED_BATCH_TIMEOUT; None when PUBMED_BATCH_WINDOW=0 (no batching)
+    """
+    global _batcher
+    window = float(os.getenv("PUBMED_BATCH_WINDOW", "0.3"))
+    if window <= 0:
+        return None
+    with _batcher_lock:
+        if _batcher is None:
+            timeout = os.getenv("PUBMED_BATCH_TIMEOUT")
+            _batcher = PubMedBatcher(searcher, window=window, max_batch=int(os.getenv("PUBMED_BATCH_SIZE", "20")),
+                                     timeout=float(timeout) if timeout else None)
+        return _batcher
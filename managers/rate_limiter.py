@@ -0,0 +1,134 @@
+"""
+TokenBucket - Request rate limiter shared by all threads (and optionally all workers)
+
+Used for NCBI E-utilities (PubMed): at most 3 requests/s per IP, 10 with an API key.
+Callers reserve a token and sleep only until their own slot comes up, so the esearch
+and esummary calls of many medical sessions interleave at the allowed rate instead
+of each call sleeping a fixed interval that nobody else knows about.
+
+With a path, the bucket state lives in a SQLite row updated inside an immediate
+transaction, so every gunicorn worker draws from the same bucket.
+"""
+
+import asyncio
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, Optional
+
+from metrics import RATE_LIMIT_WAIT_SECONDS
+
+class TokenBucket:
+    def __init__(self, name: str, rate: float, burst: float = 1, path: Optional[str] = None):
+        """
+        rate: tokens added per second; burst: bucket capacity
+        path: SQLite file holding the shared bucket state (None = this process only)
+        """
+        self.name = name
+        self.rate = rate
+        self.burst = burst
+        self.path = path
+        self.stats = {"acquired": 0, "delayed": 0, "waited_seconds": 0.0}
+
+        self._tokens = burst
+        self._updated_at = time.time()
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    def _connection(self) -> sqlite3.Connection:
+        """One connection per thread (and per process, since workers fork)"""
+        conn = getattr(self._local, "conn", None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS token_buckets ("
+                " name TEXT PRIMARY KEY, tokens REAL NOT NULL, updated_at REAL NOT NULL)"
+            )
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def _take(self, tokens: float, updated_at: float, now: float):
+        """Refill, take one token (possibly going negative = queued) -> (tokens left, wait)"""
+        tokens = min(self.burst, tokens + max(0.0, now - updated_at) * self.rate) - 1
+        return tokens, max(0.0, -tokens / self.rate)
+
+    def _reserve_local(self, now: float) -> float:
+        with self._lock:
+            self._tokens, wait = self._take(self._tokens, self._updated_at, now)
+            self._updated_at = now
+        return wait
+
+    def _reserve_shared(self, now: float) -> float:
+        conn = self._connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute("SELECT tokens, updated_at FROM token_buckets WHERE name = ?", (self.name,)).fetchone()
+            tokens, wait = self._take(*(row or (self.burst, now)), now)
+            conn.execute("INSERT OR REPLACE INTO token_buckets (name, tokens, updated_at) VALUES (?, ?, ?)",
+                         (self.name, tokens, now))
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        return wait
+
+    def reserve(self) -> float:
+        """Take the next token; returns the seconds to wait before using it"""
+        now = time.time()
+        if self.path:
+            try:
+                wait = self._reserve_shared(now)
+            except sqlite3.Error as e:
+                print(f"DEBUG: Shared rate limiter '{self.name}' unavailable, using the local bucket: {e}")
+                wait = self._reserve_local(now)
+        else:
+            wait = self._reserve_local(now)
+
+        with self._lock:
+            self.stats["acquired"] += 1
+            if wait > 0:
+                self.stats["delayed"] += 1
+                self.stats["waited_seconds"] += wait
+        RATE_LIMIT_WAIT_SECONDS.observe(wait, self.name)
+        return wait
+
+    def acquire(self) -> float:
+        """Block until a request may be sent; returns the seconds waited"""
+        wait = self.reserve()
+        if wait > 0:
+            time.sleep(wait)
+        return wait
+
+    async def acquire_async(self) -> float:
+        # The shared bucket may wait on another worker's SQLite lock, so reserve off the event loop
+        wait = await asyncio.to_thread(self.reserve) if self.path else self.reserve()
+        if wait > 0:
+            await asyncio.sleep(wait)
+        return wait
+
+    def get_stats(self) -> Dict[str, float]:
+        with self._lock:
+            return dict(self.stats)
+
+_ncbi_limiter: Optional[TokenBucket] = None
+_ncbi_lock = threading.Lock()
+
+def get_ncbi_limiter() -> TokenBucket:
+    """
+    Process-wide NCBI E-utilities limiter: 3 req/s, 10 with NCBI_API_KEY (PUBMED_RATE_LIMIT
+    overrides), shared by all workers through RATE_LIMIT_PATH unless RATE_LIMIT_SHARED=0
+    """
+    global _ncbi_limiter
+    with _ncbi_lock:
+        if _ncbi_limiter is None:
+            default_rate = "10" if os.getenv("NCBI_API_KEY") else "3"
+            shared = os.getenv("RATE_LIMIT_SHARED", "1") == "1"
+            _ncbi_limiter = TokenBucket(
+                "ncbi",
+                rate=float(os.getenv("PUBMED_RATE_LIMIT", default_rate)),
+                path=os.getenv("RATE_LIMIT_PATH", "rate_limit.sqlite3") if shared else None
+            )
+        return _ncbi_limiter
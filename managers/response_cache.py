@@ -0,0 +1,216 @@
+"""
+ResponseCache - Answer cache for opening questions with exact and near-duplicate matching
+"""
+
+import random
+import re
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from typing import Dict, FrozenSet, List, Optional, Tuple
+
+from .cache import normalize_query
+
+# Sentence particles that don't change what is being asked ("... là gì vậy ạ", "... nhé").
+# Pronouns stay: "anh" is also "English", and "tôi"/"bạn" can be what the question is about.
+FILLER_WORDS = frozenset(('ơi', 'nhé', 'nha', 'ạ', 'à', 'ư', 'hả', 'nhỉ'))
+
+# Polite openers ("cho mình hỏi", "xin hỏi", "vui lòng") stripped from the start of a question
+_POLITE_PREFIX_RE = re.compile(
+    r"^((cho (mình|tôi|em|tớ) hỏi|xin hỏi|vui lòng|làm ơn|giúp (mình|tôi|em))\s+)+"
+)
+
+# Rough per-entry bookkeeping cost (dict/tuple/OrderedDict node) on top of the strings
+ENTRY_OVERHEAD_BYTES = 512
+SHINGLE_BYTES = 64
+
+_MERSENNE_PRIME = (1 << 61) - 1
+
+def content_words(text: str) -> List[str]:
+    """Normalized syllables without polite openers and particles (Vietnamese syllables are space separated)"""
+    text = _POLITE_PREFIX_RE.sub("", normalize_query(text))
+    return [word for word in text.split() if word not in FILLER_WORDS]
+
+def shingles(text: str) -> FrozenSet[str]:
+    """Word unigrams + bigrams of the content words"""
+    words = content_words(text)
+    return frozenset(words + [f"{a} {b}" for a, b in zip(words, words[1:])])
+
+def unigrams(question_shingles: FrozenSet[str]) -> FrozenSet[str]:
+    return frozenset(shingle for shingle in question_shingles if " " not in shingle)
+
+def jaccard(a: FrozenSet[str], b: FrozenSet[str]) -> float:
+    if not a and not b:
+        return 1.0
+    return len(a & b) / len(a | b)
+
+class ResponseCache:
+    """
+    LRU cache of answers bounded by estimated memory size.
+
+    Lookups try the normalized question first, then near-duplicates: MinHash
+    signatures are split into LSH bands to find candidates cheaply, and a candidate
+    is accepted only if it has exactly the same content words (so "thịt bò" never
+    answers "thịt gà") and its shingle Jaccard similarity reaches
+    similarity_threshold (word order). Answers built from web search results expire after
+    search_ttl, general-knowledge answers after general_ttl. Expired entries are removed
+    when a lookup meets them and by a sweep in set() at most every half search_ttl, so
+    dead answers don't hold memory (or LSH candidates) until size pressure evicts them.
+    """
+
+    def __init__(self, max_bytes: int = 8 * 1024 * 1024, search_ttl: float = 600,
+                 general_ttl: float = 24 * 3600, similarity_threshold: float = 0.8,
+                 num_perm: int = 32, bands: int = 16, seed: int = 1):
+        self.max_bytes = max_bytes
+        self.search_ttl = search_ttl
+        self.general_ttl = general_ttl
+        self.similarity_threshold = similarity_threshold
+        self.bands = bands
+        self.rows = num_perm // bands
+
+        rng = random.Random(seed)
+        self._perms = [(rng.randrange(1, _MERSENNE_PRIME), rng.randrange(0, _MERSENNE_PRIME))
+                       for _ in range(self.bands * self.rows)]
+
+        # normalized question -> (answer, expires_at, size, shingles, band keys); LRU first
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        # (band index, band hash) -> normalized questions in that bucket
+        self._buckets: Dict[Tuple[int, int], set] = {}
+        self._bytes = 0
+        self._sweep_interval = min(search_ttl, general_ttl) / 2
+        self._next_sweep = time.monotonic() + self._sweep_interval
+        self._lock = threading.Lock()
+
+        self.stats_counters = {"exact_hits": 0, "near_hits": 0, "misses": 0, "stores": 0, "evictions": 0,
+                               "expired": 0}
+
+    @staticmethod
+    def is_context_free(history: List[Dict[str, str]]) -> bool:
+        """
+        True only for the opening question of a conversation (safe to answer from,
+        or store into, the cache); later questions can lean on earlier turns in
+        ways no marker list catches
+        """
+        return not any(message["role"] != "system" for message in history)
+
+    def get(self, question: str) -> Optional[str]:
+        """Cached answer for the question or a near-duplicate of it, None on miss"""
+        key = normalize_query(question)
+        now = time.monotonic()
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if entry[1] > now:
+                    self._entries.move_to_end(key)
+                    self.stats_counters["exact_hits"] += 1
+                    return entry[0]
+                self._expire(key)
+
+            question_shingles = shingles(question)
+            question_words = unigrams(question_shingles)
+            best_key, best_score = None, 0.0
+            for candidate in self._candidates(self._band_keys(question_shingles)):
+                candidate_entry = self._entries[candidate]
+                if candidate_entry[1] <= now:
+                    self._expire(candidate)
+                    continue
+                if unigrams(candidate_entry[3]) != question_words:
+                    continue
+                score = jaccard(question_shingles, candidate_entry[3])
+                if score > best_score:
+                    best_key, best_score = candidate, score
+
+            if best_key is not None and best_score >= self.similarity_threshold:
+                self._entries.move_to_end(best_key)
+                self.stats_counters["near_hits"] += 1
+                print(f"DEBUG: Near-duplicate cache hit ({best_score:.2f}) '{question}' ~ '{best_key}'")
+                return self._entries[best_key][0]
+
+            self.stats_counters["misses"] += 1
+            return None
+
+    def set(self, question: str, answer: str, from_search: bool = False):
+        """Store an answer; search-based answers get the short TTL"""
+        if not answer:
+            return
+
+        key = normalize_query(question)
+        question_shingles = shingles(question)
+        band_keys = self._band_keys(question_shingles)
+        ttl = self.search_ttl if from_search else self.general_ttl
+        size = (ENTRY_OVERHEAD_BYTES + 2 * len(key.encode("utf-8")) + len(answer.encode("utf-8"))
+                + SHINGLE_BYTES * len(question_shingles))
+        if size > self.max_bytes:
+            return
+
+        with self._lock:
+            now = time.monotonic()
+            if now >= self._next_sweep:
+                self._sweep_expired(now)
+            if key in self._entries:
+                self._remove(key)
+
+            self._entries[key] = (answer, now + ttl, size, question_shingles, band_keys)
+            self._bytes += size
+            for band_key in band_keys:
+                self._buckets.setdefault(band_key, set()).add(key)
+            self.stats_counters["stores"] += 1
+
+            while self._bytes > self.max_bytes:
+                self._remove(next(iter(self._entries)))
+                self.stats_counters["evictions"] += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._buckets.clear()
+            self._bytes = 0
+
+    def stats(self) -> Dict[str, float]:
+        """Hit/miss counters and memory use for monitoring"""
+        with self._lock:
+            report = dict(self.stats_counters)
+            report["size"] = len(self._entries)
+            report["bytes"] = self._bytes
+        lookups = report["exact_hits"] + report["near_hits"] + report["misses"]
+        report["hit_rate"] = (report["exact_hits"] + report["near_hits"]) / lookups if lookups else 0.0
+        return report
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _band_keys(self, question_shingles: FrozenSet[str]) -> List[Tuple[int, int]]:
+        """MinHash signature of the shingles, hashed band by band for LSH bucketing"""
+        if not question_shingles:
+            return []
+        hashes = [zlib.crc32(shingle.encode("utf-8")) for shingle in question_shingles]
+        signature = [min((a * h + b) % _MERSENNE_PRIME for h in hashes) for a, b in self._perms]
+        return [(band, hash(tuple(signature[band * self.rows:(band + 1) * self.rows])))
+                for band in range(self.bands)]
+
+    def _candidates(self, band_keys: List[Tuple[int, int]]) -> set:
+        candidates = set()
+        for band_key in band_keys:
+            candidates |= self._buckets.get(band_key, set())
+        return candidates
+
+    def _sweep_expired(self, now: float):
+        for key in [key for key, entry in self._entries.items() if entry[1] <= now]:
+            self._expire(key)
+        self._next_sweep = now + self._sweep_interval
+
+    def _expire(self, key: str):
+        self._remove(key)
+        self.stats_counters["expired"] += 1
+
+    def _remove(self, key: str):
+        entry = self._entries.pop(key)
+        self._bytes -= entry[2]
+        for band_key in entry[4]:
+            bucket = self._buckets.get(band_key)
+            if bucket is not None:
+                bucket.discard(key)
+                if not bucket:
+                    del self._buckets[band_key]
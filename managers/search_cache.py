@@ -0,0 +1,222 @@
+"""
+SearchResultCache - Disk-backed search result cache shared by all gunicorn workers
+
+One SQLite file in WAL mode (readers never block the single writer), keyed on
+source + normalized query. Each source has its own TTL: news goes stale in minutes,
+PubMed reviews are good for days. Values are the parsed results (JSON), so a hit
+skips both the HTTP fetch and the HTML/JSON parse. When the file's payload passes
+max_bytes the oldest entries are evicted.
+
+Stale-while-revalidate: past its TTL an entry stays usable for a further stale window
+(lookup() reports it as stale) while one caller refreshes it; claim_refresh() hands
+out that job to a single thread across all workers. Past the stale window the entry
+is gone and callers fetch synchronously.
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, Optional, Tuple
+
+from metrics import SEARCH_CACHE_LOOKUPS
+from .cache import normalize_query
+
+# Seconds a result stays fresh, per source
+DEFAULT_SOURCE_TTLS = {
+    "vnexpress": 5 * 60,
+    "duckduckgo": 15 * 60,
+    # Keyed on the normalized chief complaint; reviews for "đau bụng" hardly change in a month
+    "pubmed": 30 * 24 * 3600,
+}
+
+# Seconds after expiry a result may still be served while it is refreshed
+DEFAULT_STALE_TTLS = {
+    "vnexpress": 30 * 60,
+    "duckduckgo": 60 * 60,
+    "pubmed": 7 * 24 * 3600,
+}
+
+class SearchResultCache:
+    def __init__(self, path: str, max_bytes: int = 64 * 1024 * 1024, ttls: Dict[str, float] = None,
+                 default_ttl: float = 15 * 60, evict_every: int = 50, stale_ttls: Dict[str, float] = None,
+                 default_stale_ttl: float = 0, refresh_lease: float = 30):
+        """
+        stale_ttls: per-source stale window after expiry (see lookup()); 0 = hard expiry
+        refresh_lease: seconds a claimed refresh blocks other claims for the same key
+        """
+        self.path = path
+        self.max_bytes = max_bytes
+        self.ttls = {**DEFAULT_SOURCE_TTLS, **(ttls or {})}
+        self.default_ttl = default_ttl
+        self.stale_ttls = {**DEFAULT_STALE_TTLS, **(stale_ttls or {})}
+        self.default_stale_ttl = default_stale_ttl
+        self.refresh_lease = refresh_lease
+        self.evict_every = evict_every
+        self.stats = {"hits": 0, "stale_hits": 0, "misses": 0, "writes": 0, "evicted": 0, "refresh_claims": 0}
+
+        self._local = threading.local()
+        self._stats_lock = threading.Lock()
+        self._writes_since_evict = 0
+
+    def _connection(self) -> sqlite3.Connection:
+        """One connection per thread (and per process, since workers fork)"""
+        conn = getattr(self._local, "conn", None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS search_results ("
+                " key TEXT PRIMARY KEY, source TEXT NOT NULL, value TEXT NOT NULL,"
+                " size INTEGER NOT NULL, created_at REAL NOT NULL, expires_at REAL NOT NULL,"
+                " stale_until REAL NOT NULL DEFAULT 0, refresh_lease_until REAL NOT NULL DEFAULT 0)"
+            )
+            self._migrate(conn)
+            conn.execute("CREATE INDEX IF NOT EXISTS search_results_created ON search_results (created_at)")
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    @staticmethod
+    def _migrate(conn: sqlite3.Connection):
+        """Add the stale-while-revalidate columns to a cache file created without them"""
+        columns = {row[1] for row in conn.execute("PRAGMA table_info(search_results)")}
+        if "stale_until" not in columns:
+            conn.execute("ALTER TABLE search_results ADD COLUMN stale_until REAL NOT NULL DEFAULT 0")
+            conn.execute("UPDATE search_results SET stale_until = expires_at")
+        if "refresh_lease_until" not in columns:
+            conn.execute("ALTER TABLE search_results ADD COLUMN refresh_lease_until REAL NOT NULL DEFAULT 0")
+
+    @staticmethod
+    def make_key(source: str, query: str) -> str:
+        return f"{source}:{normalize_query(query)}"
+
+    def get(self, source: str, query: str) -> Optional[Any]:
+        """Cached results for (source, query), None if missing or expired"""
+        entry = self.lookup(source, query)
+        return entry[0] if entry and not entry[1] else None
+
+    def lookup(self, source: str, query: str) -> Optional[Tuple[Any, bool]]:
+        """(results, is_stale) while the entry is fresh or within its stale window, else None"""
+        now = time.time()
+        try:
+            row = self._connection().execute(
+                "SELECT value, expires_at FROM search_results WHERE key = ? AND (expires_at > ? OR stale_until > ?)",
+                (self.make_key(source, query), now, now)
+            ).fetchone()
+        except sqlite3.Error as e:
+            print(f"DEBUG: Search cache read failed: {e}")
+            row = None
+
+        result = "miss" if row is None else ("stale" if row[1] <= now else "hit")
+        self._count({"hit": "hits", "stale": "stale_hits", "miss": "misses"}[result])
+        SEARCH_CACHE_LOOKUPS.inc(1, source, result)
+        return (json.loads(row[0]), result == "stale") if row else None
+
+    def claim_refresh(self, source: str, query: str) -> bool:
+        """
+        True for exactly one caller (across threads and workers) per refresh_lease window;
+        that caller should re-fetch and set() the entry, which releases the claim
+        """
+        now = time.time()
+        try:
+            claimed = self._connection().execute(
+                "UPDATE search_results SET refresh_lease_until = ? WHERE key = ? AND refresh_lease_until <= ?",
+                (now + self.refresh_lease, self.make_key(source, query), now)
+            ).rowcount == 1
+        except sqlite3.Error as e:
+            print(f"DEBUG: Search cache refresh claim failed: {e}")
+            return False
+
+        if claimed:
+            self._count("refresh_claims")
+        return claimed
+
+    def set(self, source: str, query: str, value: Any, ttl: float = None, stale_ttl: float = None):
+        """Store parsed results; ttl / stale_ttl default to the source's settings"""
+        payload = json.dumps(value, ensure_ascii=False)
+        now = time.time()
+        ttl = self.ttls.get(source, self.default_ttl) if ttl is None else ttl
+        stale_ttl = self.stale_ttls.get(source, self.default_stale_ttl) if stale_ttl is None else stale_ttl
+        try:
+            self._connection().execute(
+                "INSERT OR REPLACE INTO search_results"
+                " (key, source, value, size, created_at, expires_at, stale_until, refresh_lease_until)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?, 0)",
+                (self.make_key(source, query), source, payload, len(payload.encode("utf-8")),
+                 now, now + ttl, now + ttl + stale_ttl)
+            )
+        except sqlite3.Error as e:
+            print(f"DEBUG: Search cache write failed: {e}")
+            return
+
+        self._count("writes")
+        with self._stats_lock:
+            self._writes_since_evict += 1
+            due = self._writes_since_evict >= self.evict_every
+            if due:
+                self._writes_since_evict = 0
+        if due:
+            self.evict()
+
+    def evict(self) -> int:
+        """Drop entries past their stale window, then the oldest ones until the payload fits max_bytes"""
+        conn = self._connection()
+        now = time.time()
+        try:
+            removed = conn.execute(
+                "DELETE FROM search_results WHERE expires_at <= ? AND stale_until <= ?", (now, now)
+            ).rowcount
+            total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM search_results").fetchone()[0]
+            if total > self.max_bytes:
+                # Walk from the oldest entry until enough bytes are freed
+                excess, cutoff = total - self.max_bytes, None
+                for created_at, size in conn.execute(
+                        "SELECT created_at, size FROM search_results ORDER BY created_at"):
+                    excess -= size
+                    cutoff = created_at
+                    if excess <= 0:
+                        break
+                removed += conn.execute("DELETE FROM search_results WHERE created_at <= ?", (cutoff,)).rowcount
+        except sqlite3.Error as e:
+            print(f"DEBUG: Search cache eviction failed: {e}")
+            return 0
+
+        self._count("evicted", removed)
+        return removed
+
+    def clear(self):
+        self._connection().execute("DELETE FROM search_results")
+
+    def get_stats(self) -> Dict[str, int]:
+        with self._stats_lock:
+            return dict(self.stats)
+
+    def _count(self, counter: str, amount: int = 1):
+        with self._stats_lock:
+            self.stats[counter] += amount
+
+_cache: Optional[SearchResultCache] = None
+_cache_lock = threading.Lock()
+
+def get_search_cache() -> Optional[SearchResultCache]:
+    """
+    Process-wide cache configured from SEARCH_CACHE_PATH / SEARCH_CACHE_MAX_MB / PUBMED_CACHE_TTL_DAYS
+    (SEARCH_CACHE=0 disables it; SEARCH_STALE_WHILE_REVALIDATE=0 makes expiry hard);
+    None when disabled
+    """
+    global _cache
+    if os.getenv("SEARCH_CACHE", "1") != "1":
+        return None
+    with _cache_lock:
+        if _cache is None:
+            _cache = SearchResultCache(
+                path=os.getenv("SEARCH_CACHE_PATH", "search_cache.sqlite3"),
+                max_bytes=int(float(os.getenv("SEARCH_CACHE_MAX_MB", "64")) * 1024 * 1024),
+                ttls={"pubmed": float(os.getenv("PUBMED_CACHE_TTL_DAYS", "30")) * 24 * 3600},
+                stale_ttls=None if os.getenv("SEARCH_STALE_WHILE_REVALIDATE", "1") == "1"
+                else {source: 0 for source in DEFAULT_STALE_TTLS}
+            )
+        return _cache
@@ -0,0 +1,103 @@
+"""
+SearchNeedClassifier - Local, zero-latency scorer for "does this question need a web search?"
+
+First tier of the search decision router. It scores a question with a weighted
+Vietnamese keyword/n-gram model squashed through a logistic function. Only
+questions whose probability falls inside the ambiguous band are escalated to
+the LLM decision call. A question with no matched phrase carries no evidence
+either way, so it scores 0.5 and is always escalated.
+"""
+
+import math
+import re
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from .cache import normalize_query
+
+# Phrases that signal time-sensitive information (rules from PromptManager.search_decision_template:
+# current leaders/government, current prices and statistics, ongoing news/events, today's weather)
+POSITIVE_PHRASES: Dict[str, float] = {
+    # Current leaders / government
+    'tổng bí thư': 3.0, 'chủ tịch nước': 3.0, 'thủ tướng': 3.0, 'chủ tịch quốc hội': 3.0,
+    'tổng thống': 3.0, 'bộ trưởng': 2.0, 'chính phủ': 1.5, 'đương nhiệm': 3.0, 'lãnh đạo': 2.0,
+    # "Now" markers
+    'hiện tại': 3.0, 'hiện nay': 3.0, 'bây giờ': 2.5, 'hôm nay': 3.0, 'tối nay': 3.0, 'sáng nay': 3.0,
+    'tuần này': 3.0, 'tháng này': 3.0, 'năm nay': 2.5, 'mới nhất': 3.5, 'cập nhật': 2.5,
+    'gần đây': 2.0, 'vừa qua': 2.0, 'đang diễn ra': 3.5, 'đang là': 2.0, 'ai đang': 2.0,
+    'giờ là': 2.0, 'giờ có': 2.0, 'ngày mấy': 3.0,
+    # Prices and statistics
+    'giá vàng': 3.5, 'tỷ giá': 3.5, 'giá xăng': 3.5, 'giá cổ phiếu': 3.5, 'chứng khoán': 2.5,
+    'giá': 1.0, 'bao nhiêu tiền': 1.5, 'thống kê': 2.0, 'có bao nhiêu': 1.5, 'dân số': 1.5,
+    # News and events
+    'tin tức': 3.0, 'tin mới': 3.5, 'thời sự': 3.0, 'sự kiện': 2.0, 'tình hình': 2.5,
+    'kết quả trận': 3.5, 'tỷ số': 3.5, 'lịch thi đấu': 3.0, 'bầu cử': 2.5,
+    # Weather
+    'thời tiết': 3.0, 'dự báo': 2.5, 'bão': 2.0,
+    # Explicit requests
+    'tìm kiếm': 2.5, 'tra cứu': 2.0, 'web search': 4.0, 'search': 3.0, 'google': 2.5,
+}
+
+# Phrases that signal timeless knowledge: how-to, recipes, definitions, explanations
+NEGATIVE_PHRASES: Dict[str, float] = {
+    'cách': -2.5, 'cách làm': -3.0, 'cách nấu': -3.5, 'làm sao': -2.0, 'làm thế nào': -2.5,
+    'như thế nào': -1.5, 'hướng dẫn': -2.5, 'công thức': -3.5, 'nấu': -2.5, 'món': -1.5,
+    'giải thích': -3.0, 'khái niệm': -3.0, 'định nghĩa': -3.5, 'là gì': -2.5, 'nghĩa là': -2.5,
+    'ý nghĩa': -2.0, 'tại sao': -1.5, 'vì sao': -1.5, 'học': -1.5, 'sửa': -2.0,
+    'viết': -2.0, 'dịch': -2.0, 'lịch sử': -1.5, 'giá trị': -1.0, 'ví dụ': -1.5,
+    'bài tập': -2.5, 'lập trình': -2.0, 'code': -2.0,
+}
+
+# Explicit year mentions ("năm 2025") usually mean recent events
+YEAR_PATTERN = re.compile(r"(?<!\w)20[2-9]\d(?!\w)")
+YEAR_WEIGHT = 2.0
+
+class SearchNeedClassifier:
+    def __init__(self, search_keywords: Iterable[str] = (), bias: float = 0.0,
+                 low_threshold: float = 0.25, high_threshold: float = 0.75,
+                 keyword_weight: float = 2.0):
+        """
+        search_keywords: the SearchManager fallback keywords; any not already weighted
+        get keyword_weight. Scores in (low_threshold, high_threshold) are ambiguous.
+        """
+        self.bias = bias
+        self.low_threshold = low_threshold
+        self.high_threshold = high_threshold
+
+        self.weights: Dict[str, float] = dict(NEGATIVE_PHRASES)
+        self.weights.update(POSITIVE_PHRASES)
+        for keyword in search_keywords:
+            self.weights.setdefault(normalize_query(keyword), keyword_weight)
+
+        # One compiled alternation, longest phrase first so "giá vàng" wins over "giá"
+        phrases = sorted(self.weights, key=len, reverse=True)
+        self._pattern = re.compile(
+            r"(?<!\w)(" + "|".join(re.escape(phrase) for phrase in phrases) + r")(?!\w)"
+        )
+
+    def features(self, question: str) -> List[Tuple[str, float]]:
+        """Matched phrases and their weights (useful for debugging a decision)"""
+        text = normalize_query(question)
+        matched = [(match.group(1), self.weights[match.group(1)]) for match in self._pattern.finditer(text)]
+        matched.extend((year, YEAR_WEIGHT) for year in YEAR_PATTERN.findall(text))
+        return matched
+
+    def score(self, question: str) -> float:
+        """Probability (0..1) that the question needs up-to-date web information"""
+        return self._probability(self.features(question))
+
+    def _probability(self, features: List[Tuple[str, float]]) -> float:
+        logit = self.bias + sum(weight for _, weight in features)
+        return 1.0 / (1.0 + math.exp(-logit))
+
+    def classify(self, question: str) -> Optional[bool]:
+        """True/False when the local score is confident, None when it should be escalated"""
+        features = self.features(question)
+        if not features:
+            # Unknown vocabulary ("Messi bao nhiêu tuổi?", English questions): let the LLM decide
+            return None
+        probability = self._probability(features)
+        if probability >= self.high_threshold:
+            return True
+        if probability <= self.low_threshold:
+            return False
+        return None
@@ -2,16 +2,40 @@
 SearchManager - Handles web search decision making and execution
 """
 
+import json
+import os
+import re
+import threading
+import time
 import openai
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterator, List, Optional, Tuple
 from web_search import WebSearcher
+from metrics import timed_stage
 from .prompt_manager import PromptManager
+from .cache import TTLCache, normalize_query
+from .search_classifier import SearchNeedClassifier
+
+# Search modes for SimpleChatbot:
+# - pipeline: decision call -> web search -> answer call (original behaviour)
+# - tools: one completion with web_search exposed as a tool; the model searches only when needed
+SEARCH_MODE_PIPELINE = "pipeline"
+SEARCH_MODE_TOOLS = "tools"
+
+# Result titles in WebSearcher.search_and_summarize output ("1. **Title**")
+_RESULT_TITLE_RE = re.compile(r"^\d+\. \*\*(.+?)\*\*", re.MULTILINE)
 
 class SearchManager:
-    def __init__(self, openai_client=None):
+    def __init__(self, openai_client=None, decision_cache_size: int = 2048,
+                 decision_cache_ttl: float = 6 * 3600, use_local_classifier: bool = True,
+                 speculative_search: bool = None):
         self.client = openai_client
         self.web_searcher = WebSearcher()
         self.prompt_manager = PromptManager()
 
+        # Memoized LLM decisions keyed on the normalized question
+        self.decision_cache = TTLCache(max_size=decision_cache_size, ttl=decision_cache_ttl)
+
         # Fallback keywords for when LLM decision fails
         self.search_keywords = [
             'hiện tại', 'bây giờ', 'mới nhất', 'cập nhật', 'tình hình',
@@ -21,31 +45,96 @@ class SearchManager:
             'web search', 'tìm kiếm', 'search', 'ngày mấy'
         ]
 
-    def needs_web_search(self, user_message: str) -> bool:
-        """Use LLM to intelligently decide if web search is needed"""
-        if not self.client:
-            return self._keyword_based_decision(user_message)
-
-        try:
-            decision_prompt = self.prompt_manager.create_search_decision_prompt(user_message)
+        # First-tier local scorer; only ambiguous questions reach the LLM
+        self.local_classifier = SearchNeedClassifier(self.search_keywords) if use_local_classifier else None
+        self.decision_stats = {"cache": 0, "local": 0, "llm": 0, "fallback": 0}
+        self._decision_lock = threading.Lock()
 
-            response = self.client.chat.completions.create(
-                model="gpt-3.5-turbo",
-                messages=[{"role": "user", "content": decision_prompt}],
-                max_tokens=10,
-                temperature=0.1
-            )
+        # Opt-in: start the web search alongside the LLM decision call when a search looks likely
+        if speculative_search is None:
+            speculative_search = os.getenv("CHAT_SPECULATIVE_SEARCH", "0") == "1"
+        self.speculative_search = speculative_search
+        self._speculation_executor = None
+        self._speculation_lock = threading.Lock()
+        self.speculation_stats = {
+            "launched": 0,          # searches started before the decision was known
+            "used": 0,              # ... whose results were needed
+            "wasted": 0,            # ... discarded because the decision was "no"
+            "cancelled": 0,         # wasted searches that never started running
+            "saved_seconds": 0.0,   # latency removed versus decision-then-search
+            "wasted_search_seconds": 0.0  # search time spent on discarded results
+        }
 
-            decision = response.choices[0].message.content.strip().upper()
-            needs_search = "CÓ" in decision
+    @timed_stage("needs_web_search")
+    def needs_web_search(self, user_message: str) -> bool:
+        """
+        Tiered decision: memoized result -> local classifier -> LLM.
+        The LLM is only asked when the local score is in the ambiguous band.
+        """
+        quick_decision = self._quick_decision(user_message)
+        if quick_decision is not None:
+            return quick_decision
 
-            print(f"DEBUG: LLM decision for '{user_message}': {decision} -> needs_search: {needs_search}")
+        try:
+            needs_search = self.llm_decision(user_message)
+            self._record_decision("llm")
+            self.decision_cache.set(normalize_query(user_message), needs_search)
             return needs_search
 
         except Exception as e:
+            # Keyword fallbacks are not cached so the LLM is retried once it recovers
             print(f"DEBUG: LLM decision failed, falling back to keywords: {e}")
+            self._record_decision("fallback")
+            return self._keyword_based_decision(user_message)
+
+    def _quick_decision(self, user_message: str) -> Optional[bool]:
+        """The decision tiers that need no LLM call; None when the LLM has to be asked"""
+        cached_decision = self.decision_cache.get(normalize_query(user_message))
+        if cached_decision is not None:
+            self._record_decision("cache")
+            print(f"DEBUG: Cached decision for '{user_message}': needs_search: {cached_decision}")
+            return cached_decision
+
+        if self.local_classifier is not None:
+            local_decision = self.local_classifier.classify(user_message)
+            if local_decision is not None:
+                self._record_decision("local")
+                print(f"DEBUG: Local decision for '{user_message}' -> needs_search: {local_decision}")
+                return local_decision
+
+        if not self.client:
+            self._record_decision("fallback")
             return self._keyword_based_decision(user_message)
 
+        return None
+
+    def _record_decision(self, tier: str):
+        # Called from every request thread; dict item += is not atomic
+        with self._decision_lock:
+            self.decision_stats[tier] += 1
+
+    def llm_decision(self, user_message: str) -> bool:
+        """Ask the LLM whether web search is needed (raises on API errors)"""
+        response = self.client.chat.completions.create(**self._search_decision_args(user_message))
+
+        return self._parse_llm_decision(user_message, response)
+
+    def _search_decision_args(self, user_message: str) -> Dict:
+        return {
+            "model": "gpt-3.5-turbo",
+            "messages": [{"role": "user", "content": self.prompt_manager.create_search_decision_prompt(user_message)}],
+            "max_tokens": 10,
+            "temperature": 0.1
+        }
+
+    @staticmethod
+    def _parse_llm_decision(user_message: str, response) -> bool:
+        decision = response.choices[0].message.content.strip().upper()
+        needs_search = "CÓ" in decision
+
+        print(f"DEBUG: LLM decision for '{user_message}': {decision} -> needs_search: {needs_search}")
+        return needs_search
+
     def _keyword_based_decision(self, user_message: str) -> bool:
         """Fallback keyword-based decision making"""
         message_lower = user_message.lower()
@@ -56,12 +145,225 @@ class SearchManager:
         print("🔍 Đang tìm kiếm thông tin mới nhất...")
         return self.web_searcher.search_and_summarize(user_message)
 
+    def create_search_record(self, user_message: str, search_results: str) -> str:
+        """History entry for a searched turn: the raw question plus a short digest of the results"""
+        return self.prompt_manager.create_search_record(user_message, self.digest_search_results(search_results))
+
+    @staticmethod
+    def digest_search_results(search_results: str, max_chars: int = 160) -> str:
+        """Result titles only (or the first line when there are none), truncated"""
+        titles = _RESULT_TITLE_RE.findall(search_results or "")
+        digest = "; ".join(titles) if titles else (search_results or "").strip().split("\n")[0]
+        return digest if len(digest) <= max_chars else digest[:max_chars].rstrip() + "..."
+
     def should_search_and_get_results(self, user_message: str):
         """Check if search is needed and return results if so"""
+        if self.speculative_search and self._should_speculate(user_message):
+            return self._speculative_search_and_decide(user_message)
+
         needs_search = self.needs_web_search(user_message)
         search_results = ""
 
         if needs_search:
             search_results = self.perform_search(user_message)
 
-        return needs_search, search_results
\ No newline at end of file
+        return needs_search, search_results
+
+    def _should_speculate(self, user_message: str) -> bool:
+        """
+        Speculate only when the decision will take an LLM round-trip
+        (not cached, locally ambiguous) and a search looks likely.
+        """
+        if not self.client or normalize_query(user_message) in self.decision_cache:
+            return False
+
+        if self.local_classifier is not None:
+            if self.local_classifier.classify(user_message) is not None:
+                return False
+            if self.local_classifier.score(user_message) > 0.5:
+                return True
+
+        return self._keyword_based_decision(user_message)
+
+    def _speculative_search_and_decide(self, user_message: str) -> Tuple[bool, str]:
+        """Run the web search in parallel with the decision call; discard it if not needed"""
+        start = time.perf_counter()
+        future = self._get_speculation_executor().submit(self._timed_search, user_message)
+        self._record_speculation("launched")
+
+        needs_search = self.needs_web_search(user_message)
+        decision_seconds = time.perf_counter() - start
+
+        if needs_search:
+            search_results, search_seconds = future.result()
+            # Serial cost would have been decision + search; we paid roughly the max of the two
+            saved = max(0.0, decision_seconds + search_seconds - (time.perf_counter() - start))
+            self._record_speculation("used", saved_seconds=saved)
+            print(f"DEBUG: Speculative search used, saved {saved * 1000:.0f} ms")
+            return True, search_results
+
+        if future.cancel():
+            self._record_speculation("wasted", "cancelled")
+        else:
+            self._record_speculation("wasted")
+            future.add_done_callback(self._record_wasted_search)
+        print("DEBUG: Speculative search discarded (decision was no)")
+        return False, ""
+
+    def _get_speculation_executor(self) -> ThreadPoolExecutor:
+        # Concurrent first requests must not each build (and leak) a pool
+        with self._speculation_lock:
+            if self._speculation_executor is None:
+                self._speculation_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix="speculative-search")
+            return self._speculation_executor
+
+    def _timed_search(self, user_message: str) -> Tuple[str, float]:
+        start = time.perf_counter()
+        results = self.perform_search(user_message)
+        return results, time.perf_counter() - start
+
+    def _record_wasted_search(self, future):
+        if not future.cancelled() and future.exception() is None:
+            self._record_speculation(wasted_search_seconds=future.result()[1])
+
+    def _record_speculation(self, *counters: str, saved_seconds: float = 0.0, wasted_search_seconds: float = 0.0):
+        with self._speculation_lock:
+            for counter in counters:
+                self.speculation_stats[counter] += 1
+            self.speculation_stats["saved_seconds"] += saved_seconds
+            self.speculation_stats["wasted_search_seconds"] += wasted_search_seconds
+
+    def get_speculation_report(self) -> Dict[str, float]:
+        """Latency saved and search work wasted by speculative execution"""
+        with self._speculation_lock:
+            report = dict(self.speculation_stats)
+        launched = report["launched"]
+        report["hit_rate"] = report["used"] / launched if launched else 0.0
+        report["avg_saved_ms"] = report["saved_seconds"] * 1000 / report["used"] if report["used"] else 0.0
+        return report
+
+    def complete_with_tools(self, messages: List[Dict], turn: Dict = None, **completion_args) -> str:
+        """
+        Single-call mode: answer with web_search available as a tool.
+        A second completion is only made when the model actually calls the tool.
+        turn: optional dict; turn["searched"] is set to whether the model searched
+        """
+        response = self.client.chat.completions.create(
+            messages=messages,
+            tools=self.prompt_manager.get_tools(),
+            tool_choice="auto",
+            **completion_args
+        )
+        message = response.choices[0].message
+
+        if not message.tool_calls:
+            return message.content
+
+        calls = self._tool_call_dicts(message)
+        self._record_tool_turn(turn, calls)
+        followup = self._tool_followup_messages(messages, message.content, calls)
+
+        response = self.client.chat.completions.create(messages=followup, **completion_args)
+        return response.choices[0].message.content
+
+    def stream_with_tools(self, messages: List[Dict], turn: Dict = None, **completion_args) -> Iterator[str]:
+        """Streaming variant of complete_with_tools - yields answer text as it arrives"""
+        stream = self.client.chat.completions.create(
+            messages=messages,
+            tools=self.prompt_manager.get_tools(),
+            tool_choice="auto",
+            stream=True,
+            **completion_args
+        )
+
+        content = []
+        tool_calls: Dict[int, Dict] = {}
+        for chunk in stream:
+            if not chunk.choices:
+                continue
+            delta = chunk.choices[0].delta
+            if delta.content:
+                content.append(delta.content)
+                yield delta.content
+
+            self._accumulate_tool_calls(tool_calls, delta)
+
+        if not tool_calls:
+            return
+
+        calls = [tool_calls[index] for index in sorted(tool_calls)]
+        self._record_tool_turn(turn, calls)
+        followup = self._tool_followup_messages(messages, "".join(content) or None, calls)
+
+        stream = self.client.chat.completions.create(messages=followup, stream=True, **completion_args)
+        for chunk in stream:
+            if chunk.choices and chunk.choices[0].delta.content:
+                yield chunk.choices[0].delta.content
+
+    @staticmethod
+    def _record_tool_turn(turn: Optional[Dict], calls: List[Dict]):
+        """Tell the caller the answer is built on search results (they get the short cache TTL)"""
+        if turn is not None:
+            turn["searched"] = any(call["function"]["name"] == "web_search" for call in calls)
+
+    @staticmethod
+    def _tool_call_dicts(message) -> List[Dict]:
+        """Tool calls of a non-streamed assistant message, as request message dicts"""
+        return [
+            {
+                "id": call.id,
+                "type": "function",
+                "function": {"name": call.function.name, "arguments": call.function.arguments}
+            }
+            for call in message.tool_calls
+        ]
+
+    @staticmethod
+    def _accumulate_tool_calls(tool_calls: Dict[int, Dict], delta):
+        """Tool call ids, names and arguments arrive in fragments keyed by index"""
+        for call in delta.tool_calls or []:
+            entry = tool_calls.setdefault(call.index, {
+                "id": "", "type": "function", "function": {"name": "", "arguments": ""}
+            })
+            if call.id:
+                entry["id"] = call.id
+            if call.function and call.function.name:
+                entry["function"]["name"] += call.function.name
+            if call.function and call.function.arguments:
+                entry["function"]["arguments"] += call.function.arguments
+
+    def execute_tool_call(self, name: str, arguments: str) -> str:
+        """Run one tool call requested by the model and return its text result"""
+        query, error = self._parse_tool_call(name, arguments)
+        return error if error else self.perform_search(query)
+
+    @staticmethod
+    def _parse_tool_call(name: str, arguments: str) -> Tuple[str, Optional[str]]:
+        """(search query, error message for the model)"""
+        if name != "web_search":
+            return "", f"Công cụ không hỗ trợ: {name}"
+
+        try:
+            parsed = json.loads(arguments or "{}")
+        except json.JSONDecodeError:
+            parsed = None
+        # The model may send a bare string/list/number instead of {"query": ...}
+        query = parsed.get("query", "") if isinstance(parsed, dict) else ""
+
+        if not isinstance(query, str) or not query.strip():
+            return "", "Thiếu từ khóa tìm kiếm."
+        return query, None
+
+    def _tool_followup_messages(self, messages: List[Dict], content, tool_calls: List[Dict]) -> List[Dict]:
+        """Conversation + the assistant's tool calls + one tool message per result"""
+        followup = list(messages)
+        followup.append({"role": "assistant", "content": content, "tool_calls": tool_calls})
+
+        for call in tool_calls:
+            followup.append({
+                "role": "tool",
+                "tool_call_id": call["id"],
+                "content": self.execute_tool_call(call["function"]["name"], call["function"]["arguments"])
+            })
+
+        return followup
@@ -0,0 +1,91 @@
+"""
+SessionStore - Keeps one bounded conversation history per client session
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional
+
+from .history_manager import HistoryManager
+
+class SessionStore:
+    """
+    Session-keyed store of HistoryManager objects with bounded memory:
+    - LRU eviction once more than max_sessions are tracked
+    - Idle TTL: sessions untouched for idle_ttl seconds are dropped
+    - Per-session message cap and token budget (applied by each HistoryManager's sliding window)
+    """
+
+    def __init__(self, max_sessions: int = 1000, idle_ttl: float = 1800,
+                 max_messages_per_session: int = 20, max_tokens_per_session: int = None):
+        self.max_sessions = max_sessions
+        self.idle_ttl = idle_ttl
+        self.max_messages_per_session = max_messages_per_session
+        self.max_tokens_per_session = max_tokens_per_session
+
+        # session_id -> (HistoryManager, last_access); ordered oldest access first
+        self._sessions: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_history(self, session_id: str) -> HistoryManager:
+        """Get (or create) the history for a session and mark it as recently used"""
+        now = time.monotonic()
+        with self._lock:
+            self._purge_expired(now)
+
+            entry = self._sessions.pop(session_id, None)
+            history = entry[0] if entry else self._create_history()
+            self._sessions[session_id] = (history, now)
+
+            while len(self._sessions) > self.max_sessions:
+                self._sessions.popitem(last=False)
+
+            return history
+
+    def peek(self, session_id: str) -> Optional[HistoryManager]:
+        """Get a session's history without creating it or refreshing its TTL"""
+        with self._lock:
+            entry = self._sessions.get(session_id)
+            return entry[0] if entry else None
+
+    def drop(self, session_id: str):
+        """Forget a session entirely"""
+        with self._lock:
+            self._sessions.pop(session_id, None)
+
+    def purge_expired(self) -> int:
+        """Drop idle sessions, returns how many were removed"""
+        with self._lock:
+            return self._purge_expired(time.monotonic())
+
+    def clear(self):
+        """Drop all sessions"""
+        with self._lock:
+            self._sessions.clear()
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+    def __contains__(self, session_id: str) -> bool:
+        return session_id in self._sessions
+
+    def _create_history(self) -> HistoryManager:
+        return HistoryManager(
+            max_messages=self.max_messages_per_session,
+            max_tokens=self.max_tokens_per_session
+        )
+
+    def _purge_expired(self, now: float) -> int:
+        """Remove sessions idle longer than idle_ttl (oldest are at the front)"""
+        if not self.idle_ttl:
+            return 0
+
+        removed = 0
+        while self._sessions:
+            session_id, (_, last_access) = next(iter(self._sessions.items()))
+            if now - last_access <= self.idle_ttl:
+                break
+            del self._sessions[session_id]
+            removed += 1
+        return removed
@@ -0,0 +1,97 @@
+"""
+SingleFlight - Coalesces concurrent identical calls into one in-flight execution
+"""
+
+import asyncio
+import threading
+from concurrent.futures import Future
+from typing import Any, Awaitable, Callable, Dict, Hashable
+
+class SingleFlight:
+    """
+    do(key, fn) runs fn once per key at a time: callers arriving while a call for
+    the same key is in flight wait for it and share its result (or exception).
+    Nothing is cached after the call finishes.
+    """
+
+    def __init__(self):
+        self._calls: Dict[Hashable, Future] = {}
+        self._lock = threading.Lock()
+        self.stats = {"executed": 0, "shared": 0}
+
+    def do(self, key: Hashable, fn: Callable[..., Any], *args, **kwargs) -> Any:
+        with self._lock:
+            future = self._calls.get(key)
+            leader = future is None
+            if leader:
+                future = self._calls[key] = Future()
+                self.stats["executed"] += 1
+            else:
+                self.stats["shared"] += 1
+
+        if not leader:
+            return future.result()
+
+        try:
+            result = fn(*args, **kwargs)
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+
+    def in_flight(self) -> int:
+        return len(self._calls)
+
+class _AsyncCall:
+    def __init__(self, task: asyncio.Task):
+        self.task = task
+        self.waiters = 0
+
+class AsyncSingleFlight:
+    """
+    asyncio counterpart of SingleFlight: fn is a coroutine function run as a task that
+    every caller (the first one included) awaits through a shield. A cancelled caller
+    only stops waiting; the call itself is cancelled once no caller is left waiting,
+    so a discarded speculative search never cancels another user's real search.
+    """
+
+    def __init__(self):
+        self._calls: Dict[Hashable, _AsyncCall] = {}
+        self.stats = {"executed": 0, "shared": 0}
+
+    async def do(self, key: Hashable, fn: Callable[..., Awaitable[Any]], *args, **kwargs) -> Any:
+        call = self._calls.get(key)
+        if call is None:
+            call = self._calls[key] = _AsyncCall(asyncio.ensure_future(fn(*args, **kwargs)))
+            call.task.add_done_callback(lambda task: self._finished(key, call))
+            self.stats["executed"] += 1
+        else:
+            self.stats["shared"] += 1
+
+        call.waiters += 1
+        try:
+            return await asyncio.shield(call.task)
+        finally:
+            call.waiters -= 1
+            if call.waiters == 0 and not call.task.done():
+                # Last caller gave up: stop the call and let the next caller start a fresh one
+                self._forget(key, call)
+                call.task.cancel()
+
+    def _finished(self, key: Hashable, call: _AsyncCall):
+        self._forget(key, call)
+        if not call.task.cancelled():
+            # Mark retrieved so a failure nobody awaited any more is not reported as "never retrieved"
+            call.task.exception()
+
+    def _forget(self, key: Hashable, call: _AsyncCall):
+        if self._calls.get(key) is call:
+            del self._calls[key]
+
+    def in_flight(self) -> int:
+        return len(self._calls)
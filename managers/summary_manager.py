@@ -0,0 +1,86 @@
+"""
+SummaryManager - Compacts long conversations into a rolling summary in the background
+"""
+
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List
+
+from .history_manager import HistoryManager
+from .prompt_manager import PromptManager
+
+# A turn adds a user and an assistant message
+TURN_MESSAGES = 2
+
+class SummaryManager:
+    """
+    Once a history passes threshold_tokens, or is within one turn (user + assistant)
+    of its message-count cap, its oldest turns (all but the last keep_recent
+    messages) are folded into the running summary by an LLM call on
+    a background thread. The current turn never waits: the turns stay in the
+    history until the new summary is ready, then are swapped out atomically.
+    The summary is updated incrementally (previous summary + new turns).
+    """
+
+    def __init__(self, openai_client, threshold_tokens: int = 2000, keep_recent: int = 6,
+                 model: str = "gpt-3.5-turbo", max_workers: int = 2):
+        self.client = openai_client
+        self.threshold_tokens = threshold_tokens
+        self.keep_recent = keep_recent
+        self.model = model
+        self.prompt_manager = PromptManager()
+
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="history-summary")
+        self._in_flight = set()  # ids of histories with a compaction running
+        self._lock = threading.Lock()
+
+    def maybe_compact(self, history_manager: HistoryManager) -> bool:
+        """Schedule a background compaction if the history is over threshold; never blocks"""
+        if not self._needs_compaction(history_manager):
+            return False
+
+        candidates = history_manager.get_compaction_candidates(self.keep_recent)
+        if not candidates:
+            return False
+
+        with self._lock:
+            if id(history_manager) in self._in_flight:
+                return False
+            self._in_flight.add(id(history_manager))
+
+        self._executor.submit(self._compact, history_manager, candidates, history_manager.get_summary())
+        return True
+
+    def _needs_compaction(self, history_manager: HistoryManager) -> bool:
+        if history_manager.get_token_count() >= self.threshold_tokens:
+            return True
+        # Short turns hit the count cap long before the token threshold; compact
+        # before the next turn's sliding window drops the oldest turns unsummarized
+        free_slots = history_manager.get_free_message_slots()
+        return free_slots is not None and free_slots < TURN_MESSAGES
+
+    def summarize(self, previous_summary: str, messages: List[Dict[str, str]]) -> str:
+        """Fold new turns into the previous summary"""
+        prompt = self.prompt_manager.create_summary_prompt(previous_summary, messages)
+
+        response = self.client.chat.completions.create(
+            model=self.model,
+            messages=[{"role": "user", "content": prompt}],
+            max_tokens=300,
+            temperature=0.2
+        )
+        return response.choices[0].message.content.strip()
+
+    def _compact(self, history_manager: HistoryManager, candidates: List[Dict[str, str]], previous_summary: str):
+        """(Worker Thread) Summarize and swap the compacted turns out of the history"""
+        try:
+            summary = self.summarize(previous_summary, candidates)
+            if summary:
+                history_manager.compact(candidates, summary)
+                print(f"DEBUG: Compacted {len(candidates)} messages into summary "
+                      f"({history_manager.get_token_count()} tokens now)")
+        except Exception as e:
+            print(f"DEBUG: History compaction failed, keeping full history: {e}")
+        finally:
+            with self._lock:
+                self._in_flight.discard(id(history_manager))
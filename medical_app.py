@@ -1,10 +1,13 @@
-from flask import Flask, render_template, request, jsonify, send_file, session as flask_session
+from flask import Flask, render_template, request, jsonify, send_file, Response, stream_with_context, session as flask_session
 import os
+import secrets
 from dotenv import load_dotenv
 from models import db, PatientSession, MedicalData
 from medical_chatbot import MedicalChatbot
 from report_generator import MedicalReportGenerator
 from language_manager import LanguageManager
+from streaming import sse_event, SSE_HEADERS
+import metrics
 import uuid
 import tempfile
 from datetime import datetime
@@ -12,7 +15,12 @@ from datetime import datetime
 load_dotenv()
 
 app = Flask(__name__)
-app.config['SECRET_KEY'] = os.getenv('SECRET_KEY', 'medical-chatbot-secret-key')
+# Sessions are keyed by the signed cookie, so a guessable key would let anyone forge one
+app.config['SECRET_KEY'] = os.getenv('SECRET_KEY')
+if not app.config['SECRET_KEY']:
+    app.config['SECRET_KEY'] = secrets.token_hex(32)
+    print("WARNING: SECRET_KEY is not set; using a random key (sessions reset on restart "
+          "and are not shared between gunicorn workers)")
 
 # Database configuration - Force SQLite for now (ignore Railway DATABASE_URL)
 database_url = os.getenv('CUSTOM_DATABASE_URL')  # Use custom variable instead of DATABASE_URL
@@ -34,6 +42,9 @@ chatbot = MedicalChatbot()
 report_generator = MedicalReportGenerator()
 language_manager = LanguageManager()
 
+# Per-stage latency, token counters and request timing at /metrics (Prometheus format)
+metrics.register_flask(app)
+
 @app.before_request
 def create_tables():
     if not hasattr(create_tables, "created"):
@@ -101,6 +112,29 @@ def chat():
     except Exception as e:
         return jsonify({'error': f'Lỗi xử lý tin nhắn: {str(e)}'}), 500
 
+@app.route('/chat/stream', methods=['POST'])
+def chat_stream():
+    """Handle chat messages, streaming the reply text as Server-Sent Events"""
+    session_id = flask_session.get('session_id')
+    if not session_id:
+        return jsonify({'error': 'Phiên làm việc không tồn tại'}), 400
+
+    user_message = (request.json or {}).get('message', '').strip()
+    if not user_message:
+        return jsonify({'error': 'Tin nhắn không được để trống'}), 400
+
+    def generate():
+        try:
+            for event, payload in chatbot.process_message_stream(session_id, user_message):
+                if event == 'delta':
+                    yield sse_event({'delta': payload})
+                else:
+                    yield sse_event(payload, event='error' if payload.get('error') else 'done')
+        except Exception as e:
+            yield sse_event({'error': f'Lỗi xử lý tin nhắn: {str(e)}'}, event='error')
+
+    return Response(stream_with_context(generate()), mimetype='text/event-stream', headers=SSE_HEADERS)
+
 @app.route('/session-summary/<session_id>')
 def get_session_summary(session_id):
     """Get session summary and progress"""
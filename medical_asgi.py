@@ -0,0 +1,38 @@
+"""
+ASGI entry point for medical_app.py:
+
+    uvicorn medical_asgi:app --host 0.0.0.0 --port $PORT
+
+/chat awaits MedicalChatbot.process_message_async; every other route (sessions,
+streaming, reports, admin) is the Flask app from medical_app.py.
+"""
+
+from medical_app import app as flask_app, chatbot
+from asgi_support import AsyncRequest, AsyncRoutes, send_json
+
+async def chat(request: AsyncRequest, send) -> int:
+    """Handle chat messages"""
+    session_id = request.session.get('session_id')
+    if not session_id:
+        await send_json(send, request, {'error': 'Phiên làm việc không tồn tại'}, 400)
+        return 400
+
+    user_message = str((await request.json()).get('message', '')).strip()
+    if not user_message:
+        await send_json(send, request, {'error': 'Tin nhắn không được để trống'}, 400)
+        return 400
+
+    try:
+        # The DB work inside process_message_async needs the Flask app context
+        with flask_app.app_context():
+            response = await chatbot.process_message_async(session_id, user_message)
+    except Exception as e:
+        response = {'error': f'Lỗi xử lý tin nhắn: {str(e)}'}
+
+    status = 500 if response.get('error') else 200
+    await send_json(send, request, response, status)
+    return status
+
+app = AsyncRoutes(flask_app, {
+    ('POST', '/chat'): chat,
+})
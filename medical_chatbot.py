@@ -1,21 +1,29 @@
-import openai
 import os
+import asyncio
 import json
 import re
-from typing import Dict, List, Tuple, Optional
+from typing import Dict, List, Tuple, Optional, Iterator
 from datetime import datetime
+from flask import current_app
 from models import MedicalData, MedicalPrompts, PatientSession, db
 from telegram_notifier import send_telegram_message
 from language_manager import LanguageManager
 from web_search import WebSearcher
+from streaming import JsonFieldStreamer
+from managers.llm_gateway import get_async_llm_gateway, get_llm_gateway
+from managers.pubmed_batcher import get_pubmed_batcher
+from metrics import timed, timed_stage
 import threading
 
 class MedicalChatbot:
     def __init__(self, api_key: str = None):
-        self.client = openai.OpenAI(api_key=api_key or os.getenv("OPENAI_API_KEY"))
+        self.client = get_llm_gateway(api_key)
+        self.async_client = get_async_llm_gateway(api_key)
         self.prompts = MedicalPrompts()
         self.language_manager = LanguageManager()
         self.web_searcher = WebSearcher()
+        # Chief complaints from concurrent sessions share PubMed calls (None = one lookup per session)
+        self.pubmed_batcher = get_pubmed_batcher(self.web_searcher)
 
     def create_session(self, language='vi') -> str:
         """Create new patient session"""
@@ -25,13 +33,19 @@ class MedicalChatbot:
         session.set_conversation_history([])
 
         db.session.add(session)
-        db.session.commit()
+        self._commit()
 
         return session.id
 
     def get_session(self, session_id: str) -> Optional[PatientSession]:
         """Get patient session by ID"""
-        return PatientSession.query.get(session_id)
+        with timed("db_load"):
+            return PatientSession.query.get(session_id)
+
+    def _commit(self):
+        """Commit the DB session (timed as the db_commit stage)"""
+        with timed("db_commit"):
+            db.session.commit()
 
     def check_red_flags(self, message: str, language='vi') -> bool:
         """Check for emergency symptoms"""
@@ -42,6 +56,7 @@ class MedicalChatbot:
                 return True
         return False
 
+    @timed_stage("get_clinical_prompt")
     def get_clinical_prompt(self, patient_data: Dict, conversation: List) -> str:
         """Get adaptive clinical reasoning prompt"""
 
@@ -151,9 +166,86 @@ QUAN TRỌNG: Trường "data" KHÔNG BAO GIỜ ĐƯỢC TRỐNG! Luôn phải c
 
     def process_message(self, session_id: str, user_message: str) -> Dict:
         """Process user message and return response using clinical reasoning"""
+        early_response, turn = self._prepare_turn(session_id, user_message)
+        if early_response:
+            return early_response
+
+        try:
+            # Get AI response
+            response = self.client.chat.completions.create(**self._completion_args(turn["messages"]))
+            return self._complete_turn(turn, user_message, response.choices[0].message.content)
+
+        except Exception as e:
+            return {"error": f"Lỗi xử lý: {str(e)}"}
+
+    async def process_message_async(self, session_id: str, user_message: str) -> Dict:
+        """
+        asyncio variant of process_message (asgi.py): the AI call is awaited; the DB load/save
+        and notifications run in a worker thread (call inside an app context, which the
+        thread inherits)
+        """
+        early_response, turn = await asyncio.to_thread(self._prepare_turn, session_id, user_message)
+        if early_response:
+            return early_response
+
+        try:
+            response = await self.async_client.chat.completions.create(**self._completion_args(turn["messages"]))
+            return await asyncio.to_thread(
+                self._complete_turn, turn, user_message, response.choices[0].message.content
+            )
+
+        except Exception as e:
+            return {"error": f"Lỗi xử lý: {str(e)}"}
+
+    def process_message_stream(self, session_id: str, user_message: str) -> Iterator[Tuple[str, object]]:
+        """
+        Streaming variant of process_message.
+        Yields ("delta", text) for the "message" field while the JSON reply is generated,
+        then ("done", response) once the full object (action, data) has been parsed.
+        """
+        early_response, turn = self._prepare_turn(session_id, user_message)
+        if early_response:
+            yield "done", early_response
+            return
+
+        try:
+            stream = self.client.chat.completions.create(stream=True, **self._completion_args(turn["messages"]))
+
+            streamer = JsonFieldStreamer("message")
+            chunks = []
+            for chunk in stream:
+                if not chunk.choices:
+                    continue
+                delta = chunk.choices[0].delta.content
+                if delta:
+                    chunks.append(delta)
+                    text = streamer.feed(delta)
+                    if text:
+                        yield "delta", text
+
+            yield "done", self._complete_turn(turn, user_message, "".join(chunks))
+
+        except Exception as e:
+            yield "done", {"error": f"Lỗi xử lý: {str(e)}"}
+
+    def _completion_args(self, messages: List[Dict]) -> Dict:
+        """Model settings for the clinical JSON-mode completion"""
+        return {
+            "model": "gpt-4o-mini",
+            "messages": messages,
+            "max_tokens": 500,
+            "temperature": 0.3,
+            "response_format": {"type": "json_object"}
+        }
+
+    def _prepare_turn(self, session_id: str, user_message: str) -> Tuple[Optional[Dict], Optional[Dict]]:
+        """
+        Load the session and build the prompt for this turn.
+        Returns (early_response, None) when no AI call is needed, else (None, turn).
+        """
         session = self.get_session(session_id)
         if not session:
-            return {"error": "Session not found"}
+            return {"error": "Session not found"}, None
 
         # Get session language
         session_language = session.language or 'vi'
@@ -164,12 +256,16 @@ QUAN TRỌNG: Trường "data" KHÔNG BAO GIỜ ĐƯỢC TRỐNG! Luôn phải c
                 "message": self.language_manager.get_emergency_response(session_language),
                 "action": "emergency",
                 "emergency": True
-            }
+            }, None
 
         # Get current data and conversation
         patient_data = session.get_patient_data()
         conversation = session.get_conversation_history()
 
+        # The background search may have finished (or lost its write to a concurrent turn)
+        if patient_data.get('pubmed_summary') == "pending":
+            self._apply_cached_pubmed_summary(patient_data)
+
         # Add user message to conversation
         conversation.append({
             "role": "user",
@@ -197,253 +293,275 @@ QUAN TRỌNG: Trường "data" KHÔNG BAO GIỜ ĐƯỢC TRỐNG! Luôn phải c
         # Add context messages
         messages.extend(context_messages)
 
-        try:
-            # Get AI response
-            response = self.client.chat.completions.create(
-                model="gpt-4o-mini",
-                messages=messages,
-                max_tokens=500,
-                temperature=0.3,
-                response_format={"type": "json_object"}
-            )
+        return None, {
+            "session": session,
+            "session_language": session_language,
+            "patient_data": patient_data,
+            "conversation": conversation,
+            "messages": messages
+        }
 
-            try:
-                raw_response = response.choices[0].message.content
-                print(f"DEBUG: Raw AI response: {raw_response}")
-
-                ai_response = json.loads(raw_response)
-                print(f"DEBUG: Parsed AI response keys: {ai_response.keys()}")
-
-                # Ensure ai_response is a dictionary
-                if not isinstance(ai_response, dict):
-                    ai_response = {
-                        "message": str(ai_response),
-                        "action": "continue"
-                    }
-            except Exception as e:
-                # Fallback if JSON parsing fails
-                ai_response = {
-                    "message": response.choices[0].message.content,
-                    "action": "continue"
-                }
+    def _complete_turn(self, turn: Dict, user_message: str, raw_response: str) -> Dict:
+        """Parse the AI's JSON reply, apply workflow rules and persist the session"""
+        session = turn["session"]
+        session_language = turn["session_language"]
+        patient_data = turn["patient_data"]
+        conversation = turn["conversation"]
+
+        try:
+            print(f"DEBUG: Raw AI response: {raw_response}")
 
-            # Adaptive clinical decision making
-            message_lower = user_message.lower()
-            conversation_length = len(conversation)
+            ai_response = json.loads(raw_response)
+            print(f"DEBUG: Parsed AI response keys: {ai_response.keys()}")
 
-            # Ensure ai_response is a dictionary before proceeding
+            # Ensure ai_response is a dictionary
             if not isinstance(ai_response, dict):
                 ai_response = {
-                    "message": str(ai_response) if ai_response else "Xin lỗi, có lỗi xảy ra. Vui lòng thử lại.",
+                    "message": str(ai_response),
                     "action": "continue"
                 }
+        except Exception as e:
+            # Fallback if JSON parsing fails
+            ai_response = {
+                "message": raw_response,
+                "action": "continue"
+            }
 
-            # Check current session status and handle accordingly
-            current_status = session.status
+        # Adaptive clinical decision making
+        message_lower = user_message.lower()
+        conversation_length = len(conversation)
 
-            # Handle completion requests at any stage
-            completion_keywords = ["hỏi lại", "mấy lần", "rồi đó", "được chưa", "!!!", "mắc mệt", "qua lẹ", "qua đi", "mất thời gian", "ăn chửi", "đủ rồi", "xong chưa", "kết thúc", "dừng lại", "thôi", "hết rồi", "xong rồi"]
+        # Ensure ai_response is a dictionary before proceeding
+        if not isinstance(ai_response, dict):
+            ai_response = {
+                "message": str(ai_response) if ai_response else "Xin lỗi, có lỗi xảy ra. Vui lòng thử lại.",
+                "action": "continue"
+            }
 
-            # Handle responses based on current status
-            if current_status == 'final_question':
-                # User is responding to "Còn câu gì muốn chia sẻ thêm không?"
-                negative_responses = ["không", "không có", "hết rồi", "thôi", "xong", "ok", "được rồi"]
-                positive_responses = ["có", "còn", "thêm"]
+        # Check current session status and handle accordingly
+        current_status = session.status
 
-                if any(keyword in message_lower for keyword in negative_responses) or any(keyword in message_lower for keyword in completion_keywords):
-                    ai_response["action"] = "show_summary"
-                elif any(keyword in message_lower for keyword in positive_responses):
-                    ai_response["action"] = "continue"
-                    ai_response["message"] = self.language_manager.get_workflow_message(session_language, 'additional_info')
-                else:
-                    # Extract any additional information provided
-                    ai_response["action"] = "show_summary"
-
-            elif current_status == 'awaiting_confirmation':
-                # User is responding to summary confirmation
-                confirmation_positive = ["có", "đúng", "chính xác", "ok", "được", "vâng"]
-                confirmation_negative = ["không", "sai", "chưa đúng", "cần sửa", "bổ sung"]
-
-                if any(keyword in message_lower for keyword in confirmation_positive) or any(keyword in message_lower for keyword in completion_keywords):
-                    ai_response["action"] = "complete"
-                    ai_response["message"] = self.language_manager.get_workflow_message(session_language, 'completion_confirmed')
-                elif any(keyword in message_lower for keyword in confirmation_negative):
-                    ai_response["action"] = "need_more_info"
-                    ai_response["message"] = self.language_manager.get_workflow_message(session_language, 'need_correction')
-                else:
-                    # Treat any response as completion request
-                    ai_response["action"] = "complete"
-                    ai_response["message"] = self.language_manager.get_workflow_message(session_language, 'general_completion')
-
-            # General completion check for any stage
-            elif any(keyword in message_lower for keyword in completion_keywords):
-                if current_status in ['active', 'need_more_info']:
-                    ai_response["action"] = "final_question"
-                    ai_response["message"] = self.language_manager.get_workflow_message(session_language, 'final_question')
-                else:
-                    ai_response["action"] = "complete"
-                    ai_response["message"] = self.language_manager.get_workflow_message(session_language, 'simple_completion')
+        # Handle completion requests at any stage
+        completion_keywords = ["hỏi lại", "mấy lần", "rồi đó", "được chưa", "!!!", "mắc mệt", "qua lẹ", "qua đi", "mất thời gian", "ăn chửi", "đủ rồi", "xong chưa", "kết thúc", "dừng lại", "thôi", "hết rồi", "xong rồi"]
 
-            # Auto-complete if conversation too long, but follow proper workflow
-            elif conversation_length > 15:
+        # Handle responses based on current status
+        if current_status == 'final_question':
+            # User is responding to "Còn câu gì muốn chia sẻ thêm không?"
+            negative_responses = ["không", "không có", "hết rồi", "thôi", "xong", "ok", "được rồi"]
+            positive_responses = ["có", "còn", "thêm"]
+
+            if any(keyword in message_lower for keyword in negative_responses) or any(keyword in message_lower for keyword in completion_keywords):
+                ai_response["action"] = "show_summary"
+            elif any(keyword in message_lower for keyword in positive_responses):
+                ai_response["action"] = "continue"
+                ai_response["message"] = self.language_manager.get_workflow_message(session_language, 'additional_info')
+            else:
+                # Extract any additional information provided
+                ai_response["action"] = "show_summary"
+
+        elif current_status == 'awaiting_confirmation':
+            # User is responding to summary confirmation
+            confirmation_positive = ["có", "đúng", "chính xác", "ok", "được", "vâng"]
+            confirmation_negative = ["không", "sai", "chưa đúng", "cần sửa", "bổ sung"]
+
+            if any(keyword in message_lower for keyword in confirmation_positive) or any(keyword in message_lower for keyword in completion_keywords):
+                ai_response["action"] = "complete"
+                ai_response["message"] = self.language_manager.get_workflow_message(session_language, 'completion_confirmed')
+            elif any(keyword in message_lower for keyword in confirmation_negative):
+                ai_response["action"] = "need_more_info"
+                ai_response["message"] = self.language_manager.get_workflow_message(session_language, 'need_correction')
+            else:
+                # Treat any response as completion request
+                ai_response["action"] = "complete"
+                ai_response["message"] = self.language_manager.get_workflow_message(session_language, 'general_completion')
+
+        # General completion check for any stage
+        elif any(keyword in message_lower for keyword in completion_keywords):
+            if current_status in ['active', 'need_more_info']:
                 ai_response["action"] = "final_question"
-                ai_response["message"] = self.language_manager.get_workflow_message(session_language, 'lengthy_conversation')
-
-            # Add AI response to conversation
-            conversation.append({
-                "role": "assistant",
-                "content": ai_response.get("message", ""),
-                "timestamp": datetime.now().isoformat(),
-                "action": ai_response.get("action"),
-                "data": ai_response.get("data")
-            })
-
-            # Update patient data if provided by AI, or extract from conversation
-            if ai_response.get("data"):
-                self.update_patient_data(patient_data, ai_response["data"])
+                ai_response["message"] = self.language_manager.get_workflow_message(session_language, 'final_question')
+            else:
+                ai_response["action"] = "complete"
+                ai_response["message"] = self.language_manager.get_workflow_message(session_language, 'simple_completion')
+
+        # Auto-complete if conversation too long, but follow proper workflow
+        elif conversation_length > 15:
+            ai_response["action"] = "final_question"
+            ai_response["message"] = self.language_manager.get_workflow_message(session_language, 'lengthy_conversation')
+
+        # Add AI response to conversation
+        conversation.append({
+            "role": "assistant",
+            "content": ai_response.get("message", ""),
+            "timestamp": datetime.now().isoformat(),
+            "action": ai_response.get("action"),
+            "data": ai_response.get("data")
+        })
+
+        # Update patient data if provided by AI, or extract from conversation
+        if ai_response.get("data"):
+            self.update_patient_data(patient_data, ai_response["data"])
+            session.set_patient_data(patient_data)  # CRITICAL: Save to session
+            print(f"DEBUG: Updated and saved patient data from AI")
+        else:
+            # If AI didn't provide structured data, try to extract it ourselves
+            print(f"DEBUG: AI didn't provide data, extracting from message: '{user_message}'")
+            extracted_data = self.extract_data_from_message(user_message, patient_data)
+            print(f"DEBUG: Extracted data: {extracted_data}")
+            if extracted_data:
+                self.update_patient_data(patient_data, extracted_data)
                 session.set_patient_data(patient_data)  # CRITICAL: Save to session
-                print(f"DEBUG: Updated and saved patient data from AI")
+                print(f"DEBUG: Updated and saved patient data from extraction")
+
+        # === Start PubMed Search Thread ===
+        patient_data = session.get_patient_data() # Re-get the latest data
+        chief_complaint = patient_data.get('chief_complaint', {}).get('main_complaint')
+        
+        # Start search if a complaint exists and a search hasn't been started
+        if chief_complaint and 'pubmed_summary' not in patient_data:
+            # Common complaints are usually cached: the next turn's prompt already has the summary
+            if self._apply_cached_pubmed_summary(patient_data):
+                session.set_patient_data(patient_data)
             else:
-                # If AI didn't provide structured data, try to extract it ourselves
-                print(f"DEBUG: AI didn't provide data, extracting from message: '{user_message}'")
-                extracted_data = self.extract_data_from_message(user_message, patient_data)
-                print(f"DEBUG: Extracted data: {extracted_data}")
-                if extracted_data:
-                    self.update_patient_data(patient_data, extracted_data)
-                    session.set_patient_data(patient_data)  # CRITICAL: Save to session
-                    print(f"DEBUG: Updated and saved patient data from extraction")
-
-            # === Start PubMed Search Thread ===
-            patient_data = session.get_patient_data() # Re-get the latest data
-            chief_complaint = patient_data.get('chief_complaint', {}).get('main_complaint')
-            
-            # Start search if a complaint exists and a search hasn't been started
-            if chief_complaint and 'pubmed_summary' not in patient_data:
                 # Add a placeholder to prevent starting multiple searches
                 patient_data['pubmed_summary'] = "pending"
                 session.set_patient_data(patient_data)
-                db.session.commit()
+                self._commit()
 
                 # Start the background search
                 thread = threading.Thread(
                     target=self._search_and_store_pubmed_summary,
-                    args=(session.id, chief_complaint)
+                    args=(current_app._get_current_object(), session.id, chief_complaint)
                 )
                 thread.start()
-            # =================================
-
-            # Handle workflow actions
-            completed = False
-            progress = min(conversation_length * 10, 100)
-
-            # Handle different action types
-            action = ai_response.get("action")
-
-            if action == "final_question":
-                progress = 85
-                session.status = 'final_question'
-            elif action == "show_summary":
-                # Generate preliminary summary for review
-                summary_data = self._generate_preliminary_summary(patient_data)
-                ai_response["message"] = f"Dựa trên thông tin bạn đã cung cấp, tôi tóm tắt lại như sau:\n\n{summary_data}\n\nThông tin trên có chính xác không? Có cần bổ sung gì thêm không?"
-                progress = 95
-                session.status = 'awaiting_confirmation'
-            elif action == "need_more_info":
-                progress = 80
-                session.status = 'need_more_info'
-            elif action in ["complete", "emergency"]:
-                completed = True
-                progress = 100
-                session.status = 'completed'
-            elif action == "continue" and current_status not in ['active']:
-                # Reset to active if continuing from other states
-                session.status = 'active'
-
-            # Update session
-            session.set_patient_data(patient_data)
-            session.set_conversation_history(conversation)
-            session.updated_at = datetime.utcnow()
-            session.progress_percentage = progress
-
-            # Stage progression based on conversation length
-            conversation_length = len(conversation)
-            if conversation_length > 15:  # Force completion after sufficient conversation
-                session.current_stage = 7
-                session.status = 'completed'
-                session.progress_percentage = 100
-            elif conversation_length > 12:
-                session.current_stage = 6
-            elif conversation_length > 9:
-                session.current_stage = 5
-            elif conversation_length > 6:
-                session.current_stage = 4
-            elif conversation_length > 4:
-                session.current_stage = 3
-            elif conversation_length > 2:
-                session.current_stage = 2
-
-            if session.current_stage > 6:
-                session.status = 'completed'
-                session.progress_percentage = 100
-
-            # If conversation is complete, generate and return the final summary
-            if session.status == 'completed' or ai_response.get("action") == "summarize":
-                final_summary = self._generate_text_summary(patient_data)
-
-                # Generate clinical insights for doctor
-                clinical_insights = self._generate_clinical_insights(patient_data, conversation)
-                doctor_message = f"{final_summary}\n\n{clinical_insights}"
-
-                # Send the enhanced summary to Telegram
-                send_telegram_message(doctor_message)
-
-                return {
-                    "message": final_summary,
-                    "action": "end_session",
-                    "stage": 7,
-                    "progress": 100,
-                    "completed": True
-                }
-
-            # For non-summary turns, save log and commit session
-            self._save_conversation_log(session)
-            db.session.commit()
+        # =================================
+
+        # Handle workflow actions
+        completed = False
+        progress = min(conversation_length * 10, 100)
+
+        # Handle different action types
+        action = ai_response.get("action")
+
+        if action == "final_question":
+            progress = 85
+            session.status = 'final_question'
+        elif action == "show_summary":
+            # Generate preliminary summary for review
+            summary_data = self._generate_preliminary_summary(patient_data)
+            ai_response["message"] = f"Dựa trên thông tin bạn đã cung cấp, tôi tóm tắt lại như sau:\n\n{summary_data}\n\nThông tin trên có chính xác không? Có cần bổ sung gì thêm không?"
+            progress = 95
+            session.status = 'awaiting_confirmation'
+        elif action == "need_more_info":
+            progress = 80
+            session.status = 'need_more_info'
+        elif action in ["complete", "emergency"]:
+            completed = True
+            progress = 100
+            session.status = 'completed'
+        elif action == "continue" and current_status not in ['active']:
+            # Reset to active if continuing from other states
+            session.status = 'active'
+
+        # Update session
+        session.set_patient_data(patient_data)
+        session.set_conversation_history(conversation)
+        session.updated_at = datetime.utcnow()
+        session.progress_percentage = progress
+
+        # Stage progression based on conversation length
+        conversation_length = len(conversation)
+        if conversation_length > 15:  # Force completion after sufficient conversation
+            session.current_stage = 7
+            session.status = 'completed'
+            session.progress_percentage = 100
+        elif conversation_length > 12:
+            session.current_stage = 6
+        elif conversation_length > 9:
+            session.current_stage = 5
+        elif conversation_length > 6:
+            session.current_stage = 4
+        elif conversation_length > 4:
+            session.current_stage = 3
+        elif conversation_length > 2:
+            session.current_stage = 2
+
+        if session.current_stage > 6:
+            session.status = 'completed'
+            session.progress_percentage = 100
+
+        # If conversation is complete, generate and return the final summary
+        if session.status == 'completed' or ai_response.get("action") == "summarize":
+            final_summary = self._generate_text_summary(patient_data)
+
+            # Generate clinical insights for doctor
+            clinical_insights = self._generate_clinical_insights(patient_data, conversation)
+            doctor_message = f"{final_summary}\n\n{clinical_insights}"
+
+            # Send the enhanced summary to Telegram
+            send_telegram_message(doctor_message)
 
             return {
-                "message": ai_response.get("message", ""),
-                "action": ai_response.get("action"),
-                "stage": session.current_stage,
-                "progress": session.progress_percentage,
-                "completed": completed
+                "message": final_summary,
+                "action": "end_session",
+                "stage": 7,
+                "progress": 100,
+                "completed": True
             }
 
-        except Exception as e:
-            return {"error": f"Lỗi xử lý: {str(e)}"}
+        # For non-summary turns, save log and commit session
+        self._save_conversation_log(session)
+        self._commit()
+
+        return {
+            "message": ai_response.get("message", ""),
+            "action": ai_response.get("action"),
+            "stage": session.current_stage,
+            "progress": session.progress_percentage,
+            "completed": completed
+        }
 
-    def _search_and_store_pubmed_summary(self, session_id: str, query: str):
+    def _apply_cached_pubmed_summary(self, patient_data: Dict) -> bool:
+        """Fill patient_data['pubmed_summary'] from the search cache (no network call)"""
+        chief_complaint = patient_data.get('chief_complaint', {}).get('main_complaint')
+        summary = self.web_searcher.cached_pubmed(chief_complaint) if chief_complaint else None
+        if summary:
+            patient_data['pubmed_summary'] = summary
+            print(f"DEBUG: PubMed summary for '{chief_complaint}' served from cache")
+            return True
+        return False
+
+    def _search_and_store_pubmed_summary(self, app, session_id: str, query: str):
         """
         (Worker Thread) Searches PubMed and stores the summary in the session's patient_data.
         """
-        try:
-            summary = self.web_searcher.search_pubmed(query)
-            if summary:
-                # This runs in a separate thread, so we need to be careful with DB session.
-                # For this implementation, we re-fetch the session and commit the single update.
+        # The DB session is bound to the Flask app context, which threads don't inherit
+        with app.app_context():
+            try:
+                if self.pubmed_batcher is not None:
+                    # Bounded wait: a stuck batch must not leave the session "pending" forever
+                    summary = self.pubmed_batcher.search(query)
+                else:
+                    summary = self.web_searcher.search_pubmed(query)
+                if summary:
+                    # This runs in a separate thread, so we need to be careful with DB session.
+                    # For this implementation, we re-fetch the session and commit the single update.
+                    session = self.get_session(session_id)
+                    if session:
+                        patient_data = session.get_patient_data()
+                        patient_data['pubmed_summary'] = summary
+                        session.set_patient_data(patient_data)
+                        self._commit()
+            except Exception as e:
+                # Includes the batcher's TimeoutError
+                print(f"[THREAD ERROR] Failed to search PubMed for session {session_id}: {e!r}")
+                db.session.rollback()
                 session = self.get_session(session_id)
                 if session:
                     patient_data = session.get_patient_data()
-                    patient_data['pubmed_summary'] = summary
+                    patient_data['pubmed_summary'] = "failed"
                     session.set_patient_data(patient_data)
-                    db.session.commit()
-        except Exception as e:
-            print(f"[THREAD ERROR] Failed to search PubMed for session {session_id}: {e}")
-            # Optionally, update status to 'failed'
-            session = self.get_session(session_id)
-            if session:
-                patient_data = session.get_patient_data()
-                patient_data['pubmed_summary'] = "failed"
-                session.set_patient_data(patient_data)
-                db.session.commit()
+                    self._commit()
 
     def update_patient_data(self, patient_data: Dict, new_data: Dict):
         """Update patient data with new information"""
@@ -491,6 +609,7 @@ QUAN TRỌNG: Trường "data" KHÔNG BAO GIỜ ĐƯỢC TRỐNG! Luôn phải c
             if not is_duplicate:
                 existing_list.append(new_item)
 
+    @timed_stage("extract_data_from_message")
     def extract_data_from_message(self, user_message: str, current_data: Dict) -> Dict:
         """Extract structured data from user message using pattern matching"""
         message_lower = user_message.lower()
@@ -1012,6 +1131,7 @@ QUAN TRỌNG: Trường "data" KHÔNG BAO GIỜ ĐƯỢC TRỐNG! Luôn phải c
         
         return summary
 
+    @timed_stage("save_conversation_log")
     def _save_conversation_log(self, session: PatientSession):
         """Saves the entire session data to a log file."""
         try:
@@ -0,0 +1,209 @@
+"""
+Lightweight Prometheus-format metrics (no extra dependency) shared by app.py and medical_app.py.
+
+- STAGE_SECONDS: per-stage latency histogram (search decision, web search, LLM call, DB, ...)
+- STAGE_ERRORS: stages that raised
+- LLM_TOKENS: prompt/completion tokens reported by the API, per model
+- HTTP_SECONDS: request latency per route and status
+- SEARCH_CACHE_LOOKUPS: shared search cache hits/misses per source
+- OUTBOUND_CONNECTIONS: scraping/Telegram requests per host, new vs reused connections
+- RATE_LIMIT_WAIT_SECONDS: time requests waited for an outbound rate limiter (NCBI)
+
+Metrics are kept per process: with several gunicorn workers each worker exposes its own
+/metrics, so scrape every worker (or read one as a sample).
+"""
+
+import functools
+import inspect
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Sequence, Tuple
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _labels(names: Sequence[str], values: Sequence[str], extra: Dict[str, str] = None) -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    pairs += [f'{name}="{_escape(value)}"' for name, value in (extra or {}).items()]
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+class Counter:
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1, *labelvalues: str):
+        key = tuple(str(value) for value in labelvalues)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, *labelvalues: str) -> float:
+        return self._values.get(tuple(str(value) for value in labelvalues), 0)
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_labels(self.labelnames, key)} {_format_value(value)}")
+        return lines
+
+class Histogram:
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # label values -> [per-bucket counts (+Inf last), sum, count]
+        self._series: Dict[Tuple[str, ...], list] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *labelvalues: str):
+        key = tuple(str(label) for label in labelvalues)
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def count(self, *labelvalues: str) -> int:
+        series = self._series.get(tuple(str(label) for label in labelvalues))
+        return series[2] if series else 0
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for key, (bucket_counts, total, count) in sorted(self._series.items()):
+                cumulative = 0
+                for bound, bucket_count in zip(self.buckets + (float("inf"),), bucket_counts):
+                    cumulative += bucket_count
+                    labels = _labels(self.labelnames, key, {"le": _format_value(bound)})
+                    lines.append(f"{self.name}_bucket{labels} {cumulative}")
+                lines.append(f"{self.name}_sum{_labels(self.labelnames, key)} {_format_value(total)}")
+                lines.append(f"{self.name}_count{_labels(self.labelnames, key)} {count}")
+        return lines
+
+class Gauge:
+    """Value read at scrape time from a callback returning {label values tuple: value}"""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._function = None
+
+    def set_function(self, function):
+        self._function = function
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} gauge"]
+        values = self._function() if self._function is not None else {}
+        for key, value in sorted(values.items()):
+            lines.append(f"{self.name}{_labels(self.labelnames, key)} {_format_value(value)}")
+        return lines
+
+STAGE_SECONDS = Histogram(
+    "chatbot_stage_duration_seconds", "Time spent in each stage of handling a chat turn", ("stage",)
+)
+STAGE_ERRORS = Counter("chatbot_stage_errors_total", "Stages that raised an exception", ("stage",))
+LLM_TOKENS = Counter("chatbot_llm_tokens_total", "Tokens reported by the OpenAI API", ("model", "kind"))
+LLM_REQUESTS = Counter("chatbot_llm_requests_total", "Chat completion calls by model and outcome", ("model", "outcome"))
+HTTP_SECONDS = Histogram(
+    "chatbot_http_request_duration_seconds", "HTTP request latency by route", ("route", "method", "status")
+)
+SEARCH_CACHE_LOOKUPS = Counter(
+    "chatbot_search_cache_lookups_total", "Search result cache lookups by source and result", ("source", "result")
+)
+OUTBOUND_CONNECTIONS = Gauge(
+    "chatbot_outbound_http_connections", "Outbound HTTP requests per host and whether they opened a new connection",
+    ("host", "kind")
+)
+RATE_LIMIT_WAIT_SECONDS = Histogram(
+    "chatbot_rate_limit_wait_seconds", "Time outbound requests waited for a rate limiter token", ("limiter",)
+)
+
+REGISTRY = [STAGE_SECONDS, STAGE_ERRORS, LLM_REQUESTS, LLM_TOKENS, HTTP_SECONDS, SEARCH_CACHE_LOOKUPS,
+            OUTBOUND_CONNECTIONS, RATE_LIMIT_WAIT_SECONDS]
+
+@contextmanager
+def timed(stage: str) -> Iterator[None]:
+    """Record how long the block takes under STAGE_SECONDS{stage=...}"""
+    start = time.perf_counter()
+    try:
+        yield
+    except BaseException:
+        STAGE_ERRORS.inc(1, stage)
+        raise
+    finally:
+        STAGE_SECONDS.observe(time.perf_counter() - start, stage)
+
+def timed_stage(stage: str):
+    """Decorator form of timed() (works on coroutine functions too)"""
+    def decorator(func):
+        if inspect.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                with timed(stage):
+                    return await func(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with timed(stage):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+def record_usage(model: str, usage) -> None:
+    """Count prompt/completion tokens from an OpenAI usage object (ignored when missing)"""
+    if usage is None:
+        return
+    LLM_TOKENS.inc(getattr(usage, "prompt_tokens", 0) or 0, model, "prompt")
+    LLM_TOKENS.inc(getattr(usage, "completion_tokens", 0) or 0, model, "completion")
+
+def render() -> str:
+    """All metrics in the Prometheus text exposition format"""
+    lines = []
+    for metric in REGISTRY:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+def register_flask(app) -> None:
+    """
+    Add request timing hooks and a /metrics endpoint to a Flask app
+    (for SSE routes the request time ends when the stream starts; stages cover the rest)
+    """
+    from flask import Response, g, request
+
+    @app.before_request
+    def _start_request_timer():
+        g.metrics_start = time.perf_counter()
+
+    @app.after_request
+    def _record_request(response):
+        start = getattr(g, "metrics_start", None)
+        if start is not None and request.endpoint != "metrics":
+            route = request.url_rule.rule if request.url_rule else "unmatched"
+            HTTP_SECONDS.observe(time.perf_counter() - start, route, request.method, response.status_code)
+        return response
+
+    @app.route("/metrics")
+    def metrics():
+        return Response(render(), content_type=CONTENT_TYPE)
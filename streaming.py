@@ -0,0 +1,122 @@
+"""
+Helpers for streaming chat responses to the browser as Server-Sent Events
+"""
+
+import json
+from typing import Optional
+
+SSE_HEADERS = {
+    'Cache-Control': 'no-cache',
+    'X-Accel-Buffering': 'no'  # Stop reverse proxies (nginx/Railway) from buffering the stream
+}
+
+def sse_event(data, event: str = None) -> str:
+    """Format one Server-Sent Event; data is JSON-encoded"""
+    payload = json.dumps(data, ensure_ascii=False)
+    prefix = f"event: {event}\n" if event else ""
+    return f"{prefix}data: {payload}\n\n"
+
+class JsonFieldStreamer:
+    """
+    Incrementally extracts one top-level string field from a JSON object
+    that arrives in chunks, e.g. the "message" field of a JSON-mode completion.
+
+    feed() returns the newly decoded characters of the field value so they
+    can be forwarded before the rest of the object (action, data) is complete.
+    """
+
+    ESCAPES = {'n': '\n', 't': '\t', 'r': '\r', 'b': '\b', 'f': '\f', '"': '"', '\\': '\\', '/': '/'}
+
+    def __init__(self, field: str = "message"):
+        self.field = field
+        self.depth = 0
+        self.in_string = False
+        self.escape = False
+        self.string_is_value = False
+        self.expecting_value = False
+        self.text = ""          # current key text (only tracked outside the captured field)
+        self.last_key: Optional[str] = None
+        self.capturing = False
+        self.unicode_digits: Optional[str] = None
+        self.high_surrogate: Optional[int] = None
+        self.done = False
+
+    def feed(self, chunk: str) -> str:
+        """Consume a chunk of raw JSON text, return decoded field characters found in it"""
+        output = []
+        for char in chunk:
+            if self.in_string:
+                if self.capturing:
+                    self._capture_char(char, output)
+                else:
+                    self._scan_string_char(char)
+            else:
+                self._scan_structure_char(char)
+        return "".join(output)
+
+    def _scan_structure_char(self, char: str):
+        if char == '"':
+            self.in_string = True
+            self.text = ""
+            self.string_is_value = self.depth == 1 and self.expecting_value
+            if self.string_is_value and self.last_key == self.field and not self.done:
+                self.capturing = True
+        elif char == ':' and self.depth == 1:
+            self.expecting_value = True
+        elif char == ',' and self.depth == 1:
+            self.expecting_value = False
+        elif char in '{[':
+            self.depth += 1
+        elif char in '}]':
+            self.depth -= 1
+
+    def _scan_string_char(self, char: str):
+        if self.escape:
+            self.escape = False
+            self.text += char
+        elif char == '\\':
+            self.escape = True
+        elif char == '"':
+            self._end_string()
+        else:
+            self.text += char
+
+    def _capture_char(self, char: str, output: list):
+        if self.unicode_digits is not None:
+            self.unicode_digits += char
+            if len(self.unicode_digits) == 4:
+                self._emit_codepoint(int(self.unicode_digits, 16), output)
+                self.unicode_digits = None
+        elif self.escape:
+            self.escape = False
+            if char == 'u':
+                self.unicode_digits = ""
+            else:
+                output.append(self.ESCAPES.get(char, char))
+        elif char == '\\':
+            self.escape = True
+        elif char == '"':
+            self.capturing = False
+            self.done = True
+            self._end_string()
+        else:
+            output.append(char)
+
+    def _emit_codepoint(self, codepoint: int, output: list):
+        """Append a \\uXXXX escape, joining UTF-16 surrogate pairs (emoji)"""
+        if 0xD800 <= codepoint <= 0xDBFF:
+            self.high_surrogate = codepoint
+            return
+        if 0xDC00 <= codepoint <= 0xDFFF and self.high_surrogate is not None:
+            codepoint = 0x10000 + ((self.high_surrogate - 0xD800) << 10) + (codepoint - 0xDC00)
+        self.high_surrogate = None
+        output.append(chr(codepoint))
+
+    def _end_string(self):
+        self.in_string = False
+        if self.depth != 1:
+            return
+        if self.string_is_value:
+            self.expecting_value = False
+        else:
+            self.last_key = self.text
@@ -1,6 +1,8 @@
 import os
 import requests
 from dotenv import load_dotenv
+import http_client
+from metrics import timed_stage
 
 # Load environment variables from .env file
 load_dotenv()
@@ -8,6 +10,7 @@ load_dotenv()
 TELEGRAM_BOT_TOKEN = os.getenv("TELEGRAM_BOT_TOKEN")
 TELEGRAM_CHAT_ID = os.getenv("TELEGRAM_CHAT_ID")
 
+@timed_stage("send_telegram_message")
 def send_telegram_message(message: str):
     """Sends a message to a specified Telegram chat."""
     if not TELEGRAM_BOT_TOKEN or not TELEGRAM_CHAT_ID:
@@ -23,7 +26,7 @@ def send_telegram_message(message: str):
     }
 
     try:
-        response = requests.post(api_url, json=payload, timeout=10)
+        response = http_client.post(api_url, json=payload, timeout=10)
         response.raise_for_status()  # Raise an exception for bad status codes
         print("Successfully sent summary to Telegram.")
         return True
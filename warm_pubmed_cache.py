@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+
+"""
+Pre-populate the PubMed summary cache with common chief complaints, so new medical
+sessions find their summary in the cache instead of waiting on NCBI.
+
+Complaints are looked up in batches (one esummary call per batch) within the NCBI
+rate limit; complaints that are already cached are skipped. Run it after a deploy
+or from a daily cron job (entries live PUBMED_CACHE_TTL_DAYS days).
+
+Usage:
+    python warm_pubmed_cache.py                       # built-in list of common complaints
+    python warm_pubmed_cache.py --from-db --top 50    # + most frequent complaints in PatientSession
+    python warm_pubmed_cache.py --complaint "đau lưng" --complaint "chóng mặt"
+"""
+
+import argparse
+import time
+from collections import Counter
+from typing import List
+
+from managers.cache import normalize_complaint
+from web_search import WebSearcher
+
+COMMON_CHIEF_COMPLAINTS = [
+    "đau bụng", "đau đầu", "ho", "sốt", "đau họng", "khó thở", "đau ngực", "chóng mặt",
+    "buồn nôn", "nôn", "tiêu chảy", "táo bón", "đau lưng", "đau khớp", "mệt mỏi", "mất ngủ",
+    "phát ban", "ngứa", "sổ mũi", "nghẹt mũi", "đau tai", "đau răng", "tiểu buốt", "tiểu nhiều",
+    "đau bụng kinh", "hồi hộp", "đánh trống ngực", "tê tay chân", "sụt cân", "ợ nóng",
+]
+
+def complaints_from_db(top: int) -> List[str]:
+    """Most frequent chief complaints in stored sessions (by normalized key)"""
+    from medical_app import app
+    from models import PatientSession
+
+    counts, examples = Counter(), {}
+    with app.app_context():
+        for session in PatientSession.query.all():
+            complaint = session.get_patient_data().get('chief_complaint', {}).get('main_complaint')
+            if complaint:
+                key = normalize_complaint(complaint)
+                counts[key] += 1
+                examples.setdefault(key, complaint)
+    return [examples[key] for key, _ in counts.most_common(top)]
+
+def warm(complaints: List[str], batch_size: int = 20) -> dict:
+    searcher = WebSearcher()
+    if searcher.cache is None:
+        raise SystemExit("Search cache is disabled (SEARCH_CACHE=0), nothing to warm")
+
+    # One entry per normalized complaint
+    unique = list({normalize_complaint(c): c for c in complaints}.values())
+    missing = [c for c in unique if searcher.cached_pubmed(c) is None]
+    stats = {"complaints": len(unique), "already_cached": len(unique) - len(missing), "stored": 0, "empty": 0}
+
+    for start in range(0, len(missing), batch_size):
+        batch = missing[start:start + batch_size]
+        summaries = searcher.search_pubmed_batch(batch)
+        for complaint in batch:
+            if summaries.get(complaint):
+                stats["stored"] += 1
+            else:
+                stats["empty"] += 1
+                print(f"⚠️ Không tìm thấy bài tổng quan PubMed cho '{complaint}'")
+    return stats
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--complaint", action="append", default=[], help="extra complaint (repeatable)")
+    parser.add_argument("--from-db", action="store_true", help="add the most frequent complaints from the database")
+    parser.add_argument("--top", type=int, default=50, help="complaints to take from the database")
+    parser.add_argument("--no-defaults", action="store_true", help="skip the built-in complaint list")
+    parser.add_argument("--batch-size", type=int, default=20)
+    args = parser.parse_args()
+
+    complaints = ([] if args.no_defaults else list(COMMON_CHIEF_COMPLAINTS)) + args.complaint
+    if args.from_db:
+        complaints += complaints_from_db(args.top)
+
+    start = time.perf_counter()
+    stats = warm(complaints, args.batch_size)
+    print(f"✅ Đã làm nóng cache PubMed trong {time.perf_counter() - start:.1f}s: {stats}")
+
+if __name__ == "__main__":
+    main()
@@ -1,126 +1,211 @@
+import asyncio
+import os
+import re
 import requests
-from bs4 import BeautifulSoup
+import http_client
+import http_fixtures
+from bs4 import BeautifulSoup, SoupStrainer
 import json
-from urllib.parse import quote
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import TYPE_CHECKING, Callable, Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, quote, urlsplit
 import time
+from metrics import timed_stage
+from managers.cache import normalize_complaint, normalize_query
+from managers.rate_limiter import get_ncbi_limiter
+from managers.search_cache import get_search_cache
+from managers.singleflight import AsyncSingleFlight, SingleFlight
+
+# httpx is only needed by AsyncWebSearcher (asgi.py); the sync apps run without it
+if TYPE_CHECKING:
+    import httpx
+
+PUBMED_BASE_URL = "https://eutils.ncbi.nlm.nih.gov/entrez/eutils/"
+# Raises the NCBI limit from 3 to 10 requests/sec (see managers/rate_limiter.py)
+NCBI_API_KEY = os.getenv("NCBI_API_KEY", "")
+# Read timeout of each E-utilities call (esearch / esummary)
+PUBMED_READ_TIMEOUT = 15
+
+# lxml is a faster tree builder when installed; html.parser otherwise
+try:
+    import lxml  # noqa: F401
+    HTML_PARSER = "lxml"
+except ImportError:
+    HTML_PARSER = "html.parser"
+
+# Opening tags of result containers: <div class="... result ..."> (DuckDuckGo),
+# <div class="... item-news ..."> (VnExpress); matched on the exact class token
+_DUCKDUCKGO_RESULT_RE = re.compile(rb'<div\b[^>]*\sclass="(?:[^"]*\s)?result(?:\s[^"]*)?"', re.IGNORECASE)
+_VNEXPRESS_ITEM_RE = re.compile(rb'<div\b[^>]*\sclass="(?:[^"]*\s)?item-news(?:\s[^"]*)?"', re.IGNORECASE)
+_CHARSET_RE = re.compile(rb'charset=["\']?([\w-]+)', re.IGNORECASE)
+
+def _result_window(content: bytes, container_re: "re.Pattern", limit: int) -> bytes:
+    """
+    The slice of the page from the first result container up to where container
+    limit + 1 starts, so only the results we keep get parsed. Empty when no
+    container tag is found (e.g. changed markup); callers then parse the whole page.
+    """
+    starts = []
+    for match in container_re.finditer(content):
+        starts.append(match.start())
+        if len(starts) > limit:
+            break
+    if not starts:
+        return b""
+    return content[starts[0]:starts[limit]] if len(starts) > limit else content[starts[0]:]
+
+def _has_class(token: str) -> Callable:
+    """
+    class_ matcher for SoupStrainer: while parsing, bs4 hands the strainer the raw
+    class attribute ("result results_links ..."), so class_='result' alone would
+    only match elements whose class is exactly "result"
+    """
+    def match(value) -> bool:
+        if value is None:
+            return False
+        return token in (value if isinstance(value, list) else value.split())
+    return match
+
+def _targeted_soup(content, container_re: "re.Pattern", limit: int, strainer: SoupStrainer) -> BeautifulSoup:
+    """Parse only the first `limit` result containers, and only the container elements"""
+    if isinstance(content, str):
+        content = content.encode("utf-8")
+    # The window has no <head>, so carry the page's declared charset over
+    charset = _CHARSET_RE.search(content[:4096])
+    encoding = charset.group(1).decode("ascii") if charset else "utf-8"
+    window = _result_window(content, container_re, limit) or content
+    return BeautifulSoup(window, HTML_PARSER, parse_only=strainer, from_encoding=encoding)
+
+# DuckDuckGo fallback when VnExpress returns nothing
+VIETNAMESE_NEWS_SITES = " site:vnexpress.net OR site:tuoitre.vn OR site:dantri.com.vn"
+
+# Process-wide: concurrent identical searches (e.g. breaking news) share one fetch
+_search_flight = SingleFlight()
+_async_search_flight = AsyncSingleFlight()
+
+# Background refreshes of stale cache entries (stale-while-revalidate)
+_refresh_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="search-refresh")
+# Concurrent per-source searches in fan-out mode
+_fanout_executor = ThreadPoolExecutor(max_workers=8, thread_name_prefix="search-fanout")
 
 class WebSearcher:
-    def __init__(self):
+    def __init__(self, fanout: bool = None, fanout_deadline: float = None, min_results: int = 3):
+        """
+        fanout: query all sources for a question concurrently under one fanout_deadline
+        (seconds) instead of one after another; answer once min_results unique results are in
+        """
         self.headers = {
             'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
         }
+        # Parsed results shared by all workers (None when SEARCH_CACHE=0)
+        self.cache = get_search_cache()
+
+        if fanout is None:
+            fanout = os.getenv("SEARCH_FANOUT", "0") == "1"
+        self.fanout = fanout
+        self.fanout_deadline = fanout_deadline or float(os.getenv("SEARCH_FANOUT_DEADLINE", "6"))
+        self.min_results = min_results
 
     def search_duckduckgo(self, query: str, num_results: int = 3) -> list:
         """Search DuckDuckGo and return results"""
-        try:
-            search_url = f"https://html.duckduckgo.com/html/?q={quote(query)}"
-            response = requests.get(search_url, headers=self.headers, timeout=10)
+        return self._cached("duckduckgo", f"{num_results} {query}", self._fetch_duckduckgo, query, num_results)
 
-            if response.status_code != 200:
-                return []
+    def search_vietnamese_news(self, query: str) -> list:
+        """Search Vietnamese news sources"""
+        return self._cached("vnexpress", query, self._fetch_vietnamese_news, query)
 
-            soup = BeautifulSoup(response.content, 'html.parser')
-            results = []
+    @timed_stage("search_pubmed")
+    def search_pubmed(self, query: str, num_results: int = 3) -> str:
+        """
+        Searches PubMed for review articles related to a clinical query and returns a summary.
+        """
+        return self._cached("pubmed", self._pubmed_cache_query(query, num_results), self._fetch_pubmed, query, num_results)
+
+    def cached_pubmed(self, query: str, num_results: int = 3) -> Optional[str]:
+        """search_pubmed's cached summary without any network call (None when not cached)"""
+        if self.cache is None:
+            return None
+        cache_query = self._pubmed_cache_query(query, num_results)
+        entry = self.cache.lookup("pubmed", cache_query)
+        if entry is None:
+            return None
+        summary, is_stale = entry
+        if is_stale and self.cache.claim_refresh("pubmed", cache_query):
+            _refresh_executor.submit(self._refresh, "pubmed", cache_query, self._fetch_pubmed, query, num_results)
+        return summary
+
+    @staticmethod
+    def _pubmed_cache_query(query: str, num_results: int) -> str:
+        """Chief complaints are keyed loosely: "Tôi bị đau bụng" and "bụng đau" share an entry"""
+        return f"{num_results} {normalize_complaint(query)}"
+
+    def _cached(self, source: str, cache_query: str, fetch, *args):
+        """
+        Serve cached results, else fetch + parse and cache non-empty results.
+        A stale entry is returned at once and refreshed in the background (one refresh per key).
+        """
+        if self.cache is not None:
+            entry = self.cache.lookup(source, cache_query)
+            if entry is not None:
+                results, is_stale = entry
+                if is_stale and self.cache.claim_refresh(source, cache_query):
+                    _refresh_executor.submit(self._refresh, source, cache_query, fetch, *args)
+                return results
+
+        return self._fetch_and_store(source, cache_query, fetch, *args)
+
+    def _fetch_and_store(self, source: str, cache_query: str, fetch, *args):
+        results = fetch(*args)
+        if results and self.cache is not None:
+            self.cache.set(source, cache_query, results)
+        return results
 
-            # Find search result divs
-            for result in soup.find_all('div', class_='result')[:num_results]:
-                title_elem = result.find('a', class_='result__a')
-                snippet_elem = result.find('a', class_='result__snippet')
+    def _refresh(self, source: str, cache_query: str, fetch, *args):
+        """(Worker Thread) Re-fetch a stale entry; on failure the stale copy stays until its lease expires"""
+        try:
+            self._fetch_and_store(source, cache_query, fetch, *args)
+            print(f"DEBUG: Refreshed stale {source} results for '{cache_query}'")
+        except Exception as e:
+            print(f"DEBUG: Background refresh of {source} results failed: {e}")
 
-                if title_elem:
-                    title = title_elem.get_text().strip()
-                    link = title_elem.get('href')
-                    snippet = snippet_elem.get_text().strip() if snippet_elem else ""
+    def _fetch_duckduckgo(self, query: str, num_results: int) -> list:
+        try:
+            search_url = f"https://html.duckduckgo.com/html/?q={quote(query)}"
+            response = http_client.get(search_url, headers=self.headers, timeout=10)
 
-                    results.append({
-                        'title': title,
-                        'link': link,
-                        'snippet': snippet
-                    })
+            if response.status_code != 200:
+                return []
 
-            return results
+            return self._parse_duckduckgo(response.content, num_results)
 
         except Exception as e:
             print(f"Search error: {e}")
             return []
 
-    def search_vietnamese_news(self, query: str) -> list:
-        """Search Vietnamese news sources"""
+    def _fetch_vietnamese_news(self, query: str) -> list:
         try:
             # Search on VnExpress
             vnexpress_url = f"https://vnexpress.net/search?q={quote(query)}"
-            response = requests.get(vnexpress_url, headers=self.headers, timeout=10)
-
-            results = []
-            if response.status_code == 200:
-                soup = BeautifulSoup(response.content, 'html.parser')
-
-                for item in soup.find_all('div', class_='item-news')[:2]:
-                    title_elem = item.find('h3', class_='title-news')
-                    link_elem = item.find('a')
+            response = http_client.get(vnexpress_url, headers=self.headers, timeout=10)
 
-                    if title_elem and link_elem:
-                        title = title_elem.get_text().strip()
-                        link = link_elem.get('href')
-
-                        results.append({
-                            'title': title,
-                            'link': link,
-                            'snippet': '',
-                            'source': 'VnExpress'
-                        })
+            if response.status_code != 200:
+                return []
 
-            return results
+            return self._parse_vietnamese_news(response.content)
 
         except Exception as e:
             print(f"Vietnamese news search error: {e}")
             return []
 
-    def search_pubmed(self, query: str, num_results: int = 3) -> str:
-        """
-        Searches PubMed for review articles related to a clinical query and returns a summary.
-        """
+    def _fetch_pubmed(self, query: str, num_results: int) -> str:
         try:
             # Step 1: E-Search to get article IDs
-            base_url = "https://eutils.ncbi.nlm.nih.gov/entrez/eutils/"
-            # Focus on high-quality review articles
-            search_term = f"{query} AND (review[Publication Type] OR systematic review[Publication Type])"
-            search_url = f"{base_url}esearch.fcgi?db=pubmed&term={quote(search_term)}&retmax={num_results}&retmode=json"
-            
-            response = requests.get(search_url, headers=self.headers, timeout=15)
-            response.raise_for_status() # Raise an exception for bad status codes
-            
-            search_data = response.json()
-            id_list = search_data.get("esearchresult", {}).get("idlist", [])
-            
+            id_list = self._pubmed_esearch(query, num_results)
             if not id_list:
                 return ""
 
-            # Adhere to NCBI API guidelines (max 3 requests/sec without an API key)
-            time.sleep(0.4) 
-
             # Step 2: E-Summary to get article details
-            ids_str = ",".join(id_list)
-            summary_url = f"{base_url}esummary.fcgi?db=pubmed&id={ids_str}&retmode=json"
-            
-            response = requests.get(summary_url, headers=self.headers, timeout=15)
-            response.raise_for_status()
-            
-            summary_data = response.json()
-            results = summary_data.get("result", {})
-            
-            if not results:
-                return ""
-
-            # Step 3: Format the output into a concise summary for the AI prompt
-            summary_text = "Tóm tắt các hướng tiếp cận từ PubMed:\n"
-            for uid in id_list:
-                article = results.get(uid)
-                if article:
-                    title = article.get("title", "Không có tiêu đề")
-                    summary_text += f"- {title}\n"
-            
-            return summary_text.strip()
+            return self._format_pubmed_summary(id_list, self._pubmed_esummary(id_list))
 
         except requests.exceptions.RequestException as e:
             print(f"PubMed search error: {e}")
@@ -132,16 +217,228 @@ class WebSearcher:
             print(f"An unexpected error occurred during PubMed search: {e}")
             return ""
 
+    def _pubmed_esearch(self, query: str, num_results: int) -> list:
+        # Adhere to NCBI API guidelines (shared 3 requests/sec budget without an API key); retries take a token too
+        response = http_client.get_rate_limited(self._pubmed_search_url(query, num_results), get_ncbi_limiter().acquire,
+                                                headers=self.headers, timeout=PUBMED_READ_TIMEOUT)
+        response.raise_for_status() # Raise an exception for bad status codes
+        return response.json().get("esearchresult", {}).get("idlist", [])
+
+    def _pubmed_esummary(self, id_list: list) -> dict:
+        response = http_client.get_rate_limited(self._pubmed_summary_url(id_list), get_ncbi_limiter().acquire,
+                                                headers=self.headers, timeout=PUBMED_READ_TIMEOUT)
+        response.raise_for_status()
+        return response.json()
+
+    @timed_stage("search_pubmed_batch")
+    def search_pubmed_batch(self, queries: List[str], num_results: int = 3) -> Dict[str, str]:
+        """
+        search_pubmed for several queries at once: cached ones are served from the cache,
+        the rest share a single esummary call (one esearch each) -> {query: summary}
+        """
+        summaries, missing = {}, []
+        for query in dict.fromkeys(queries):
+            summary = self.cached_pubmed(query, num_results)
+            if summary is None:
+                missing.append(query)
+            else:
+                summaries[query] = summary
+
+        if missing:
+            fetched = self._fetch_pubmed_batch(missing, num_results)
+            for query, summary in fetched.items():
+                if summary and self.cache is not None:
+                    self.cache.set("pubmed", self._pubmed_cache_query(query, num_results), summary)
+            summaries.update(fetched)
+        return summaries
+
+    def _fetch_pubmed_batch(self, queries: List[str], num_results: int) -> Dict[str, str]:
+        id_lists = {}
+        for query in queries:
+            try:
+                id_lists[query] = self._pubmed_esearch(query, num_results)
+            except Exception as e:
+                print(f"PubMed search error for '{query}': {e}")
+                id_lists[query] = []
+
+        # One E-Summary call for the articles of every query
+        all_ids = list(dict.fromkeys(uid for id_list in id_lists.values() for uid in id_list))
+        if not all_ids:
+            return {query: "" for query in queries}
+        try:
+            summary_data = self._pubmed_esummary(all_ids)
+        except Exception as e:
+            print(f"PubMed summary error for a batch of {len(queries)} queries: {e}")
+            return {query: "" for query in queries}
+
+        print(f"DEBUG: PubMed batch: {len(queries)} queries, {len(all_ids)} articles in one esummary call")
+        return {query: self._format_pubmed_summary(id_list, summary_data) if id_list else ""
+                for query, id_list in id_lists.items()}
+
+    @timed_stage("search_and_summarize")
     def search_and_summarize(self, query: str) -> str:
-        """Search web and return summarized results"""
+        """
+        Search web and return summarized results (identical in-flight queries are coalesced;
+        slightly stale cached results are used while they refresh in the background)
+        """
+        return _search_flight.do(normalize_query(query), self._search_and_summarize, query)
+
+    def _search_and_summarize(self, query: str) -> str:
+        if self.fanout:
+            return self._format_search_summary(query, self._fan_out(query))
+
         # Try Vietnamese news first for Vietnamese queries
-        if any(word in query.lower() for word in ['việt nam', 'vietnam', 'tổng bí thư', 'chính trị']):
+        if self._is_vietnamese_news_query(query):
             results = self.search_vietnamese_news(query)
             if not results:
-                results = self.search_duckduckgo(query + " site:vnexpress.net OR site:tuoitre.vn OR site:dantri.com.vn")
+                results = self.search_duckduckgo(query + VIETNAMESE_NEWS_SITES)
         else:
             results = self.search_duckduckgo(query)
 
+        return self._format_search_summary(query, results)
+
+    def _fan_out(self, query: str) -> list:
+        """
+        Run every source concurrently; return merged results as soon as enough are in
+        or the deadline passes. Sources still running are abandoned (their results
+        still land in the cache).
+        """
+        sources = self._fanout_sources(query)
+        futures = {_fanout_executor.submit(search, *args): name for name, search, args in sources}
+        finished = {}
+        deadline = time.monotonic() + self.fanout_deadline
+
+        pending = set(futures)
+        while pending:
+            done, pending = wait(pending, timeout=max(0.0, deadline - time.monotonic()), return_when=FIRST_COMPLETED)
+            if not done:
+                break
+            for future in done:
+                finished[futures[future]] = future.result() if future.exception() is None else []
+            if len(self._merge_results(sources, finished)) >= self.min_results:
+                break
+
+        for future in pending:
+            future.cancel()
+        if pending:
+            print(f"DEBUG: Fan-out search answered without {sorted(futures[f] for f in pending)}")
+        return self._merge_results(sources, finished)
+
+    def _fanout_sources(self, query: str) -> List[Tuple[str, Callable, tuple]]:
+        """(name, search method, args) in priority order"""
+        if self._is_vietnamese_news_query(query):
+            return [
+                ("vnexpress", self.search_vietnamese_news, (query,)),
+                ("duckduckgo", self.search_duckduckgo, (query + VIETNAMESE_NEWS_SITES,)),
+            ]
+        return [("duckduckgo", self.search_duckduckgo, (query,))]
+
+    @classmethod
+    def _merge_results(cls, sources: List[Tuple[str, Callable, tuple]], finished: dict) -> list:
+        """Results of the finished sources in priority order, deduplicated by URL"""
+        merged, seen = [], set()
+        for name, _, _ in sources:
+            for result in finished.get(name) or []:
+                url = cls._canonical_url(result.get('link') or '')
+                if not result.get('title') or (url and url in seen):
+                    continue
+                seen.add(url)
+                merged.append(result)
+        return merged
+
+    @staticmethod
+    def _canonical_url(link: str) -> str:
+        """Comparable form of a result URL (DuckDuckGo redirect links unwrapped)"""
+        parts = urlsplit(link if "//" in link else "//" + link)
+        if parts.path.startswith("/l/") and "uddg" in parse_qs(parts.query):
+            parts = urlsplit(parse_qs(parts.query)["uddg"][0])
+        host = parts.netloc.lower()
+        host = host[4:] if host.startswith("www.") else host
+        path = parts.path.rstrip("/")
+        return f"{host}{path}?{parts.query}" if parts.query else f"{host}{path}"
+
+    @staticmethod
+    def _pubmed_search_url(query: str, num_results: int) -> str:
+        # Focus on high-quality review articles
+        search_term = f"{query} AND (review[Publication Type] OR systematic review[Publication Type])"
+        url = f"{PUBMED_BASE_URL}esearch.fcgi?db=pubmed&term={quote(search_term)}&retmax={num_results}&retmode=json"
+        return url + f"&api_key={NCBI_API_KEY}" if NCBI_API_KEY else url
+
+    @staticmethod
+    def _pubmed_summary_url(id_list: list) -> str:
+        url = f"{PUBMED_BASE_URL}esummary.fcgi?db=pubmed&id={','.join(id_list)}&retmode=json"
+        return url + f"&api_key={NCBI_API_KEY}" if NCBI_API_KEY else url
+
+    @staticmethod
+    def _is_vietnamese_news_query(query: str) -> bool:
+        return any(word in query.lower() for word in ['việt nam', 'vietnam', 'tổng bí thư', 'chính trị'])
+
+    # Parsing and formatting are shared by WebSearcher and AsyncWebSearcher
+
+    @staticmethod
+    def _parse_duckduckgo(content: bytes, num_results: int) -> list:
+        soup = _targeted_soup(content, _DUCKDUCKGO_RESULT_RE, num_results, SoupStrainer('div', class_=_has_class('result')))
+        results = []
+
+        # Find search result divs
+        for result in soup.find_all('div', class_='result')[:num_results]:
+            title_elem = result.find('a', class_='result__a')
+            snippet_elem = result.find('a', class_='result__snippet')
+
+            if title_elem:
+                title = title_elem.get_text().strip()
+                link = title_elem.get('href')
+                snippet = snippet_elem.get_text().strip() if snippet_elem else ""
+
+                results.append({
+                    'title': title,
+                    'link': link,
+                    'snippet': snippet
+                })
+
+        return results
+
+    @staticmethod
+    def _parse_vietnamese_news(content: bytes, num_results: int = 2) -> list:
+        soup = _targeted_soup(content, _VNEXPRESS_ITEM_RE, num_results, SoupStrainer('div', class_=_has_class('item-news')))
+        results = []
+
+        for item in soup.find_all('div', class_='item-news')[:num_results]:
+            title_elem = item.find('h3', class_='title-news')
+            link_elem = item.find('a')
+
+            if title_elem and link_elem:
+                title = title_elem.get_text().strip()
+                link = link_elem.get('href')
+
+                results.append({
+                    'title': title,
+                    'link': link,
+                    'snippet': '',
+                    'source': 'VnExpress'
+                })
+
+        return results
+
+    @staticmethod
+    def _format_pubmed_summary(id_list: list, summary_data: dict) -> str:
+        results = summary_data.get("result", {})
+
+        if not results:
+            return ""
+
+        # Step 3: Format the output into a concise summary for the AI prompt
+        summary_text = "Tóm tắt các hướng tiếp cận từ PubMed:\n"
+        for uid in id_list:
+            article = results.get(uid)
+            if article:
+                title = article.get("title", "Không có tiêu đề")
+                summary_text += f"- {title}\n"
+
+        return summary_text.strip()
+
+    @staticmethod
+    def _format_search_summary(query: str, results: list) -> str:
         if not results:
             return "Không tìm thấy thông tin cập nhật về chủ đề này."
 
@@ -154,4 +451,179 @@ class WebSearcher:
             summary += f"   🔗 {result['link']}\n\n"
 
         summary += "\n*Thông tin được cập nhật từ web search*"
-        return summary
\ No newline at end of file
+        return summary
+
+class AsyncWebSearcher(WebSearcher):
+    """
+    asyncio variant of WebSearcher: fetches with a pooled httpx.AsyncClient and runs the
+    BeautifulSoup parsing in a worker thread so the event loop stays free
+    """
+
+    def __init__(self):
+        super().__init__()
+        self._client = None
+        self._refresh_tasks = set()  # strong refs so background refreshes aren't collected
+
+    @property
+    def client(self) -> "httpx.AsyncClient":
+        # Created lazily so it binds to the event loop that uses it
+        if self._client is None:
+            import httpx
+
+            # Same pool size / connect timeout as http_client; httpx retries failed connects only
+            self._client = httpx.AsyncClient(
+                headers=self.headers,
+                follow_redirects=True,
+                timeout=self._timeout(10),
+                limits=httpx.Limits(max_keepalive_connections=http_client.pool.pool_size),
+                transport=http_fixtures.async_transport(httpx.AsyncHTTPTransport(retries=http_client.pool.retries))
+            )
+        return self._client
+
+    @staticmethod
+    def _timeout(read: float) -> "httpx.Timeout":
+        import httpx
+        return httpx.Timeout(read, connect=http_client.pool.connect_timeout)
+
+    async def aclose(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    async def search_duckduckgo(self, query: str, num_results: int = 3) -> list:
+        """Search DuckDuckGo and return results"""
+        return await self._cached_async("duckduckgo", f"{num_results} {query}", self._fetch_duckduckgo, query, num_results)
+
+    async def search_vietnamese_news(self, query: str) -> list:
+        """Search Vietnamese news sources"""
+        return await self._cached_async("vnexpress", query, self._fetch_vietnamese_news, query)
+
+    @timed_stage("search_pubmed")
+    async def search_pubmed(self, query: str, num_results: int = 3) -> str:
+        """Searches PubMed for review articles related to a clinical query and returns a summary."""
+        return await self._cached_async(
+            "pubmed", self._pubmed_cache_query(query, num_results), self._fetch_pubmed, query, num_results
+        )
+
+    async def _cached_async(self, source: str, cache_query: str, fetch, *args):
+        # SQLite calls may wait on another worker's write lock, so they run off the event loop
+        if self.cache is not None:
+            entry = await asyncio.to_thread(self.cache.lookup, source, cache_query)
+            if entry is not None:
+                results, is_stale = entry
+                if is_stale and await asyncio.to_thread(self.cache.claim_refresh, source, cache_query):
+                    task = asyncio.create_task(self._refresh_async(source, cache_query, fetch, *args))
+                    self._refresh_tasks.add(task)
+                    task.add_done_callback(self._refresh_tasks.discard)
+                return results
+
+        return await self._fetch_and_store_async(source, cache_query, fetch, *args)
+
+    async def _fetch_and_store_async(self, source: str, cache_query: str, fetch, *args):
+        results = await fetch(*args)
+        if results and self.cache is not None:
+            await asyncio.to_thread(self.cache.set, source, cache_query, results)
+        return results
+
+    async def _refresh_async(self, source: str, cache_query: str, fetch, *args):
+        try:
+            await self._fetch_and_store_async(source, cache_query, fetch, *args)
+            print(f"DEBUG: Refreshed stale {source} results for '{cache_query}'")
+        except Exception as e:
+            print(f"DEBUG: Background refresh of {source} results failed: {e}")
+
+    async def _fetch_duckduckgo(self, query: str, num_results: int) -> list:
+        try:
+            response = await self.client.get(f"https://html.duckduckgo.com/html/?q={quote(query)}", timeout=self._timeout(10))
+            if response.status_code != 200:
+                return []
+
+            return await asyncio.to_thread(self._parse_duckduckgo, response.content, num_results)
+
+        except Exception as e:
+            print(f"Search error: {e}")
+            return []
+
+    async def _fetch_vietnamese_news(self, query: str) -> list:
+        try:
+            response = await self.client.get(f"https://vnexpress.net/search?q={quote(query)}", timeout=self._timeout(10))
+            if response.status_code != 200:
+                return []
+
+            return await asyncio.to_thread(self._parse_vietnamese_news, response.content)
+
+        except Exception as e:
+            print(f"Vietnamese news search error: {e}")
+            return []
+
+    async def _fetch_pubmed(self, query: str, num_results: int) -> str:
+        import httpx
+        try:
+            await get_ncbi_limiter().acquire_async()
+            response = await self.client.get(self._pubmed_search_url(query, num_results), timeout=self._timeout(PUBMED_READ_TIMEOUT))
+            response.raise_for_status()
+
+            id_list = response.json().get("esearchresult", {}).get("idlist", [])
+            if not id_list:
+                return ""
+
+            await get_ncbi_limiter().acquire_async()
+            response = await self.client.get(self._pubmed_summary_url(id_list), timeout=self._timeout(PUBMED_READ_TIMEOUT))
+            response.raise_for_status()
+
+            return self._format_pubmed_summary(id_list, response.json())
+
+        except httpx.HTTPError as e:
+            print(f"PubMed search error: {e}")
+            return ""
+        except json.JSONDecodeError as e:
+            print(f"PubMed JSON parsing error: {e}")
+            return ""
+        except Exception as e:
+            print(f"An unexpected error occurred during PubMed search: {e}")
+            return ""
+
+    @timed_stage("search_and_summarize")
+    async def search_and_summarize(self, query: str) -> str:
+        """Search web and return summarized results (identical in-flight queries are coalesced)"""
+        return await _async_search_flight.do(normalize_query(query), self._search_and_summarize, query)
+
+    async def _search_and_summarize(self, query: str) -> str:
+        if self.fanout:
+            return self._format_search_summary(query, await self._fan_out(query))
+
+        if self._is_vietnamese_news_query(query):
+            results = await self.search_vietnamese_news(query)
+            if not results:
+                results = await self.search_duckduckgo(query + VIETNAMESE_NEWS_SITES)
+        else:
+            results = await self.search_duckduckgo(query)
+
+        return self._format_search_summary(query, results)
+
+    async def _fan_out(self, query: str) -> list:
+        """Like WebSearcher._fan_out, but sources still running at the end are cancelled"""
+        sources = self._fanout_sources(query)
+        tasks = {asyncio.create_task(search(*args)): name for name, search, args in sources}
+        finished = {}
+        deadline = time.monotonic() + self.fanout_deadline
+
+        pending = set(tasks)
+        try:
+            while pending:
+                done, pending = await asyncio.wait(
+                    pending, timeout=max(0.0, deadline - time.monotonic()), return_when=asyncio.FIRST_COMPLETED
+                )
+                if not done:
+                    break
+                for task in done:
+                    finished[tasks[task]] = task.result() if task.exception() is None else []
+                if len(self._merge_results(sources, finished)) >= self.min_results:
+                    break
+        finally:
+            for task in pending:
+                task.cancel()
+
+        if pending:
+            print(f"DEBUG: Fan-out search cancelled {sorted(tasks[t] for t in pending)}")
+        return self._merge_results(sources, finished)